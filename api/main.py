@@ -14,7 +14,7 @@ from pydantic import BaseModel
 # 添加项目根目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.factors.financial_factor import js_score, get_finance, normalize_code
+from src.factors.financial_factor import get_finance, normalize_code, score_timeline
 from api.security import login as auth_login, verify_token, cleanup_expired_tokens, active_token_count
 
 app = FastAPI(title="财报评分API", version="1.0.0")
@@ -162,30 +162,15 @@ def calculate_quarter_scores(code: str, refresh: bool = False):
     else:
         recent_data = None
 
-    # ============================================================
-    # p_flg 参数说明（因子层取数逻辑）：
-    #   p_flg=1: 取最近3个季度数据(tail(3))用于计算"本季度"评分
-    #   p_flg=2: 取上移1位的3个季度数据(iloc[-4:-1])用于计算"上季度"评分
-    #   p_flg=0: 取上移2位的3个季度数据(iloc[-5:-2])用于计算"上上季度"评分
-    #
-    # 举例（假设数据按时间正序，最新在最后）：
-    #   数据: [2024-06, 2024-09, 2024-12, 2025-03, 2025-06, 2025-09, 2025-12]
-    #   p_flg=1 → [2025-06, 2025-09, 2025-12] → 评分对应2025-12报告期
-    #   p_flg=2 → [2025-03, 2025-06, 2025-09] → 评分对应2025-09报告期
-    #   p_flg=0 → [2024-12, 2025-03, 2025-06] → 评分对应2025-06报告期
-    #
-    # recent_data 索引说明：
-    #   recent_data = df.tail(3).iloc[::-1] 翻转后，最新在前
-    #   索引0=本季度(2025-12), 1=上季度(2025-09), 2=上上季度(2025-06)
-    # ============================================================
-    quarter_mapping = {
-        '本季度': (1, 0),   # p_flg=1取最近3季, recent_data[0]=最新季度
-        '上季度': (2, 1),   # p_flg=2取上移1位, recent_data[1]=上季度
-        '上上季度': (0, 2)  # p_flg=0取上移2位, recent_data[2]=上上季度
-    }
+    # 各季度评分取自 score_timeline（倒数第 data_idx+1 个报告期），财务数据取 recent_data[data_idx]
+    quarter_mapping = {'本季度': 0, '上季度': 1, '上上季度': 2}
+    timeline = score_timeline(code)
     for quarter_name in ['本季度', '上季度', '上上季度']:
-        p_flg, data_idx = quarter_mapping[quarter_name]
-        total, detail = js_score(code, p_flg=p_flg)
+        data_idx = quarter_mapping[quarter_name]
+        if len(timeline) > data_idx:
+            _, total, detail = timeline[-1 - data_idx]
+        else:
+            total, detail = 0, {}
         quarter_info = {
             "total": total,
             "扣非": detail.get("扣非净利润", {}).get("total", 0),
@@ -1105,54 +1090,77 @@ async def set_account_strategy(req: SetAccountStrategyRequest):
 # 回测结果（用于策略页 TOP 10 展示）
 # ============================================================
 
+def _backtest_top_entry(name: str, best, readme_path: Path) -> dict:
+    """结果集最优一行 → TOP 列表项（描述取同目录 README 前 5 行）"""
+    description = ''
+    if readme_path.exists():
+        with open(readme_path) as f:
+            # 只取前 5 行作为描述
+            lines = f.readlines()[:5]
+            description = ' '.join(l.strip().lstrip('#').strip() for l in lines if l.strip())
+
+    return {
+        'name': name,
+        'total_return': float(best.get('total_return', 0)) if pd.notna(best.get('total_return')) else None,
+        'annual_return': float(best.get('annual_return', 0)) if pd.notna(best.get('annual_return')) else None,
+        'max_drawdown': float(best.get('max_dd', 0)) if pd.notna(best.get('max_dd')) else None,
+        'sharpe': float(best.get('sharpe', 0)) if pd.notna(best.get('sharpe')) else None,
+        'win_rate': float(best.get('win_rate', 0)) if pd.notna(best.get('win_rate')) else None,
+        'buy_threshold': float(best.get('buy_threshold', 0)) if pd.notna(best.get('buy_threshold')) else None,
+        'take_profit': float(best.get('take_profit', 0)) if pd.notna(best.get('take_profit')) else None,
+        'stop_loss': float(best.get('stop_loss', 0)) if pd.notna(best.get('stop_loss')) else None,
+        'cooldown_days': int(best.get('cooldown_days', 0)) if pd.notna(best.get('cooldown_days')) else None,
+        'trades': int(best.get('trades', 0)) if pd.notna(best.get('trades')) else None,
+        'period': name.split(' / ')[-1] if ' / ' in name else '',
+        'description': description,
+    }
+
+
 @app.get("/api/v1/backtest/top")
 async def get_backtest_top(n: int = 10):
-    """获取回测排名前 N 的策略（从 grid_results.csv 读取，结构化数据）"""
+    """获取回测排名前 N 的策略（读结果库 grid_results.jsonl 中按总评分排序的结果集，结构化数据）
+
+    结果库中没有的结果集回退读取旧的 grid_results.csv
+    """
     try:
-        backtest_dir = Path(__file__).parent.parent / "result" / "backtest"
-        if not backtest_dir.exists():
-            return {'results': []}
+        from src.backtest.result_store import STORE_PATH, ResultStore
 
+        backtest_dir = Path(__file__).parent.parent / "result" / "backtest"
         results = []
-        # 扫描所有 grid_results.csv（按总评分排序的最优策略）
-        for csv_file in backtest_dir.glob("**/grid_results.csv"):
-            try:
-                df = pd.read_csv(csv_file)
-                if df.empty:
+        stored = set()
+
+        if STORE_PATH.exists():
+            store = ResultStore(STORE_PATH)
+            stored = set(store.tags())
+            for tag in store.tags():
+                # v1_每日触发_资金浮动/2026/grid_results → "v1_每日触发_资金浮动 / 2026"
+                parent, _, leaf = tag.rpartition('/')
+                if leaf != 'grid_results' or not parent:
+                    continue
+                df = store.frame(tag)
+                if df is None or df.empty:
+                    continue
+                try:
+                    results.append(_backtest_top_entry(parent.replace('/', ' / '), df.iloc[0],
+                                                       backtest_dir / parent / "README.md"))
+                except Exception:
                     continue
-                best = df.iloc[0]
 
-                # 路径作为策略名
+        if backtest_dir.exists():
+            # 扫描结果库中没有的 grid_results.csv（按总评分排序的最优策略）
+            for csv_file in backtest_dir.glob("**/grid_results.csv"):
                 rel = csv_file.relative_to(backtest_dir)
-                # v1_每日触发_资金浮动/2026/grid_results.csv → "v1_每日触发_资金浮动 / 2026"
-                name = str(rel.parent).replace('/', ' / ')
-
-                # 读同目录 README 获取描述
-                readme_path = csv_file.parent / "README.md"
-                description = ''
-                if readme_path.exists():
-                    with open(readme_path) as f:
-                        # 只取前 5 行作为描述
-                        lines = f.readlines()[:5]
-                        description = ' '.join(l.strip().lstrip('#').strip() for l in lines if l.strip())
-
-                results.append({
-                    'name': name,
-                    'total_return': float(best.get('total_return', 0)) if pd.notna(best.get('total_return')) else None,
-                    'annual_return': float(best.get('annual_return', 0)) if pd.notna(best.get('annual_return')) else None,
-                    'max_drawdown': float(best.get('max_dd', 0)) if pd.notna(best.get('max_dd')) else None,
-                    'sharpe': float(best.get('sharpe', 0)) if pd.notna(best.get('sharpe')) else None,
-                    'win_rate': float(best.get('win_rate', 0)) if pd.notna(best.get('win_rate')) else None,
-                    'buy_threshold': float(best.get('buy_threshold', 0)) if pd.notna(best.get('buy_threshold')) else None,
-                    'take_profit': float(best.get('take_profit', 0)) if pd.notna(best.get('take_profit')) else None,
-                    'stop_loss': float(best.get('stop_loss', 0)) if pd.notna(best.get('stop_loss')) else None,
-                    'cooldown_days': int(best.get('cooldown_days', 0)) if pd.notna(best.get('cooldown_days')) else None,
-                    'trades': int(best.get('trades', 0)) if pd.notna(best.get('trades')) else None,
-                    'period': name.split(' / ')[-1] if ' / ' in name else '',
-                    'description': description,
-                })
-            except Exception:
-                continue
+                if rel.with_suffix('').as_posix() in stored:
+                    continue
+                try:
+                    df = pd.read_csv(csv_file)
+                    if df.empty:
+                        continue
+                    # 路径作为策略名
+                    name = str(rel.parent).replace('/', ' / ')
+                    results.append(_backtest_top_entry(name, df.iloc[0], csv_file.parent / "README.md"))
+                except Exception:
+                    continue
 
         # 按夏普排序（比年化收益更稳定）
         results.sort(key=lambda x: (x.get('sharpe') or -999), reverse=True)
@@ -4,13 +4,29 @@ import pandas as pd
 import sys
 import time
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 
 from src.core.base_factor import BaseFactor
+from src.core.factor_manager import RateLimiter
+from src.datafactory.data_manager import set_remote_limiter
+from src.datafactory.score_store import store_batch_result
+
+# 联网因子（uses_network=True）相邻两次请求的最小间隔（秒），
+# 取代原先每只股票固定 sleep 0.5s：本地 CSV 因子不再等待
+NETWORK_MIN_INTERVAL = 0.25
+
+_FACTOR_CLASSES = None
 
 
 def load_factors():
+    """发现 src/factors 下的全部因子类（进程内只扫描一次）"""
+    global _FACTOR_CLASSES
+    if _FACTOR_CLASSES is not None:
+        return _FACTOR_CLASSES
+
     factors = []
     # 获取项目根目录（main.py在根目录，只需一次dirname）
     project_root = os.path.dirname(os.path.abspath(__file__))
@@ -22,22 +38,34 @@ def load_factors():
             obj = getattr(module, attr)
             if isinstance(obj, type) and issubclass(obj, BaseFactor) and obj is not BaseFactor:
                 factors.append(obj)
+    _FACTOR_CLASSES = factors
     return factors
 
 
-def run_single(code):
+def run_single(code, factor_classes=None, limiter=None, batch_results=None):
+    """单股评分
+
+    Args:
+        batch_results: {因子类: {code: 结果}}，批量评分时预先整池计算好的因子结果
+    """
     name = code
 
     print(f"\n=== {code} 多因子评分系统 ===")
 
-    factor_classes = load_factors()
+    if factor_classes is None:
+        factor_classes = load_factors()
     total_score = 0
     total_s = 0
     s_score = 0
     single_result = {}
     for cls in factor_classes:
-        factor = cls(code, name)
-        result = factor.calculate()
+        if batch_results is not None and cls in batch_results:
+            result = batch_results[cls][code]
+        else:
+            factor = cls(code, name)
+            if limiter is not None and cls.uses_network:
+                limiter.wait()
+            result = factor.calculate()
 
         factor_name = result.get('name', '因子X')
         factor_score = result.get('score', 0)
@@ -54,7 +82,13 @@ def run_single(code):
     return single_result 
 
 
-def run_batch(csv_file,in_fname):
+def run_batch(csv_file, in_fname, workers=1):
+    """批量评分
+
+    Args:
+        workers: 并行线程数，1 为逐只串行；并行时结果仍按股票池顺序汇总，
+                 输出与串行完全一致
+    """
     if not os.path.exists(csv_file):
         print("股票代码文件不存在")
         return
@@ -64,20 +98,49 @@ def run_batch(csv_file,in_fname):
         print("CSV必须包含 code 列")
         return
 
-    results = []
-
+    tasks = []
     for code,name in zip(df["code"],df["name"]):
-        time.sleep(0.5)
         code = str(code).zfill(6)   # 自动补齐6位
         # 跳过无效代码
         if not code.isdigit() or len(code) != 6:
             print(f"跳过无效代码: {code}")
             continue
+        tasks.append((code, name))
+
+    factor_classes = load_factors()
+    limiter = RateLimiter(NETWORK_MIN_INTERVAL)
+
+    # 提供 calculate_batch 的因子（价格类）整池一次计算
+    codes = [code for code, _ in tasks]
+    batch_results = {}
+    for cls in factor_classes:
+        if cls.has_batch():
+            t0 = time.time()
+            batch_results[cls] = cls.calculate_batch(codes)
+            print(f"⚡ {cls.__name__} 批量计算 {len(codes)} 只 ({time.time() - t0:.2f}s)")
+
+    def score_one(task):
+        code, name = task
         print(f"\n====== 正在计算 {code} ======")
-        single_result = run_single(str(code))
+        single_result = run_single(code, factor_classes, limiter, batch_results)
         single_result.update({"code": code, "name": name})
-        results.append(single_result)
-        #results.append({"code": code, "name": name, "score": score})
+        return single_result
+
+    t0 = time.time()
+    # 本地因子的远程回退（财报 / 分红缓存缺失或过期时刷新）与联网因子共用同一限速
+    set_remote_limiter(limiter)
+    try:
+        if workers <= 1 or len(tasks) <= 1:
+            results = [score_one(t) for t in tasks]
+        else:
+            # 首只股票串行：先加载行业映射、指数涨幅、当日资金流文件等共享缓存，
+            # 避免多个线程同时初始化或同时下载
+            results = [score_one(tasks[0])]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results.extend(pool.map(score_one, tasks[1:]))
+    finally:
+        set_remote_limiter(None)
+    print(f"\n评分耗时 {time.time() - t0:.1f}s（{len(results)} 只，{workers} 线程）")
 
     result_df = pd.DataFrame(results)
     # 调整列顺序：code, name 放前面
@@ -107,6 +170,11 @@ def run_batch(csv_file,in_fname):
     result_df.to_csv(filename, index=False)
     print(f"批量评分完成，结果已保存在 {filename}")
 
+    # 同步写入评分分区存储（仅标准命名的 batch_result_YYYYMMDD.csv）
+    m = re.match(r'^batch_result_(\d{8})\.csv$', safe_name)
+    if m and store_batch_result(m.group(1)):
+        print(f"评分分区已更新: {m.group(1)}")
+
 
 def safe_input(prompt: str, default: str = '') -> str:
     try:
@@ -120,6 +188,7 @@ def main():
     print("选择模式:")
     print("1. 单股评分")
     print("2. 批量评分")
+    print("3. 批量评分（并行）")
 
     mode = safe_input("请输入模式编号: ")
 
@@ -131,6 +200,11 @@ def main():
         in_file = safe_input("请输入股票池CSV路径:")
         in_fname = safe_input("请输入结果名:")
         run_batch(in_file,in_fname)
+
+    elif mode == "3":
+        in_file = safe_input("请输入股票池CSV路径:")
+        in_fname = safe_input("请输入结果名:")
+        run_batch(in_file, in_fname, workers=os.cpu_count() or 1)
     else:
         print("无效输入")
 
@@ -2,13 +2,15 @@
 """
 每日信号计算脚本
 
-从 score_price_history.csv 计算买入信号，输出到 result/signals/
+从评分-价格历史（result/score_price_history/ 日期分区）计算买入信号，输出到 result/signals/
 
 买入信号条件：前7天平均分 >= 30分
 
 用法：
   python scripts/calc_signals.py                # 计算最新日期的信号
   python scripts/calc_signals.py --date 20260611  # 指定日期
+  python scripts/calc_signals.py --all-versions   # 一次计算全部信号版本（v1 + v2）
+  python scripts/calc_signals.py --start 20260101 --end 20260611  # 区间模式：补算区间内每天的信号
 """
 
 import argparse
@@ -16,7 +18,6 @@ import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
 
 # 让直接 `python scripts/calc_signals.py` 也能找到 src 包
 _ROOT = Path(__file__).resolve().parent.parent
@@ -28,15 +29,19 @@ import pandas as pd
 
 # 项目根目录
 ROOT_DIR = Path(__file__).resolve().parent.parent
-SCORE_HISTORY = ROOT_DIR / "result" / "score_price_history.csv"
 SIGNALS_BASE_DIR = ROOT_DIR / "result" / "signals"  # signals/{strategy.output_subdir}/
 
+from src.analyzer.kline_analyzer import HISTORY_DIR, load_score_price_history
+
 # 策略注册表（v1/v2 在 src/backtest/strategies.py 注册；具体参数见 Strategy 数据类）
 from src.backtest.strategies import (
     get_strategy, list_strategies, get_active_config, get_config_for_version,
     update_active_config, switch_signal_version, DEFAULT_STRATEGY_VERSION, SIGNAL_VERSIONS,
 )
 
+# 止盈止损首次触达扫描（持仓批量检查）
+from src.backtest.stop_scanner import scan_stops
+
 # 默认股票池（自选股 200 只）
 DEFAULT_POOL = ROOT_DIR / "stock_self_selected.csv"
 
@@ -72,16 +77,34 @@ def normalize_date_value(val) -> str:
     return s
 
 
+def normalize_date_series(dates: pd.Series) -> pd.Series:
+    """整列日期归一化为 YYYYMMDD 字符串（向量化，结果与逐个 normalize_date_value 一致）"""
+    if pd.api.types.is_integer_dtype(dates) and not dates.isna().any():
+        return dates.astype(str)
+    if pd.api.types.is_float_dtype(dates):
+        whole = dates.notna() & (dates == np.floor(dates))
+        out = pd.Series('', index=dates.index, dtype=object)
+        out[whole] = dates[whole].astype(np.int64).astype(str)
+        frac = dates.notna() & ~whole
+        if frac.any():
+            out[frac] = dates[frac].map(normalize_date_value)
+        return out.astype(str)
+    if pd.api.types.is_string_dtype(dates) and not pd.api.types.is_object_dtype(dates):
+        s = dates.str.strip().str.replace(r'\.0$', '', regex=True)
+        return s.str.replace('-', '', regex=False).str.replace('/', '', regex=False).fillna('')
+    # 混合类型（object 列）逐个处理
+    return dates.map(normalize_date_value)
+
+
 def load_score_history() -> pd.DataFrame:
-    """加载评分-价格历史表"""
-    if not SCORE_HISTORY.exists():
-        print(f"错误: {SCORE_HISTORY} 不存在")
+    """加载评分-价格历史表（kline_analyzer 生成的日期分区）"""
+    df = load_score_price_history()
+    if df.empty:
+        print(f"错误: 评分-价格历史不存在（{HISTORY_DIR}），请先运行 kline_analyzer.py")
         sys.exit(1)
 
-    df = pd.read_csv(SCORE_HISTORY, dtype={'code': str})
-
     # 日期归一化（修复 2.1）
-    df['date'] = df['date'].apply(normalize_date_value)
+    df['date'] = normalize_date_series(df['date'])
 
     # 去重 (修复 2.2)
     df = df.drop_duplicates(subset=['code', 'date'], keep='last')
@@ -95,13 +118,55 @@ def load_score_history() -> pd.DataFrame:
     return df
 
 
-def get_trade_dates(df: pd.DataFrame) -> list:
-    return sorted(df['date'].unique())
+def get_trade_dates(df: pd.DataFrame, cache: dict = None) -> list:
+    if cache is None:
+        return sorted(df['date'].unique())
+    if 'trade_dates' not in cache:
+        cache['trade_dates'] = sorted(df['date'].unique())
+    return cache['trade_dates']
+
+
+def window_averages(df: pd.DataFrame, window_dates: list, min_periods: int,
+                    pool_codes: set = None, cache: dict = None) -> tuple:
+    """
+    窗口内每只股票的平均分
+
+    Returns:
+        ({code: avg}（按 code 升序，有效分数不足 min_periods 的不含）,
+         股票池过滤前股票数, 过滤后股票数)
+
+    cache 非空时按 (窗口, min_periods, 股票池) 缓存，多个信号版本共用同一窗口的结果
+    """
+    key = None
+    if cache is not None:
+        key = ('window', tuple(window_dates), min_periods,
+               None if pool_codes is None else frozenset(pool_codes))
+        if key in cache:
+            return cache[key]
+
+    window_df = df[df['date'].isin(window_dates)]
+    before_count = after_count = window_df['code'].nunique()
+    if pool_codes is not None:
+        window_df = window_df[window_df['code'].isin(pool_codes)]
+        after_count = window_df['code'].nunique()
+
+    avgs = {}
+    for code, group in window_df.groupby('code'):
+        scores = group['total_score'].dropna().values
+        if len(scores) < min_periods:
+            continue
+        avgs[code] = float(np.mean(scores))
+
+    result = (avgs, before_count, after_count)
+    if key is not None:
+        cache[key] = result
+    return result
 
 
 def calc_moving_avg(df: pd.DataFrame, target_date: str, strategy=None,
                     threshold: float = 30.0,
-                    min_periods: int = None, pool_codes: set = None) -> pd.DataFrame:
+                    min_periods: int = None, pool_codes: set = None,
+                    cache: dict = None) -> pd.DataFrame:
     """
     计算指定日期的前 N 天平均分
 
@@ -110,6 +175,7 @@ def calc_moving_avg(df: pd.DataFrame, target_date: str, strategy=None,
         threshold: 买入阈值（来自交易策略 DB）
         min_periods: 最少需要的天数，低于此值跳过该股票
         pool_codes: 股票池 code 集合，None 表示全市场
+        cache: 同一份 df 上多次调用（多个信号版本）时共用的交易日 / 窗口均分缓存
     """
     if strategy is None:
         strategy = get_strategy(DEFAULT_STRATEGY_VERSION)
@@ -118,7 +184,7 @@ def calc_moving_avg(df: pd.DataFrame, target_date: str, strategy=None,
     if min_periods is None:
         min_periods = lookback  # 默认需要满 lookback 天
 
-    trade_dates = get_trade_dates(df)
+    trade_dates = get_trade_dates(df, cache)
 
     if target_date not in trade_dates:
         valid_dates = [d for d in trade_dates if d <= target_date]
@@ -134,51 +200,38 @@ def calc_moving_avg(df: pd.DataFrame, target_date: str, strategy=None,
         return pd.DataFrame()
 
     window_dates = trade_dates[target_idx - lookback + 1:target_idx + 1]
-    window_df = df[df['date'].isin(window_dates)]
+    avgs, before_count, after_count = window_averages(df, window_dates, min_periods,
+                                                      pool_codes, cache)
+    if pool_codes is not None:
+        print(f"股票池过滤: {before_count} → {after_count} 只")
 
-    # v2 首次突破需要昨日的窗口
+    # v2 首次突破需要昨日的窗口（昨日均分只查今日窗口内的股票，不必按股票池过滤）
     if strategy['first_break_only'] and target_idx >= lookback:
         prev_window_dates = trade_dates[target_idx - lookback:target_idx]
-        prev_window_df = df[df['date'].isin(prev_window_dates)]
+        prev_avgs = window_averages(df, prev_window_dates, min_periods, None, cache)[0]
     else:
-        prev_window_df = None
+        prev_avgs = None
 
-    # 股票池过滤
-    if pool_codes is not None:
-        before_count = window_df['code'].nunique()
-        window_df = window_df[window_df['code'].isin(pool_codes)]
-        after_count = window_df['code'].nunique()
-        print(f"股票池过滤: {before_count} → {after_count} 只")
+    target_rows = df[df['date'] == target_date].drop_duplicates(subset=['code']).set_index('code')
 
     result_rows = []
-    for code, group in window_df.groupby('code'):
-        scores = group['total_score'].dropna().values
-        if len(scores) < min_periods:
-            continue
-
+    for code, avg_score in avgs.items():
         # v2: 首次突破过滤——昨日 7 日均分 < 阈值且今日 ≥ 阈值
         if strategy['first_break_only']:
-            if prev_window_df is None:
-                continue  # 没有昨日数据 → 不视作突破
-            prev_group = prev_window_df[prev_window_df['code'] == code]
-            if prev_group.empty:
-                continue
-            prev_scores = prev_group['total_score'].dropna().values
-            if len(prev_scores) < min_periods:
-                continue
-            prev_avg = float(np.mean(prev_scores))
+            if prev_avgs is None or code not in prev_avgs:
+                continue  # 没有昨日数据 / 昨日不满窗口 → 不视作突破
+            prev_avg = prev_avgs[code]
         else:
             prev_avg = None
 
-        target_row = group[group['date'] == target_date]
-        if target_row.empty:
+        if code not in target_rows.index:
             continue
+        target_row = target_rows.loc[code]
 
-        avg_score = np.mean(scores)
-        current_score = target_row.iloc[0]['total_score']
-        close_price = target_row.iloc[0]['close_price']
-        name = target_row.iloc[0]['name']
-        finance_score = target_row.iloc[0].get('finance_score', 0)
+        current_score = target_row['total_score']
+        close_price = target_row['close_price']
+        name = target_row['name']
+        finance_score = target_row.get('finance_score', 0)
         if pd.isna(finance_score):
             finance_score = 0
 
@@ -206,26 +259,145 @@ def calc_moving_avg(df: pd.DataFrame, target_date: str, strategy=None,
     return result_df
 
 
-def apply_cooldown(signals_df: pd.DataFrame, target_date: str,
-                    signals_dir: Path, cooldown_days: int = 1) -> pd.DataFrame:
+def score_matrix(df: pd.DataFrame, pool_codes: set = None, cache: dict = None) -> dict:
     """
-    应用冷却期 - 同一股票距离上次卖出小于 cooldown_days 则跳过买入。
+    评分历史一次性透视成 (交易日, 股票) 矩阵
 
-    冷却期按卖出日计算（从 portfolio.db trades 表读取 SELL 记录），
-    同时也检查历史信号中的 BUY 日期作为兜底。
+    Returns:
+        {'dates', 'codes'（升序）, 'score', 'close', 'finance'（float 矩阵，缺失为 NaN）,
+         'name'（object 矩阵）, 'present'（当天有记录）}
+    """
+    key = None
+    if cache is not None:
+        key = ('matrix', None if pool_codes is None else frozenset(pool_codes))
+        if key in cache:
+            return cache[key]
+
+    trade_dates = get_trade_dates(df, cache)
+    sub = df if pool_codes is None else df[df['code'].isin(pool_codes)]
+    codes = sorted(sub['code'].unique())
+    row = pd.Index(trade_dates).get_indexer(sub['date'])
+    col = pd.Index(codes).get_indexer(sub['code'])
+
+    shape = (len(trade_dates), len(codes))
+    matrix = {'dates': trade_dates, 'codes': codes, 'present': np.zeros(shape, dtype=bool)}
+    matrix['present'][row, col] = True
+    for field, column in (('score', 'total_score'), ('close', 'close_price'),
+                          ('finance', 'finance_score')):
+        values = np.full(shape, np.nan)
+        values[row, col] = sub[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        matrix[field] = values
+    names = np.full(shape, None, dtype=object)
+    names[row, col] = sub['name'].to_numpy(dtype=object)
+    matrix['name'] = names
+
+    if key is not None:
+        cache[key] = matrix
+    return matrix
+
+
+def rolling_window_avg(scores: np.ndarray, lookback: int) -> tuple:
+    """
+    (交易日, 股票) 评分矩阵 → 含当天在内前 lookback 天的 (均分, 有效天数)
 
-    Args:
-        cooldown_days: 冷却天数（来自交易策略 DB）
+    窗口内按日期由早到晚逐个累加有效评分再除以天数，
+    与 calc_moving_avg 对同一列表求 np.mean 一致（≤7 个元素时 numpy 也是顺序累加）
     """
+    n_days = scores.shape[0]
+    total = np.zeros(scores.shape)
+    count = np.zeros(scores.shape, dtype=np.int64)
+    for k in range(min(lookback, n_days) - 1, -1, -1):
+        x = scores[:n_days - k]
+        acc, cnt = total[k:], count[k:]
+        ok = ~np.isnan(x)
+        np.add(acc, x, out=acc, where=ok & (cnt > 0))
+        np.copyto(acc, x, where=ok & (cnt == 0))
+        cnt += ok
+
+    avg = np.full(scores.shape, np.nan)
+    np.divide(total, count, out=avg, where=count > 0)
+    return avg, count
+
+
+def calc_signal_range(df: pd.DataFrame, start_date: str, end_date: str, strategy=None,
+                      threshold: float = 30.0, min_periods: int = None,
+                      pool_codes: set = None, cache: dict = None) -> dict:
+    """
+    区间内每个交易日的均分信号（一次透视 + 整体滚动计算）
 
-    if signals_df.empty or cooldown_days <= 0:
-        return signals_df
+    Returns:
+        {date: DataFrame}，每个交易日的表与 calc_moving_avg(df, date, ...) 相同（空表不含）
+    """
+    if strategy is None:
+        strategy = get_strategy(DEFAULT_STRATEGY_VERSION)
+    lookback = strategy['lookback_days']
+    if min_periods is None:
+        min_periods = lookback
 
-    target_dt = datetime.strptime(target_date, '%Y%m%d')
-    cutoff = (target_dt - timedelta(days=cooldown_days + 5)).strftime('%Y%m%d')
+    m = score_matrix(df, pool_codes, cache)
+    dates = m['dates']
+    if not m['codes']:
+        return {}
 
-    # 收集需要冷却的股票：最后卖出日期
-    last_sell = {}  # code -> last sell date
+    avg_key = ('rolling', lookback, None if pool_codes is None else frozenset(pool_codes))
+    if cache is not None and avg_key in cache:
+        avg, count = cache[avg_key]
+    else:
+        avg, count = rolling_window_avg(m['score'], lookback)
+        if cache is not None:
+            cache[avg_key] = (avg, count)
+
+    # 满窗口 + 当天有记录；v2 另需昨日窗口有效（第 lookback 天起才有昨日完整窗口）
+    ok = (count >= min_periods) & m['present']
+    ok[:max(lookback, min_periods) - 1] = False
+    prev_ok = np.zeros_like(ok)
+    if strategy['first_break_only']:
+        prev_ok[1:] = count[:-1] >= min_periods
+        prev_ok[:lookback] = False
+        ok &= prev_ok
+
+    sort_col = 'finance_score' if strategy['first_break_only'] else 'avg7_score'
+    frames = {}
+    for t, date in enumerate(dates):
+        if (start_date and date < start_date) or (end_date and date > end_date):
+            continue
+        result_rows = []
+        for j in np.flatnonzero(ok[t]):
+            avg_score = avg[t, j]
+            prev_avg = float(avg[t - 1, j]) if strategy['first_break_only'] else None
+            current_score = m['score'][t, j]
+            finance_score = m['finance'][t, j]
+            if pd.isna(finance_score):
+                finance_score = 0
+            result_rows.append({
+                'date': date,
+                'code': m['codes'][j],
+                'name': m['name'][t, j],
+                'close_price': m['close'][t, j],
+                'current_score': round(current_score, 2) if not np.isnan(current_score) else 0,
+                'avg7_score': round(avg_score, 2),
+                'prev_avg7_score': round(prev_avg, 2) if prev_avg is not None else None,
+                'finance_score': round(float(finance_score), 2),
+                'signal': (
+                    'BUY' if (avg_score >= threshold and
+                              (prev_avg is None or prev_avg < threshold))
+                    else ''
+                ),
+            })
+        if result_rows:
+            frames[date] = pd.DataFrame(result_rows).sort_values(sort_col, ascending=False)
+    return frames
+
+
+def load_cooldown_index(signals_dir: Path, since: str = '') -> dict:
+    """
+    冷却期判断用的历史记录索引（只读 since 及之后的信号文件）
+
+    Returns:
+        {'sells': [(code, 卖出日)]（portfolio.db SIM 账户 SELL 记录）,
+         'buys': {信号日: {BUY 的 code}}（signals_dir 下历史信号文件）}
+    """
+    index = {'sells': [], 'buys': {}}
 
     # 来源1：从 portfolio.db trades 表读取 SELL 记录
     try:
@@ -238,9 +410,8 @@ def apply_cooldown(signals_df: pd.DataFrame, target_date: str,
                 if t.get('type') == 'SELL':
                     code = str(t.get('code', ''))
                     trade_date = str(t.get('trade_date', '')).replace('-', '')[:8]
-                    if code and trade_date >= cutoff:
-                        if code not in last_sell or trade_date > last_sell[code]:
-                            last_sell[code] = trade_date
+                    if code:
+                        index['sells'].append((code, trade_date))
     except Exception:
         pass  # 数据库不可用，跳过
 
@@ -250,17 +421,53 @@ def apply_cooldown(signals_df: pd.DataFrame, target_date: str,
             if f.stem in ('signals_latest', 'signals_latest.csv.tmp'):
                 continue
             date_str = f.stem.replace('signals_', '')
-            if date_str == target_date or date_str < cutoff:
+            if date_str < since:
                 continue
             try:
                 old = pd.read_csv(f, dtype={'code': str})
-                for _, row in old.iterrows():
-                    if row.get('signal') == 'BUY':
-                        code = str(row.get('code', ''))
-                        if code and (code not in last_sell or date_str > last_sell[code]):
-                            last_sell[code] = date_str
             except Exception:
                 continue
+            if 'signal' not in old.columns or 'code' not in old.columns:
+                continue
+            buys = old.loc[old['signal'] == 'BUY', 'code'].dropna().astype(str)
+            index['buys'][date_str] = {code for code in buys if code}
+    return index
+
+
+def apply_cooldown(signals_df: pd.DataFrame, target_date: str,
+                    signals_dir: Path, cooldown_days: int = 1,
+                    index: dict = None) -> pd.DataFrame:
+    """
+    应用冷却期 - 同一股票距离上次卖出小于 cooldown_days 则跳过买入。
+
+    冷却期按卖出日计算（从 portfolio.db trades 表读取 SELL 记录），
+    同时也检查历史信号中的 BUY 日期作为兜底。
+
+    Args:
+        cooldown_days: 冷却天数（来自交易策略 DB）
+        index: load_cooldown_index() 的结果；区间模式逐日复用，None 时现读
+    """
+
+    if signals_df.empty or cooldown_days <= 0:
+        return signals_df
+
+    target_dt = datetime.strptime(target_date, '%Y%m%d')
+    cutoff = (target_dt - timedelta(days=cooldown_days + 5)).strftime('%Y%m%d')
+    if index is None:
+        index = load_cooldown_index(signals_dir, since=cutoff)
+
+    # 收集需要冷却的股票：最后卖出日期
+    last_sell = {}  # code -> last sell date
+    for code, trade_date in index['sells']:
+        if trade_date >= cutoff:
+            if code not in last_sell or trade_date > last_sell[code]:
+                last_sell[code] = trade_date
+    for date_str, codes in index['buys'].items():
+        if date_str == target_date or date_str < cutoff:
+            continue
+        for code in codes:
+            if code not in last_sell or date_str > last_sell[code]:
+                last_sell[code] = date_str
 
     if not last_sell:
         return signals_df
@@ -280,8 +487,12 @@ def apply_cooldown(signals_df: pd.DataFrame, target_date: str,
     return signals_df
 
 
-def save_signals(signals_df: pd.DataFrame, target_date: str, strategy=None):
-    """保存信号到文件（按 strategy.output_subdir 分目录）"""
+def save_signals(signals_df: pd.DataFrame, target_date: str, strategy=None,
+                 update_latest: bool = True):
+    """保存信号到文件（按 strategy.output_subdir 分目录）
+
+    update_latest: 是否同时更新 signals_latest.csv（区间模式只在最后一天更新）
+    """
     if strategy is None:
         strategy = get_strategy(DEFAULT_STRATEGY_VERSION)
 
@@ -291,6 +502,8 @@ def save_signals(signals_df: pd.DataFrame, target_date: str, strategy=None):
     output_file = signals_dir / f"signals_{target_date}.csv"
     signals_df.to_csv(output_file, index=False, encoding='utf-8-sig')
     print(f"信号已保存: {output_file}")
+    if not update_latest:
+        return output_file
 
     # 修复 2.3：使用原子替换而非软链接
     latest_file = signals_dir / "signals_latest.csv"
@@ -302,85 +515,41 @@ def save_signals(signals_df: pd.DataFrame, target_date: str, strategy=None):
     return output_file
 
 
-def load_kline(code: str) -> Optional[pd.DataFrame]:
-    """加载个股 K 线（开盘/最高/最低/收盘/成交额）"""
-    kline_dir = ROOT_DIR / "data" / "price"
-    f = kline_dir / f"{code}.csv"
-    if not f.exists():
-        return None
-    try:
-        return pd.read_csv(f, dtype={'日期': str})
-    except Exception:
-        return None
-
-
 def check_kline_stop(code: str, cost: float, buy_date: str,
                      take_profit: float, stop_loss: float,
                      end_date: str = None) -> dict:
     """
     扫描 K 线检查是否触达止盈/止损（从 sim_trader 迁移）。
 
-    逻辑：遍历 [买入日, end_date]，每天先检查 high ≥ 止盈价，再检查 low ≤ 止损价。
-    卖出价 = 目标价（不取最高/最低）。
+    逻辑：在 [买入日, end_date] 内找首个 high ≥ 止盈价 或 low ≤ 止损价 的交易日。
+    卖出价 = 目标价（不取最高/最低）。多只持仓请直接用 scan_stops 一次批量检查。
 
     Returns:
         {'triggered': bool, 'type': 'take_profit'|'stop_loss'|'both'|None,
          'trigger_date': str, 'sell_price': float}
     """
-    from datetime import datetime as _dt
-    target_tp = cost * (1 + take_profit)
-    target_sl = cost * (1 - stop_loss)
+    return scan_stops([{'code': code, 'cost': cost, 'buy_date': buy_date}],
+                      take_profit, stop_loss, end_date=end_date)[0]
 
-    df = load_kline(code)
-    if df is None or df.empty:
-        return {'triggered': False, 'type': None, 'sell_price': 0, 'trigger_date': ''}
-
-    df['_date'] = df['日期'].astype(str).str.replace('-', '').str.replace('.0', '', regex=False)
-    end_date = end_date or _dt.now().strftime('%Y%m%d')
-    df = df[(df['_date'] >= buy_date) & (df['_date'] <= end_date)]
-    if df.empty:
-        return {'triggered': False, 'type': None, 'sell_price': 0, 'trigger_date': ''}
-
-    for _, row in df.iterrows():
-        high = pd.to_numeric(row.get('最高'), errors='coerce')
-        low = pd.to_numeric(row.get('最低'), errors='coerce')
-        if pd.isna(high) or pd.isna(low):
-            continue
 
-        tp_hit = high >= target_tp
-        sl_hit = low <= target_sl
-
-        if tp_hit and sl_hit:
-            return {'triggered': True, 'type': 'both', 'trigger_date': str(row['_date']),
-                    'sell_price': target_sl}  # 同日双触达，保守取止损
-        if tp_hit:
-            return {'triggered': True, 'type': 'take_profit', 'trigger_date': str(row['_date']),
-                    'sell_price': target_tp}
-        if sl_hit:
-            return {'triggered': True, 'type': 'stop_loss', 'trigger_date': str(row['_date']),
-                    'sell_price': target_sl}
-
-    return {'triggered': False, 'type': None, 'sell_price': 0, 'trigger_date': ''}
-
-
-def generate_sell_signals(df: pd.DataFrame, target_date: str, config: dict) -> pd.DataFrame:
+def scan_sim_positions(config: dict, end_date: str) -> list:
     """
-    检查持仓数据库，对触达止盈/止损的持仓生成 SELL 信号。
+    读取 portfolio.db 的 SIM 账户持仓，用 K 线最高/最低价批量扫描止盈止损到 end_date。
 
-    读取 portfolio.db 的 SIM 账户持仓，用 K 线最高/最低价判断止盈止损。
-    用 K 线扫描（与 sim_trader 一致），而非仅收盘价。
-    止盈止损参数来自 active config，保证 BUY/SELL 使用同一配置源。
+    Returns:
+        [({'code', 'cost', 'buy_date', 'pos'}, scan_stops 结果), ...]；
+        数据库 / 账户 / 持仓不可用时为空
     """
     try:
         from src.portfolio.database import PortfolioDB
         db = PortfolioDB()
     except Exception:
-        return pd.DataFrame()
+        return []
 
     # 获取 SIM 账户
     sim_account = db.get_account_by_mode('SIM')
     if not sim_account:
-        return pd.DataFrame()
+        return []
 
     account_id = sim_account['id']
 
@@ -391,9 +560,10 @@ def generate_sell_signals(df: pd.DataFrame, target_date: str, config: dict) -> p
     # 获取持仓
     positions = db.get_positions(account_id)
     if not positions:
-        return pd.DataFrame()
+        return []
 
-    sell_rows = []
+    # 先筛出有效持仓，再一次批量扫描 K 线止盈止损
+    valid = []
     for pos in positions:
         code = pos.get('code', '')
         if not code:
@@ -408,12 +578,37 @@ def generate_sell_signals(df: pd.DataFrame, target_date: str, config: dict) -> p
         if not buy_date:
             continue
 
-        # 用 K 线扫描止盈止损
-        check = check_kline_stop(code, buy_price, buy_date,
-                                 take_profit, stop_loss, end_date=target_date)
+        valid.append({'code': code, 'cost': buy_price, 'buy_date': buy_date, 'pos': pos})
+
+    checks = scan_stops(valid, take_profit, stop_loss, end_date=end_date)
+    return list(zip(valid, checks))
+
+
+def generate_sell_signals(df: pd.DataFrame, target_date: str, config: dict,
+                          scanned: list = None) -> pd.DataFrame:
+    """
+    检查持仓数据库，对触达止盈/止损的持仓生成 SELL 信号。
+
+    读取 portfolio.db 的 SIM 账户持仓，用 K 线最高/最低价判断止盈止损。
+    用 K 线扫描（与 sim_trader 一致），而非仅收盘价。
+    止盈止损参数来自 active config，保证 BUY/SELL 使用同一配置源。
+
+    scanned: scan_sim_positions() 扫到更晚日期的结果（区间模式一次扫描、逐日复用）；
+             首次触达日不晚于 target_date 的才算当天已触发
+    """
+    if scanned is None:
+        scanned = scan_sim_positions(config, target_date)
+    if not scanned:
+        return pd.DataFrame()
+
+    take_profit = config.get('take_profit', 0.20)
+    stop_loss = config.get('stop_loss', 0.08)
 
-        if not check['triggered']:
+    sell_rows = []
+    for item, check in scanned:
+        if not check['triggered'] or check['trigger_date'] > target_date:
             continue
+        code, pos = item['code'], item['pos']
 
         # 获取收盘价用于展示
         code_data = df[(df['code'] == code) & (df['date'] == target_date)]
@@ -450,42 +645,36 @@ def generate_sell_signals(df: pd.DataFrame, target_date: str, config: dict) -> p
     return pd.DataFrame(sell_rows)
 
 
-def main():
-    parser = argparse.ArgumentParser(description='计算每日买入信号')
-    parser.add_argument('--date', type=str, default=None,
-                        help='目标日期 (YYYYMMDD)，默认为最新交易日')
-    parser.add_argument('--strategy-version', type=str, default=DEFAULT_STRATEGY_VERSION,
-                        choices=list(SIGNAL_VERSIONS.keys()),
-                        help=f'信号版本（默认 {DEFAULT_STRATEGY_VERSION}，可选: {list(SIGNAL_VERSIONS.keys())}）')
-    parser.add_argument('--no-cooldown', action='store_true', help='禁用冷却期过滤')
-    parser.add_argument('--pool', type=str, default=str(DEFAULT_POOL),
-                        help=f'股票池 CSV 文件路径（默认 {DEFAULT_POOL.name}）')
-    parser.add_argument('--all-stocks', action='store_true',
-                        help='使用全市场股票（忽略 --pool）')
-    args = parser.parse_args()
-
-    # 获取指定版本配置（不修改全局 active config，不写盘）
-    config = get_config_for_version(args.strategy_version)
+def finalize_signals(df: pd.DataFrame, signals_df: pd.DataFrame, target_date: str,
+                     config: dict, no_cooldown: bool = False,
+                     cooldown_index: dict = None, scanned: list = None) -> pd.DataFrame:
+    """均分信号表 → 冷却过滤 + 合并 SELL 信号，得到 target_date 最终保存的信号表"""
+    # 强制让 CSV 内 date 字段 == 文件名日期（避免 calc_moving_avg 兜底到旧日期时文件名与内容打架）
+    signals_df['date'] = target_date
 
-    print("加载评分历史数据...")
-    df = load_score_history()
-    print(f"共 {len(df)} 条记录，{df['code'].nunique()} 只股票")
+    if not no_cooldown:
+        signals_dir = SIGNALS_BASE_DIR / config['output_subdir']
+        before = len(signals_df)
+        signals_df = apply_cooldown(signals_df, target_date, signals_dir,
+                                    cooldown_days=config['cooldown_days'],
+                                    index=cooldown_index)
+        after = len(signals_df)
+        if before != after:
+            print(f"冷却过滤: {before} → {after} (过滤 {before - after} 只)")
 
-    # 加载股票池
-    pool_codes = None
-    if not args.all_stocks:
-        pool_path = Path(args.pool) if args.pool else DEFAULT_POOL
-        pool_codes = load_pool_codes(pool_path)
-        if pool_codes:
-            print(f"股票池: {pool_path.name}（{len(pool_codes)} 只自选股）")
-        else:
-            print(f"⚠️  股票池 {pool_path} 不存在，使用全市场")
+    # === 生成 SELL 信号（检查持仓的止盈/止损）===
+    sell_signals = generate_sell_signals(df, target_date, config, scanned=scanned)
+    if not sell_signals.empty:
+        # 合并 BUY 和 SELL 信号（SELL 行覆盖同 code 的 BUY 行）
+        signals_df = pd.concat([signals_df, sell_signals], ignore_index=True)
+        signals_df = signals_df.drop_duplicates(subset=['code'], keep='last')
+    return signals_df
 
-    if args.date:
-        target_date = args.date.replace('-', '').replace('/', '')
-    else:
-        target_date = df['date'].max()
 
+def run_version(df: pd.DataFrame, config: dict, target_date: str,
+                pool_codes: set = None, no_cooldown: bool = False,
+                cache: dict = None):
+    """按一个信号版本计算 target_date 的 BUY/SELL 信号并保存到该版本的 output_subdir"""
     print(f"\n信号版本: {config['id']} - {config['name']}")
     print(f"  {config['description']}")
     print(f"交易策略: 阈值≥{config['threshold']}, 止盈{config['take_profit']*100:.0f}%, "
@@ -496,30 +685,14 @@ def main():
     # 信号版本字段已合并进 config（get_active_config 返回 SIGNAL_VERSIONS[v] + DEFAULT_TRADING_PARAMS），
     # 直接把 config 当 strategy 传给下游函数即可（calc_moving_avg / save_signals 用 strategy['xxx'] 读）
     signals_df = calc_moving_avg(df, target_date, strategy=config,
-                                 threshold=config['threshold'], pool_codes=pool_codes)
+                                 threshold=config['threshold'], pool_codes=pool_codes,
+                                 cache=cache)
 
     if signals_df.empty:
         print("没有找到有效的信号数据")
         return
 
-    # 强制让 CSV 内 date 字段 == 文件名日期（避免 calc_moving_avg 兜底到旧日期时文件名与内容打架）
-    signals_df['date'] = target_date
-
-    if not args.no_cooldown:
-        signals_dir = SIGNALS_BASE_DIR / config['output_subdir']
-        before = len(signals_df)
-        signals_df = apply_cooldown(signals_df, target_date, signals_dir,
-                                    cooldown_days=config['cooldown_days'])
-        after = len(signals_df)
-        if before != after:
-            print(f"冷却过滤: {before} → {after} (过滤 {before - after} 只)")
-
-    # === 生成 SELL 信号（检查持仓的止盈/止损）===
-    sell_signals = generate_sell_signals(df, target_date, config)
-    if not sell_signals.empty:
-        # 合并 BUY 和 SELL 信号（SELL 行覆盖同 code 的 BUY 行）
-        signals_df = pd.concat([signals_df, sell_signals], ignore_index=True)
-        signals_df = signals_df.drop_duplicates(subset=['code'], keep='last')
+    signals_df = finalize_signals(df, signals_df, target_date, config, no_cooldown)
 
     buy_signals = signals_df[signals_df['signal'] == 'BUY']
     sell_signals = signals_df[signals_df['signal'] == 'SELL']
@@ -548,5 +721,112 @@ def main():
     print(f"\n完成! {len(buy_signals)} 只买入 + {len(sell_signals)} 只卖出")
 
 
+def run_range(df: pd.DataFrame, config: dict, start_date: str, end_date: str,
+              pool_codes: set = None, no_cooldown: bool = False, cache: dict = None):
+    """
+    区间模式：一次计算 [start_date, end_date] 内每个交易日的信号，逐日保存 signals_{date}.csv
+
+    结果与逐日运行单日模式相同：冷却期按日从索引判断（当天保存的 BUY 计入之后日期的冷却），
+    SELL 信号由一次扫描到区间末尾的首次触达日逐日判断。
+    """
+    print(f"\n信号版本: {config['id']} - {config['name']}")
+    print(f"  {config['description']}")
+    print(f"交易策略: 阈值≥{config['threshold']}, 止盈{config['take_profit']*100:.0f}%, "
+          f"止损{config['stop_loss']*100:.0f}%, 冷却{config['cooldown_days']}天")
+    print(f"计算区间: {start_date} ~ {end_date}")
+    print(f"输出目录: result/signals/{config['output_subdir']}/")
+
+    frames = calc_signal_range(df, start_date, end_date, strategy=config,
+                               threshold=config['threshold'], pool_codes=pool_codes,
+                               cache=cache)
+    if not frames:
+        print("区间内没有找到有效的信号数据")
+        return
+
+    dates = sorted(frames)
+    cooldown_index = None
+    if not no_cooldown and config['cooldown_days'] > 0:
+        first_dt = datetime.strptime(dates[0], '%Y%m%d')
+        since = (first_dt - timedelta(days=config['cooldown_days'] + 5)).strftime('%Y%m%d')
+        cooldown_index = load_cooldown_index(SIGNALS_BASE_DIR / config['output_subdir'], since=since)
+    scanned = scan_sim_positions(config, dates[-1])
+
+    total_buy = total_sell = 0
+    for date in dates:
+        signals_df = finalize_signals(df, frames[date], date, config, no_cooldown,
+                                      cooldown_index=cooldown_index, scanned=scanned)
+        save_signals(signals_df, date, strategy=config, update_latest=(date == dates[-1]))
+
+        is_buy = signals_df['signal'] == 'BUY'
+        if cooldown_index is not None:
+            # 当天的 BUY 作为之后日期的冷却兜底来源（与逐日运行时读到刚写的文件一致）
+            cooldown_index['buys'][date] = set(signals_df.loc[is_buy, 'code'])
+        n_buy, n_sell = int(is_buy.sum()), int((signals_df['signal'] == 'SELL').sum())
+        total_buy += n_buy
+        total_sell += n_sell
+        print(f"  {date}: {n_buy} 只买入 + {n_sell} 只卖出")
+
+    print(f"\n完成! {len(dates)} 个交易日，共 {total_buy} 次买入 + {total_sell} 次卖出")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='计算每日买入信号')
+    parser.add_argument('--date', type=str, default=None,
+                        help='目标日期 (YYYYMMDD)，默认为最新交易日')
+    parser.add_argument('--strategy-version', type=str, default=DEFAULT_STRATEGY_VERSION,
+                        choices=list(SIGNAL_VERSIONS.keys()),
+                        help=f'信号版本（默认 {DEFAULT_STRATEGY_VERSION}，可选: {list(SIGNAL_VERSIONS.keys())}）')
+    parser.add_argument('--start', type=str, default=None,
+                        help='区间模式开始日期 (YYYYMMDD)，逐日输出区间内每个交易日的信号（忽略 --date）')
+    parser.add_argument('--end', type=str, default=None,
+                        help='区间模式结束日期 (YYYYMMDD)，默认为最新交易日')
+    parser.add_argument('--all-versions', action='store_true',
+                        help='一次计算全部已注册信号版本（共用一次加载的评分历史，忽略 --strategy-version）')
+    parser.add_argument('--no-cooldown', action='store_true', help='禁用冷却期过滤')
+    parser.add_argument('--pool', type=str, default=str(DEFAULT_POOL),
+                        help=f'股票池 CSV 文件路径（默认 {DEFAULT_POOL.name}）')
+    parser.add_argument('--all-stocks', action='store_true',
+                        help='使用全市场股票（忽略 --pool）')
+    args = parser.parse_args()
+
+    # 获取指定版本配置（不修改全局 active config，不写盘）
+    versions = list(SIGNAL_VERSIONS.keys()) if args.all_versions else [args.strategy_version]
+    configs = [get_config_for_version(v) for v in versions]
+
+    print("加载评分历史数据...")
+    df = load_score_history()
+    print(f"共 {len(df)} 条记录，{df['code'].nunique()} 只股票")
+
+    # 加载股票池
+    pool_codes = None
+    if not args.all_stocks:
+        pool_path = Path(args.pool) if args.pool else DEFAULT_POOL
+        pool_codes = load_pool_codes(pool_path)
+        if pool_codes:
+            print(f"股票池: {pool_path.name}（{len(pool_codes)} 只自选股）")
+        else:
+            print(f"⚠️  股票池 {pool_path} 不存在，使用全市场")
+
+    # 各版本共用交易日列表、窗口均分和评分矩阵（lookback 相同的版本只算一次）
+    cache = {}
+
+    if args.start:
+        start_date = args.start.replace('-', '').replace('/', '')
+        end_date = args.end.replace('-', '').replace('/', '') if args.end else df['date'].max()
+        for config in configs:
+            run_range(df, config, start_date, end_date, pool_codes=pool_codes,
+                      no_cooldown=args.no_cooldown, cache=cache)
+        return
+
+    if args.date:
+        target_date = args.date.replace('-', '').replace('/', '')
+    else:
+        target_date = df['date'].max()
+
+    for config in configs:
+        run_version(df, config, target_date, pool_codes=pool_codes,
+                    no_cooldown=args.no_cooldown, cache=cache)
+
+
 if __name__ == '__main__':
     main()
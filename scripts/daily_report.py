@@ -12,20 +12,14 @@ import requests
 import re
 from datetime import datetime, timedelta
 
-# ==================== 上一交易日 ====================
-TRADE_DAYS_FILE = "/home/admin/AUTO-STOCK/data/calendar/trade_days.csv"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.datafactory.score_store import list_score_dates, read_date_records
+from src.datafactory.trade_calendar import get_calendar
 
+# ==================== 上一交易日 ====================
 def get_last_trading_day(date_str):
     """根据给定日期返回上一个交易日（跳过周末和假节日）"""
-    with open(TRADE_DAYS_FILE, 'r') as f:
-        reader = csv.DictReader(f)
-        dates = [row['trade_date'] for row in reader]
-    date_map = {d.replace('-', ''): i for i, d in enumerate(dates)}
-    if date_str in date_map:
-        idx = date_map[date_str]
-        if idx > 0:
-            return dates[idx - 1].replace('-', '')
-    return None
+    return get_calendar().nth_trade_day(date_str, -1)
 
 # ==================== 配置 ====================
 RESULT_DIR = "/home/admin/AUTO-STOCK/result/daily_score"
@@ -95,20 +89,14 @@ def get_stock_price_info(codes):
 
 # ==================== 读取数据 ====================
 def read_result(date_str):
-    filepath = os.path.join(RESULT_DIR, f"batch_result_{date_str}.csv")
-    if not os.path.exists(filepath):
-        return None
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return list(csv.DictReader(f))
+    return read_date_records(date_str)
 
 def read_all_history():
     history = {}
-    for fname in os.listdir(RESULT_DIR):
-        if fname.startswith("batch_result_") and fname.endswith(".csv"):
-            date_str = fname.replace("batch_result_", "").replace(".csv", "")
-            data = read_result(date_str)
-            if data:
-                history[date_str] = data
+    for date_str in list_score_dates():
+        data = read_result(date_str)
+        if data:
+            history[date_str] = data
     return history
 
 def read_self_stock():
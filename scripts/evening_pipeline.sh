@@ -41,7 +41,7 @@ fi
 
 # 步骤1: 批量多因子评分
 step 1 "批量多因子评分"
-printf "2\nstock_pool.csv\n\n" | python3 main.py || fail "批量评分"
+printf "3\nstock_pool.csv\n\n" | python3 main.py || fail "批量评分"
 echo "✅  批量评分完成"
 
 # 步骤2: 评分-价格历史表
@@ -60,8 +60,7 @@ echo "✅  每日报告完成"
 
 # 步骤4: 计算信号（v1 + v2）
 step 4 "计算每日信号(v1+v2)"
-python3 scripts/calc_signals.py --strategy-version v1 || fail "calc_signals v1"
-python3 scripts/calc_signals.py --strategy-version v2 || fail "calc_signals v2"
+python3 scripts/calc_signals.py --all-versions || fail "calc_signals"
 echo "✅  信号计算完成"
 
 # 步骤5: 模拟交易（实盘执行，写 portfolio.db）
@@ -19,6 +19,9 @@ from pathlib import Path
 
 # 项目根目录
 ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.datafactory.price_panel import PricePanel
 
 
 def load_stock_pool(pool_path):
@@ -29,7 +32,18 @@ def load_stock_pool(pool_path):
 
 
 def load_price_data(code, year):
-    """加载股票价格数据"""
+    """加载股票价格数据（优先从共享行情面板切片）"""
+    panel = PricePanel.open()
+    if panel is not None and panel.fresh_codes([code]):
+        sl = panel.date_slice(f"{year}0101", f"{year}1231")
+        j = panel.code_index(code)
+        close = np.asarray(panel.field("close")[sl, j])
+        mask = np.asarray(panel.field("present")[sl, j]) & ~np.isnan(close)
+        return pd.DataFrame({
+            "date": panel.date_strs[sl][mask],
+            "close": close[mask],
+        })
+
     price_file = ROOT_DIR / "data" / "price" / f"{code}.csv"
     if not price_file.exists():
         return None
@@ -13,6 +13,10 @@
   # 预计算200只自选股的每日评分（如果已有1385只的评分，可从中筛选，不需要重算）
   python scripts/precompute_scores.py --start 20250102 --end 20251231 \
     --pool stock_self_selected.csv --output result/backtest/scores_2025_200
+
+  # 多进程全量重算（按日期分片，默认进程数 = CPU 核数）
+  python scripts/precompute_scores.py --start 20160104 --end 20261231 \
+    --output result/backtest/scores_full --workers 8
 """
 
 import argparse
@@ -28,6 +32,10 @@ def main():
     parser.add_argument("--end", required=True, help="结束日期 YYYYMMDD")
     parser.add_argument("--pool", default="", help="股票池CSV路径")
     parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数（默认 CPU 核数，1 为单进程）")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="不使用 data/snapshot/scorer 预加载快照，直接解析 CSV")
     args = parser.parse_args()
 
     from src.backtest.scorer import HistoricalScorer, precompute_scores
@@ -48,6 +56,8 @@ def main():
         stock_codes=stock_codes,
         rebalance_days=1,  # 每个交易日都算
         output_dir=args.output,
+        workers=args.workers,
+        use_snapshot=not args.no_snapshot,
     )
 
     if not scores_df.empty:
@@ -11,15 +11,39 @@
 
   # 导出结果CSV
   python scripts/run_grid_search.py --output result/backtest/2025_每日_200_信号/grid_results.csv
+
+  # 止盈/止损/冷却期组合批量同步回测（结果相同、更快）
+  python scripts/run_grid_search.py --batched
+
+  # 逐级减半：短窗口筛选后晋级长窗口，预算 60 次全区间回测
+  python scripts/run_grid_search.py --strategy halving --budget 60
+
+  # TPE 采样：止盈/止损按连续区间搜索，20 轮无提升即停止
+  python scripts/run_grid_search.py --strategy tpe --budget 100 --patience 20
+
+结果每完成一组即写入 result/backtest/grid_results.jsonl，中途退出后重跑会跳过已完成的组合
 """
 
 import argparse
 import sys
 import os
+from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+def _default_tag(args) -> str:
+    """结果集名称：--output 相对 result/backtest 的路径（去掉扩展名），否则为评分目录名"""
+    if args.output:
+        output = Path(args.output).resolve().with_suffix("")
+        backtest_dir = Path(__file__).resolve().parent.parent / "result" / "backtest"
+        try:
+            return str(output.relative_to(backtest_dir))
+        except ValueError:
+            return str(output.name)
+    return f"{Path(args.scores_dir).name}/grid_results"
+
+
 def main():
     parser = argparse.ArgumentParser(description="信号策略参数网格搜索")
     parser.add_argument("--scores-dir", default="result/backtest/2025_每日_200_信号", help="评分数据目录")
@@ -28,6 +52,22 @@ def main():
     parser.add_argument("--end", default="", help="结束日期")
     parser.add_argument("--output", default="", help="导出CSV路径")
     parser.add_argument("--top", type=int, default=20, help="显示前N个策略")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="网格搜索并行进程数（默认 CPU 核数，1 为单进程）")
+    parser.add_argument("--batched", action="store_true",
+                        help="止盈/止损/冷却期组合批量同步回测（BatchSignalEngine，结果一致、更快）")
+    parser.add_argument("--strategy", default="grid", choices=["grid", "halving", "tpe"],
+                        help="搜索策略：grid=穷举，halving=逐级减半，tpe=TPE 采样")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="计算预算（全区间回测次数，halving / tpe 使用）")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="tpe 连续多少轮最佳夏普未提升即停止")
+    parser.add_argument("--min-sharpe", type=float, default=None,
+                        help="halving 中间级夏普低于此值的组合提前淘汰")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--no-store", action="store_true",
+                        help="不读写结果库 result/backtest/grid_results.jsonl（默认断点续跑、复用已有结果）")
+    parser.add_argument("--tag", default="", help="结果库中的结果集名称（默认取 --output 路径或评分目录名）")
     args = parser.parse_args()
 
     from src.backtest.grid_search import (
@@ -35,6 +75,7 @@ def main():
         print_top_strategies,
         run_grid_search,
     )
+    from src.backtest.result_store import ResultStore
 
     print("⏳ 加载数据...")
     data = load_backtest_data(args.scores_dir, args.pool)
@@ -55,12 +96,25 @@ def main():
         "max_positions": [10],
         "cooldown_days": [0, 1, 3],
     }
+    if args.strategy == "tpe":
+        # TPE 可直接在连续区间上采样
+        param_grid["take_profit"] = (10.0, 30.0)
+        param_grid["stop_loss"] = (5.0, 15.0)
 
     results = run_grid_search(
         data=data,
         param_grid=param_grid,
         start_date=args.start,
         end_date=args.end,
+        workers=args.workers,
+        batched=args.batched,
+        strategy=args.strategy,
+        budget=args.budget,
+        patience=args.patience,
+        min_sharpe=args.min_sharpe,
+        seed=args.seed,
+        store=None if args.no_store else ResultStore(),
+        tag=args.tag or _default_tag(args),
     )
 
     print_top_strategies(results, top_n=args.top)
@@ -18,6 +18,7 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.backtest.grid_search import load_backtest_data, run_grid_search, print_top_strategies
+from src.backtest.result_store import ResultStore
 from src.backtest.signal_engine import SignalConfig, SignalEngine
 
 
@@ -55,7 +56,14 @@ def main():
     parser = argparse.ArgumentParser(description="启动信号回测（30分阈值）")
     parser.add_argument("--year", type=int, nargs="+", required=True, help="回测年份")
     parser.add_argument("--pool", default="stock_self_selected.csv", help="股票池文件")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="网格搜索并行进程数（默认 CPU 核数，1 为单进程）")
+    parser.add_argument("--batched", action="store_true",
+                        help="止盈/止损/冷却期组合批量同步回测（BatchSignalEngine，结果一致、更快）")
+    parser.add_argument("--no-store", action="store_true",
+                        help="不读写结果库 result/backtest/grid_results.jsonl（默认断点续跑、复用已有结果）")
     args = parser.parse_args()
+    store = None if args.no_store else ResultStore()
 
     for year in args.year:
         print()
@@ -115,6 +123,10 @@ def main():
             start_date=f"{year}0101",
             end_date=f"{year}1231",
             top_n=10,
+            workers=args.workers,
+            batched=args.batched,
+            store=store,
+            tag=f"{year}/{year}_每日_200_启动信号/grid_results",
         )
 
         # 打印最优策略
@@ -9,6 +9,8 @@ v2 保守策略回测（首次突破 + 资金固定 + 2 天建仓）
 
 用法：
   python scripts/run_v2_backtest.py --year 2022 2023 2024 2025 2026
+  python scripts/run_v2_backtest.py --year 2025 --array-engine   # 数组版引擎，结果相同、更快
+  python scripts/run_v2_backtest.py --year 2025 --batched        # 止盈/止损/冷却组合批量回测
 """
 
 import argparse
@@ -22,7 +24,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pandas as pd
 
 from src.backtest.grid_search import load_backtest_data, run_grid_search, print_top_strategies
-from src.backtest.signal_engine import SignalConfig, SignalEngine
+from src.backtest.result_store import ResultStore
+from src.backtest.signal_engine import ArraySignalEngine, SignalConfig, SignalEngine
 from src.backtest.strategies import get_strategy
 
 # 从注册表取 v2 策略（避免硬编码 v2 参数，加 v3 复制此脚本改一行即可）
@@ -66,7 +69,17 @@ def main():
     parser = argparse.ArgumentParser(description="v2 保守策略回测")
     parser.add_argument("--year", type=int, nargs="+", required=True, help="回测年份")
     parser.add_argument("--pool", default="stock_self_selected.csv", help="股票池文件")
+    parser.add_argument("--array-engine", action="store_true",
+                        help="使用数组版引擎 ArraySignalEngine（结果与默认引擎一致）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="网格搜索并行进程数（默认 CPU 核数，1 为单进程）")
+    parser.add_argument("--batched", action="store_true",
+                        help="止盈/止损/冷却期组合批量同步回测（BatchSignalEngine，结果一致、更快）")
+    parser.add_argument("--no-store", action="store_true",
+                        help="不读写结果库 result/backtest/grid_results.jsonl（默认断点续跑、复用已有结果）")
     args = parser.parse_args()
+    store = None if args.no_store else ResultStore()
+    engine_cls = ArraySignalEngine if args.array_engine else SignalEngine
 
     for year in args.year:
         print()
@@ -131,6 +144,11 @@ def main():
             start_date=f"{year}0101",
             end_date=f"{year}1231",
             top_n=10,
+            array_engine=args.array_engine,
+            workers=args.workers,
+            batched=args.batched,
+            store=store,
+            tag=f"v2_首次突破_资金固定_2天建仓/{year}/grid_results",
         )
 
         # 第二轮：按财报评分排序
@@ -143,6 +161,11 @@ def main():
             start_date=f"{year}0101",
             end_date=f"{year}1231",
             top_n=10,
+            array_engine=args.array_engine,
+            workers=args.workers,
+            batched=args.batched,
+            store=store,
+            tag=f"v2_首次突破_资金固定_2天建仓/{year}/grid_results_finance",
         )
 
         # 打印最优策略（按总评分）
@@ -175,7 +198,7 @@ def main():
             max_pos_pct_basis=V2_PARAMS["max_pos_pct_basis"],
             build_days=V2_PARAMS["build_days"],
         )
-        engine = SignalEngine(best_config)
+        engine = engine_cls(best_config)
         result_total = engine.run(
             all_scores=data["all_scores"],
             trade_dates=data["trade_dates"],
@@ -202,7 +225,7 @@ def main():
             max_pos_pct_basis=V2_PARAMS["max_pos_pct_basis"],
             build_days=V2_PARAMS["build_days"],
         )
-        engine_f = SignalEngine(best_config_f)
+        engine_f = engine_cls(best_config_f)
         result_finance = engine_f.run(
             all_scores=data["all_scores"],
             trade_dates=data["trade_dates"],
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+滚动优化（walk-forward）回测：训练窗口搜索参数，测试窗口样本外检验，拼接样本外净值
+
+用法:
+  # 默认：训练 120 天 / 测试 20 天滚动
+  python scripts/run_walk_forward.py --scores-dir result/backtest/2025_每日_200_信号
+
+  # 扩张训练窗口 + 逐级减半搜索，按折 4 进程并行
+  python scripts/run_walk_forward.py --anchored --strategy halving --workers 4
+
+  # 导出每折明细和样本外净值
+  python scripts/run_walk_forward.py --output result/backtest/walk_forward
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="滚动优化回测")
+    parser.add_argument("--scores-dir", default="result/backtest/2025_每日_200_信号", help="评分数据目录")
+    parser.add_argument("--pool", default="stock_self_selected.csv", help="股票池")
+    parser.add_argument("--start", default="", help="开始日期")
+    parser.add_argument("--end", default="", help="结束日期")
+    parser.add_argument("--train-days", type=int, default=120, help="训练窗口（交易日）")
+    parser.add_argument("--test-days", type=int, default=20, help="测试窗口（交易日）")
+    parser.add_argument("--anchored", action="store_true", help="训练窗口从第一天起扩张（默认滚动）")
+    parser.add_argument("--strategy", default="grid", choices=["grid", "halving", "tpe"],
+                        help="每折训练窗口的搜索策略")
+    parser.add_argument("--budget", type=float, default=None, help="每折计算预算（halving / tpe）")
+    parser.add_argument("--batched", action="store_true",
+                        help="止盈/止损/冷却期组合批量同步回测（BatchSignalEngine，结果一致、更快）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="按折并行的进程数（默认 CPU 核数，1 为单进程）")
+    parser.add_argument("--output", default="", help="导出目录（folds.csv / nav.csv）")
+    args = parser.parse_args()
+
+    from src.backtest.grid_search import load_backtest_data
+    from src.backtest.walk_forward import print_walk_forward, run_walk_forward
+
+    print("⏳ 加载数据...")
+    data = load_backtest_data(args.scores_dir, args.pool)
+    if data is None:
+        print("❌ 数据加载失败")
+        return
+
+    print(f"  评分日期: {len(data['trade_dates'])} 天")
+    print(f"  股票数: {len(data['name_map'])} 只")
+    print()
+
+    param_grid = {
+        "buy_threshold": [25, 28, 30, 32, 35],
+        "take_profit": [10, 15, 20, 25, 30],
+        "stop_loss": [5, 8, 10, 15],
+        "max_pos_pct": [20],
+        "max_positions": [10],
+        "cooldown_days": [0, 1, 3],
+    }
+    if args.strategy == "tpe":
+        # TPE 可直接在连续区间上采样
+        param_grid["take_profit"] = (10.0, 30.0)
+        param_grid["stop_loss"] = (5.0, 15.0)
+
+    result = run_walk_forward(
+        data=data,
+        param_grid=param_grid,
+        train_days=args.train_days,
+        test_days=args.test_days,
+        start_date=args.start,
+        end_date=args.end,
+        anchored=args.anchored,
+        workers=args.workers,
+        strategy=args.strategy,
+        batched=args.batched,
+        budget=args.budget,
+    )
+
+    print_walk_forward(result)
+
+    if args.output and not result.folds.empty:
+        os.makedirs(args.output, exist_ok=True)
+        result.folds.to_csv(os.path.join(args.output, "folds.csv"), index=False, encoding="utf-8-sig")
+        pd.DataFrame(result.nav, columns=["date", "nav"]).to_csv(
+            os.path.join(args.output, "nav.csv"), index=False, encoding="utf-8-sig")
+        print(f"✅ 结果已导出: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
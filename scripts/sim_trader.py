@@ -6,11 +6,13 @@
 - 买入：读 BUY 信号，按策略参数执行
 - 卖出：读 SELL 信号（由 calc_signals 基于 K 线扫描生成），执行平仓
 - 止盈止损的计算逻辑在 calc_signals.py，本脚本只负责执行
+- 历史回放（--start/--end）：同一套逻辑在内存账户上逐日交易，结束后一次写入独立账户
 
 用法：
   python scripts/sim_trader.py --date 20260611
   python scripts/sim_trader.py --date 20260611 --dry-run    # 只打印不执行
   python scripts/sim_trader.py --date 20260611 --mode REAL --dry-run  # 检查实盘触达
+  python scripts/sim_trader.py --start 20260101 --end 20260611 --strategy-version v2  # 历史回放
 """
 
 import argparse
@@ -23,23 +25,69 @@ import pandas as pd
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from src.portfolio import TradingManager  # noqa
+from src.portfolio import PortfolioDB, ReplayPortfolio, TradingManager  # noqa
 
 
 # ============== 主流程 ==============
 
-def get_latest_price(code: str, score_history: pd.DataFrame, target_date: str) -> float:
-    """从 score_price_history 获取收盘价"""
-    df = score_history[(score_history['code'] == code) & (score_history['date'] == target_date)]
-    if df.empty:
-        return None
-    return float(df.iloc[0]['close_price'])
+def _quiet(*args, **kwargs):
+    pass
+
+
+def get_latest_prices(codes: list, target_date: str) -> dict:
+    """批量获取 target_date 收盘价 {code: price}（无价格的代码不在结果中）
+
+    评分-价格历史里的 close_price 本就取自行情面板，这里直接按 (日期, 代码) 读面板当日截面
+    （内存映射，只触及这一行），面板中没有或已过期的代码回退读该股价格文件。
+    """
+    from src.analyzer.kline_analyzer import load_close_prices
+    codes = list(dict.fromkeys(str(c).zfill(6) for c in codes))
+    if not codes:
+        return {}
+    return load_close_prices(codes, target_date).to_dict()
+
+
+def scan_position_stops(positions: list, config: dict, target_date: str) -> pd.DataFrame:
+    """直接按 K 线批量扫描账户持仓的止盈止损，返回与信号 CSV 同列的 SELL 行
+
+    信号 CSV 里的 SELL 针对 SIM 账户持仓；其他账户（实盘检查）用本函数按自身持仓计算。
+    """
+    from src.backtest.stop_scanner import scan_stops
 
+    valid = [p for p in positions if p.get('cost_price', 0) > 0 and p.get('buy_date')]
+    checks = scan_stops(
+        [{'code': p['code'], 'cost': p['cost_price'],
+          'buy_date': str(p['buy_date'])[:10].replace('-', '')} for p in valid],
+        config['take_profit'], config['stop_loss'], end_date=target_date,
+    )
+
+    type_names = {'take_profit': '止盈触达', 'stop_loss': '止损触达', 'both': '同日双触达（保守止损）'}
+    rows = [{
+        'code': p['code'],
+        'signal': 'SELL',
+        'sell_price': check['sell_price'],
+        'sell_reason': f"{type_names[check['type']]} {check['trigger_date']}",
+        'sell_type': check['type'],
+    } for p, check in zip(valid, checks) if check['triggered']]
+    return pd.DataFrame(rows, columns=['code', 'signal', 'sell_price', 'sell_reason', 'sell_type'])
 
 
 def run_auto_trade(date: str, dry_run: bool = False, mode: str = 'SIM',
-                   strategy_version: str = 'v1'):
-    print(f"=== 模拟仓自动交易 - {date} (mode={mode}, strategy={strategy_version}) ===")
+                   strategy_version: str = 'v1', tm=None, verbose: bool = True):
+    """
+    按 date 的信号执行一天的买卖并保存收盘快照
+
+    Args:
+        tm: 交易账户；默认为 mode 对应的 TradingManager，回放时传入 ReplayPortfolio
+        verbose: False 时不打印过程（回放逐日调用）
+
+    Returns:
+        收盘快照 dict；信号文件不存在返回 None
+    """
+    log = print if verbose else _quiet
+    # calc_signals 的 SELL 信号针对库中默认 SIM 账户的持仓，只有该账户直接使用
+    signal_sells = tm is None and mode == 'SIM'
+    log(f"=== 模拟仓自动交易 - {date} (mode={mode}, strategy={strategy_version}) ===")
 
     from src.backtest.strategies import get_strategy
     strategy = get_strategy(strategy_version)
@@ -47,50 +95,57 @@ def run_auto_trade(date: str, dry_run: bool = False, mode: str = 'SIM',
     # 1. 加载信号（按版本分目录）
     sig_file = ROOT / "result" / "signals" / strategy['output_subdir'] / f"signals_{date}.csv"
     if not sig_file.exists():
-        print(f"❌ {sig_file} 不存在，请先运行 calc_signals.py --strategy-version {strategy_version}")
-        return
+        log(f"❌ {sig_file} 不存在，请先运行 calc_signals.py --strategy-version {strategy_version}")
+        return None
     signals = pd.read_csv(sig_file, dtype={'code': str})
 
-    # 2. 加载最新价格
-    sh_path = ROOT / "result" / "score_price_history.csv"
-    if not sh_path.exists():
-        print(f"❌ {sh_path} 不存在")
-        return
-    score_history = pd.read_csv(sh_path, dtype={'code': str})
-
-    # 3. 初始化
+    # 2. 初始化
     from src.backtest.strategies import get_config_for_version
     config = get_config_for_version(strategy_version)
 
-    tm = TradingManager(mode=mode)
+    if tm is None:
+        tm = TradingManager(mode=mode)
     account = tm.get_account()
 
-    print(f"账户: 初始 ¥{account['initial_capital']:.0f}, "
+    # 3. 一次取齐持仓 + 信号股票的当日收盘价（持仓按收盘价估值）
+    positions = tm.get_positions()
+    prices = get_latest_prices([p['code'] for p in positions] + signals['code'].tolist(), date)
+    log(f"收盘价: {len(prices)} 只（{date}）")
+    if not dry_run:
+        held_prices = {p['code']: prices[p['code']] for p in positions if p['code'] in prices}
+        if held_prices:
+            tm.update_prices(held_prices)
+
+    log(f"账户: 初始 ¥{account['initial_capital']:.0f}, "
           f"当前 ¥{account['current_capital']:.0f}")
-    print(f"信号版本: {config['id']} - {config['name']}")
-    print(f"交易策略: 阈值≥{config['threshold']}, "
+    log(f"信号版本: {config['id']} - {config['name']}")
+    log(f"交易策略: 阈值≥{config['threshold']}, "
           f"单股上限{config['max_position_pct']*100:.0f}%, "
           f"最多{config['max_positions']}只")
 
     # 4. 读取 SELL 信号执行卖出（SELL 由 calc_signals 基于 K 线生成）
-    sell_signals = signals[signals['signal'] == 'SELL'].copy()
-    positions = tm.get_positions()
+    if signal_sells:
+        sell_signals = signals[signals['signal'] == 'SELL'].copy()
+    else:
+        # 信号 CSV 的 SELL 只覆盖默认 SIM 账户持仓，其他账户（实盘检查 / 回放）按自身持仓扫描 K 线
+        sell_signals = scan_position_stops(positions, config, date)
     held_codes = {p['code'] for p in positions}
 
     if not sell_signals.empty:
         sell_in_hold = sell_signals[sell_signals['code'].isin(held_codes)]
         if not sell_in_hold.empty:
-            print(f"\n=== 卖出信号: {len(sell_in_hold)} 只 ===")
+            log(f"\n=== 卖出信号: {len(sell_in_hold)} 只 ===")
             for _, row in sell_in_hold.iterrows():
                 code = row['code']
                 pos = next((p for p in positions if p['code'] == code), None)
                 if not pos:
                     continue
 
-                sell_price = float(row.get('sell_price', 0)) or float(row.get('close_price', 0))
+                sell_price = (float(row.get('sell_price', 0)) or float(row.get('close_price', 0))
+                              or prices.get(code, 0))
                 reason = str(row.get('sell_reason', '信号触发'))
 
-                print(f"  {code} {pos['name']:8s} "
+                log(f"  {code} {pos['name']:8s} "
                       f"成本:{pos['cost_price']:.2f} 卖出价:{sell_price:.2f} 原因:{reason}")
 
                 if dry_run:
@@ -99,9 +154,9 @@ def run_auto_trade(date: str, dry_run: bool = False, mode: str = 'SIM',
                 result = tm.sell(code, sell_price, pos['shares'], reason=reason)
                 if result['success']:
                     emoji = '🟢' if '止盈' in reason else '🛑'
-                    print(f"    {emoji} {reason}: 盈亏 {result['profit']:.2f}")
+                    log(f"    {emoji} {reason}: 盈亏 {result['profit']:.2f}")
     else:
-        print(f"\n当前持仓: {len(positions)} 只，无卖出信号")
+        log(f"\n当前持仓: {len(positions)} 只，无卖出信号")
 
     # 5. 重新获取可用资金
     account = tm.get_account()
@@ -119,27 +174,29 @@ def run_auto_trade(date: str, dry_run: bool = False, mode: str = 'SIM',
     buy_signals = buy_signals[~buy_signals['code'].isin(held_codes)]
     buy_signals = buy_signals.sort_values('avg7_score', ascending=False)
 
-    print(f"\n=== 买入信号: {len(buy_signals)} 只（已过滤已持仓） ===")
+    log(f"\n=== 买入信号: {len(buy_signals)} 只（已过滤已持仓） ===")
 
     if dry_run:
-        print("(dry run 模式，不实际下单)")
+        log("(dry run 模式，不实际下单)")
     else:
         # 按策略最大持仓数
         available_slots = config['max_positions'] - len(positions)
         if available_slots <= 0:
-            print(f"已达最大持仓数 {config['max_positions']}，不买入")
+            log(f"已达最大持仓数 {config['max_positions']}，不买入")
         else:
             for _, row in buy_signals.iterrows():
                 if available_slots <= 0:
                     break
                 # 现金至少保留 5%
                 if cash <= total_assets * 0.05:
-                    print(f"现金不足 5%，停止买入")
+                    log(f"现金不足 5%，停止买入")
                     break
 
                 code = row['code']
                 name = row['name']
                 price = float(row['close_price'])
+                if pd.isna(price) or price <= 0:
+                    price = prices.get(code, 0)
                 if not price or price <= 0:
                     continue
 
@@ -154,18 +211,64 @@ def run_auto_trade(date: str, dry_run: bool = False, mode: str = 'SIM',
                                 score=float(row['avg7_score']),
                                 reason=f"信号触发 ({row['avg7_score']:.1f}分)")
                 if result['success']:
-                    print(f"  ✅ 买入: {code} {name} {shares}股 @ {price:.2f} "
+                    log(f"  ✅ 买入: {code} {name} {shares}股 @ {price:.2f} "
                           f"={result['total_cost']:.2f}")
                     cash -= result['total_cost']
                     available_slots -= 1
 
     # 7. 收盘后保存快照
     snapshot = tm.save_snapshot(date)
-    print(f"\n=== 收盘快照 ===")
-    print(f"  总资产: ¥{snapshot['total_assets']:.2f}")
-    print(f"  现金:   ¥{snapshot['cash']:.2f}")
-    print(f"  持仓:   ¥{snapshot['position_value']:.2f}")
-    print(f"  净值:   {snapshot['nav']:.4f}")
+    log(f"\n=== 收盘快照 ===")
+    log(f"  总资产: ¥{snapshot['total_assets']:.2f}")
+    log(f"  现金:   ¥{snapshot['cash']:.2f}")
+    log(f"  持仓:   ¥{snapshot['position_value']:.2f}")
+    log(f"  净值:   {snapshot['nav']:.4f}")
+    return snapshot
+
+
+def run_replay(start_date: str, end_date: str = None, strategy_version: str = 'v1',
+               initial_capital: float = 1000000, account_name: str = None) -> int:
+    """
+    历史回放：对区间内每个有信号文件的交易日，用 run_auto_trade 的同一套决策逻辑在内存账户上交易，
+    结束后一次事务写入 portfolio.db 的独立 SIM 账户（同名账户清空重写，默认模拟仓不受影响）
+
+    卖出按回放账户自身持仓扫描 K 线止盈止损；信号文件中的冷却期过滤仍是按默认模拟仓计算的。
+
+    Returns:
+        回放账户 id；区间内没有信号文件返回 None
+    """
+    from src.backtest.strategies import get_strategy
+    strategy = get_strategy(strategy_version)
+    account_name = account_name or f"回放_{strategy_version}"
+
+    sig_dir = ROOT / "result" / "signals" / strategy['output_subdir']
+    dates = sorted(
+        f.stem.replace('signals_', '') for f in sig_dir.glob('signals_*.csv')
+        if f.stem != 'signals_latest'
+    )
+    dates = [d for d in dates if d.isdigit() and d >= start_date and (not end_date or d <= end_date)]
+    if not dates:
+        print(f"❌ {sig_dir} 下没有 {start_date} ~ {end_date or '最新'} 的信号文件，"
+              f"请先运行 calc_signals.py --strategy-version {strategy_version} --start {start_date}")
+        return None
+
+    print(f"=== 历史回放 - {dates[0]} ~ {dates[-1]}（{len(dates)} 个交易日，strategy={strategy_version}）===")
+    portfolio = ReplayPortfolio(initial_capital)
+    n_trades = 0
+    for date in dates:
+        portfolio.set_date(date)
+        snapshot = run_auto_trade(date, strategy_version=strategy_version, tm=portfolio, verbose=False)
+        day_trades = len(portfolio.trades) - n_trades
+        n_trades = len(portfolio.trades)
+        print(f"  {date}: 净值 {snapshot['nav']:.4f}  持仓 {len(portfolio.positions)} 只  "
+              f"交易 {day_trades} 笔")
+
+    account_id = portfolio.write(PortfolioDB(), account_name)
+    final = portfolio.nav[dates[-1]]
+    print(f"\n✅ 已写入账户「{account_name}」(id={account_id}): "
+          f"{len(portfolio.trades)} 笔交易，{len(portfolio.nav)} 天净值，"
+          f"期末净值 {final['nav']:.4f}（总资产 ¥{final['total_assets']:.2f}）")
+    return account_id
 
 
 def main():
@@ -173,8 +276,23 @@ def main():
     parser.add_argument('--date', type=str, default=None, help='目标日期 YYYYMMDD')
     parser.add_argument('--dry-run', action='store_true', help='仅展示，不实际交易')
     parser.add_argument('--mode', type=str, default='SIM', help='SIM 或 REAL（仅做检查用）')
+    parser.add_argument('--strategy-version', type=str, default='v1', help='信号版本（读取对应目录的信号）')
+    parser.add_argument('--start', type=str, default=None,
+                        help='历史回放开始日期 YYYYMMDD（内存账户逐日交易，结束后一次写入独立账户）')
+    parser.add_argument('--end', type=str, default=None, help='历史回放结束日期 YYYYMMDD（默认到最新信号）')
+    parser.add_argument('--account', type=str, default=None, help='回放账户名（默认 回放_{信号版本}）')
+    parser.add_argument('--capital', type=float, default=1000000, help='回放初始资金')
     args = parser.parse_args()
 
+    if args.start:
+        if args.mode != 'SIM':
+            print("❌ 历史回放只写入独立的模拟账户，不支持 --mode REAL")
+            sys.exit(1)
+        run_replay(args.start.replace('-', ''), args.end.replace('-', '') if args.end else None,
+                   strategy_version=args.strategy_version, initial_capital=args.capital,
+                   account_name=args.account)
+        return
+
     # 安全锁：sim_trader 只能跑 SIM，绝不能给实盘下单
     if args.mode == 'REAL' and not args.dry_run:
         print("=" * 60)
@@ -195,7 +313,8 @@ def main():
         print("⚠️  --mode REAL + --dry-run：仅检查实盘触达情况，不实际下单")
 
     date = args.date or datetime.now().strftime('%Y%m%d')
-    run_auto_trade(date, dry_run=args.dry_run, mode=args.mode)
+    run_auto_trade(date, dry_run=args.dry_run, mode=args.mode,
+                   strategy_version=args.strategy_version)
 
 
 if __name__ == '__main__':
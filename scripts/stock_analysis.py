@@ -13,6 +13,10 @@ import sys
 import requests
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.datafactory.score_store import list_score_dates, read_date_records
+from src.datafactory.trade_calendar import get_calendar
+
 # ==================== 配置 ====================
 RESULT_DIR = "/home/admin/AUTO-STOCK/result/daily_score"
 REPORT_DIR = "/home/admin/AUTO-STOCK/reports/individual"
@@ -21,8 +25,6 @@ POOL_FILE = "/home/admin/AUTO-STOCK/stock_pool.csv"
 HIST_PRICE_DIR = "/home/admin/AUTO-STOCK/data/hist_price/"
 MX_APIKEY = os.environ.get("MX_APIKEY", "mkt_65LysqK_vB294d8JkHEvwazCMpoMSfdWJFC0Ia1mYuo")
 PROGRESS_FILE = "/tmp/stock_analysis_progress_{code}.json"
-TRADE_DAYS_FILE = "/home/admin/AUTO-STOCK/data/calendar/trade_days.csv"
-
 FACTOR_LIST = ['关注度', '单日涨跌幅', '股息率', '今年相对大盘强弱', '财报', '5日涨跌幅', '行业相对强弱', '新闻', '资金流向']
 
 FACTOR_WEIGHT = {
@@ -133,19 +135,9 @@ def get_multi_day_changepct(code, date_list):
     return None
 
 # ==================== 上一交易日 ====================
-TRADE_DAYS_FILE = "/home/admin/AUTO-STOCK/data/calendar/trade_days.csv"
-
 def get_last_trading_day(date_str):
     """根据给定日期返回上一个交易日"""
-    with open(TRADE_DAYS_FILE, 'r') as f:
-        reader = csv.DictReader(f)
-        dates = [row['trade_date'] for row in reader]
-    date_map = {d.replace('-', ''): i for i, d in enumerate(dates)}
-    if date_str in date_map:
-        idx = date_map[date_str]
-        if idx > 0:
-            return dates[idx - 1].replace('-', '')
-    return None
+    return get_calendar().nth_trade_day(date_str, -1)
 
 # ==================== 计算因子变化 ====================
 def get_factor_change(code, current_date, history):
@@ -197,11 +189,10 @@ def search_stock_by_name(query, pool):
 # ==================== 读取数据 ====================
 def read_all_history():
     history = {}
-    for fname in os.listdir(RESULT_DIR):
-        if fname.startswith("batch_result_") and fname.endswith(".csv"):
-            date_str = fname.replace("batch_result_", "").replace(".csv", "")
-            with open(os.path.join(RESULT_DIR, fname), 'r', encoding='utf-8') as f:
-                history[date_str] = {r['code']: r for r in csv.DictReader(f)}
+    for date_str in list_score_dates():
+        rows = read_date_records(date_str)
+        if rows is not None:
+            history[date_str] = {r['code']: r for r in rows}
     return history
 
 def get_stock_history(code, history):
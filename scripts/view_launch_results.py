@@ -18,15 +18,29 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
 
+from src.backtest.result_store import ResultStore
+
+
+_STORE = None
+
+
+def _store():
+    """结果库（首次使用时读入）"""
+    global _STORE
+    if _STORE is None:
+        _STORE = ResultStore()
+    return _STORE
+
 
 def load_grid_results(year, sort_by_finance=False):
-    """加载网格搜索结果"""
-    base_dir = Path(__file__).parent.parent / "result" / "backtest" / str(year)
-    if sort_by_finance:
-        csv_path = base_dir / f"{year}_每日_200_启动信号" / "grid_results_finance.csv"
-    else:
-        csv_path = base_dir / f"{year}_每日_200_启动信号" / "grid_results.csv"
+    """加载网格搜索结果：优先读结果库，结果库中没有时回退到旧的 CSV"""
+    name = "grid_results_finance" if sort_by_finance else "grid_results"
+    df = _store().frame(f"{year}/{year}_每日_200_启动信号/{name}")
+    if df is not None:
+        return df
 
+    base_dir = Path(__file__).parent.parent / "result" / "backtest" / str(year)
+    csv_path = base_dir / f"{year}_每日_200_启动信号" / f"{name}.csv"
     if not csv_path.exists():
         return None
 
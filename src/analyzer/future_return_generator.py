@@ -23,6 +23,8 @@ AUTO_STOCK_ROOT = "/home/admin/AUTO-STOCK"
 sys.path.insert(0, AUTO_STOCK_ROOT)
 os.chdir(AUTO_STOCK_ROOT)  # 切换到项目根目录
 
+from src.datafactory.trade_calendar import get_calendar
+
 # 配置日志
 LOG_DIR = os.path.join(AUTO_STOCK_ROOT, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -41,15 +43,12 @@ logger = logging.getLogger()
 # 路径配置
 DAILY_SCORE_DIR = os.path.join(AUTO_STOCK_ROOT, "result", "daily_score")
 PRICE_DIR = os.path.join(AUTO_STOCK_ROOT, "data", "price")
-TRADE_CALENDAR = os.path.join(AUTO_STOCK_ROOT, "data", "calendar", "trade_days.csv")
 FUTURE_RETURNS_DIR = os.path.join(AUTO_STOCK_ROOT, "result", "future_returns")
 
 
 def get_trade_calendar() -> list:
-    """读取交易日历"""
-    with open(TRADE_CALENDAR, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        return [row['trade_date'].replace('-', '') for row in reader]
+    """读取交易日历（YYYYMMDD 列表）"""
+    return [str(d) for d in get_calendar().days]
 
 
 def get_nth_trade_day(score_date: str, n: int) -> Optional[str]:
@@ -63,20 +62,19 @@ def get_nth_trade_day(score_date: str, n: int) -> Optional[str]:
     Returns:
         第N个交易日的日期 (YYYYMMDD)，如果不够则返回None
     """
-    calendar = get_trade_calendar()
+    calendar = get_calendar()
     
-    try:
-        idx = calendar.index(score_date)
-    except ValueError:
+    idx = calendar.index_of(score_date)
+    if idx is None:
         logger.warning(f"⚠️ 评分日期 {score_date} 不在日历中，跳过")
         return None
     
-    target_idx = idx + n
-    if target_idx >= len(calendar):
+    target = calendar.date_at(idx + n)
+    if target is None:
         logger.warning(f"⚠️ {score_date} 往后{n}个交易日超出范围(评分日在日历第{idx+1}天，共{len(calendar)}天)")
         return None
     
-    return calendar[target_idx]
+    return target
 
 
 def get_price(code: str, date: str) -> Optional[float]:
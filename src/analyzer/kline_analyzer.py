@@ -4,48 +4,88 @@ K线图分析器 - 第一层：生成股票评分-价格历史基础表
 
 功能：
   - 遍历所有 batch_result_*.csv（每日评分）
-  - 匹配对应日期的收盘价（data/price/*.csv）
-  - 生成一张大表：date, code, name, close_price, total_score
-  - 输出到 result/score_price_history.csv
+  - 匹配对应日期的收盘价（优先行情面板 data/panel，缺失时读个股价格）
+  - 生成评分-价格历史：date, code, name, close_price, total_score, finance_score
+  - 按日期分区保存到 result/score_price_history/history_YYYYMMDD.csv，
+    每日增量只写当天一个分区，不再重写整张大表
+
+单文件 result/score_price_history.csv 继续保留，供 Web 前端直接读取：
+新日期的行直接追加到文件末尾，只有补跑历史日期时才从分区整体重写。
+导出文件按 (date, code) 排序（与逐日追加的结果相同），每只股票的行按日期升序，
+前端取每只股票的最后一行即最新价。
+分区目录为空时 load_score_price_history() 回退到该文件，
+首次增量运行时自动拆分为分区。
 
 用法：
-  python3 kline_analyzer.py          # 全量生成（首次）
+  python3 kline_analyzer.py          # 补齐缺失日期的分区
+  python3 kline_analyzer.py --force  # 全量重建所有分区
   python3 kline_analyzer.py --date 20260525   # 增量追加指定日期
   python3 kline_analyzer.py --code 600519    # 查询单只股票历史
 """
 
 import pandas as pd
 import numpy as np
-import glob
+import json
 import re
 import os
 import sys
 import argparse
 from pathlib import Path
+from typing import List, Optional
 
 # 路径配置
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-DATA_DIR = BASE_DIR / "data" / "price"
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from src.datafactory.price_panel import PricePanel
+from src.datafactory.price_store import PRICE_DIR, load_price_frame, read_price_csv
+from src.datafactory.score_store import list_score_dates, read_date
+
 RESULT_DIR = BASE_DIR / "result"
-SCORE_DIR = RESULT_DIR / "daily_score"
-OUTPUT_FILE = RESULT_DIR / "score_price_history.csv"
+OUTPUT_FILE = RESULT_DIR / "score_price_history.csv"  # 单文件导出（Web 前端读取）
+HISTORY_DIR = RESULT_DIR / "score_price_history"
+EXPORT_STATE_FILE = HISTORY_DIR / "_export.json"
+
+# 全量构建的起始评分日（更早的评分口径不同，不纳入历史表）
+HISTORY_START = "20260101"
+
+COLUMNS = ['date', 'code', 'name', 'close_price', 'total_score', 'finance_score']
+
+_PART_RE = re.compile(r'^history_(\d{8})\.csv$')
+
 
+def _part_path(date: str) -> Path:
+    return HISTORY_DIR / f"history_{date}.csv"
+
+
+def list_history_dates() -> List[str]:
+    """已生成分区的日期（升序）"""
+    if not HISTORY_DIR.exists():
+        return []
+    return sorted(m.group(1) for m in map(_PART_RE.match, os.listdir(HISTORY_DIR)) if m)
+
+
+# ============================================================
+# 收盘价匹配
+# ============================================================
 
 def load_price(code: str, date: str) -> float | None:
     """
-    从 data/price/{code}.csv 读取指定日期的收盘价
+    读取个股指定日期的收盘价（列式存储优先，回退 data/price/{code}.csv）
     date: YYYYMMDD 格式
     返回: 收盘价或None（停牌/数据缺失）
     """
-    price_file = DATA_DIR / f"{code}.csv"
-    if not price_file.exists():
-        return None
     try:
-        df = pd.read_csv(price_file)
-        # 日期列可能是 int 或 str
-        row = df[df['日期'] == int(date)]
-        if len(row) == 0:
-            row = df[df['日期'].astype(str) == date]
+        df = load_price_frame(code)
+        if df is None:
+            price_file = PRICE_DIR / f"{code}.csv"
+            if not price_file.exists():
+                return None
+            df = read_price_csv(price_file)
+            if df is None:
+                return None
+        row = df[df['日期'] == pd.Timestamp(date)]
         if len(row) == 0:
             return None
         price = row['收盘'].values[0]
@@ -56,84 +96,188 @@ def load_price(code: str, date: str) -> float | None:
         return None
 
 
-def build_history_for_date(score_date: str) -> pd.DataFrame:
+def load_close_prices(codes: List[str], date: str) -> pd.Series:
     """
-    生成指定日期的 (code, name, close_price, total_score) 记录
+    批量获取某日收盘价
+
+    面板中存在且未过期的代码直接取当日截面，其余逐只读取。
+    返回: Series(index=code, value=收盘价)，无价格的代码不在结果中
     """
-    batch_file = SCORE_DIR / f"batch_result_{score_date}.csv"
-    if not batch_file.exists():
-        print(f"  评分文件不存在: {batch_file}")
-        return pd.DataFrame()
+    prices = {}
+    rest = list(codes)
+
+    panel = PricePanel.open()
+    if panel is not None:
+        i = panel.date_index(date)
+        if i is not None:
+            fresh = panel.fresh_codes(codes)
+            close = np.asarray(panel.field('close')[i])
+            present = np.asarray(panel.field('present')[i])
+            rest = []
+            for code in codes:
+                if code not in fresh:
+                    rest.append(code)
+                    continue
+                j = panel.code_index(code)
+                if present[j] and not np.isnan(close[j]):
+                    prices[code] = float(close[j])
+
+    for code in rest:
+        price = load_price(code, date)
+        if price is not None:
+            prices[code] = price
+
+    return pd.Series(prices, dtype=np.float64)
+
+
+# ============================================================
+# 构建
+# ============================================================
 
-    df = pd.read_csv(batch_file)
-    records = []
+def build_history_for_date(score_date: str) -> pd.DataFrame:
+    """
+    生成指定日期的 (code, name, close_price, total_score, finance_score) 记录
 
-    for _, row in df.iterrows():
-        code = str(row.get('code', '')).zfill(6)
-        name = str(row.get('name', ''))
-        score = float(row.get('total_score', 0))
-        finance_score = float(row.get('财报', 0))
+    当日评分与收盘价一次性按 code 合并，无价格（停牌等）的股票跳过
+    """
+    scores = read_date(score_date)
+    if scores is None:
+        print(f"  评分文件不存在: batch_result_{score_date}.csv")
+        return pd.DataFrame()
+    if scores.empty:
+        return pd.DataFrame()
 
-        close_price = load_price(code, score_date)
-        if close_price is None:
-            continue  # 跳过无价格数据（停牌等）
+    codes = scores['code'].tolist()
+    names = scores['name'].tolist() if 'name' in scores.columns else [''] * len(scores)
+    result = pd.DataFrame({
+        'date': score_date,
+        'code': codes,
+        'name': [str(n) for n in names],
+        'total_score': pd.to_numeric(scores['total_score']).astype(np.float64).to_numpy()
+        if 'total_score' in scores.columns else 0.0,
+        'finance_score': pd.to_numeric(scores['财报']).astype(np.float64).to_numpy()
+        if '财报' in scores.columns else 0.0,
+    })
+
+    prices = load_close_prices(list(dict.fromkeys(codes)), score_date)
+    result['close_price'] = result['code'].map(prices)
+    result = result[result['close_price'].notna()]
+
+    return result[COLUMNS].reset_index(drop=True)
+
+
+def write_partition(date: str, records: pd.DataFrame) -> Path:
+    """写入（覆盖）单日分区"""
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    path = _part_path(date)
+    tmp_path = path.with_suffix('.csv.tmp')
+    records.sort_values('code', kind='mergesort').to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def migrate_legacy_history() -> int:
+    """把旧版单文件 score_price_history.csv 拆分为日期分区（仅补齐缺失日期）"""
+    if not OUTPUT_FILE.exists():
+        return 0
+    df = pd.read_csv(OUTPUT_FILE, dtype={'code': str})
+    existing = set(list_history_dates())
+    count = 0
+    for date, group in df.groupby(df['date'].astype(str), sort=True):
+        if date in existing:
+            continue
+        write_partition(date, group)
+        count += 1
+    print(f"📦 旧版历史表已拆分为 {count} 个日期分区 → {HISTORY_DIR}")
+    return count
 
-        records.append({
-            'date': score_date,
-            'code': code,
-            'name': name,
-            'close_price': close_price,
-            'total_score': score,
-            'finance_score': finance_score,
-        })
 
-    return pd.DataFrame(records)
+def _export_signature() -> Optional[list]:
+    try:
+        st = os.stat(OUTPUT_FILE)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
 
 
-def build_full_history(force: bool = False) -> pd.DataFrame:
+def export_history(date: str = None) -> None:
     """
-    全量生成：遍历所有 batch_result 文件，构建历史大表
+    更新单文件导出 score_price_history.csv
+
+    date 晚于导出文件中的最新日期、且导出文件自上次写入后未被改动时，
+    只把该日分区（已按 code 排序）追加到文件末尾；否则从全部分区重写。
+    两种方式得到的文件都按 (date, code) 排序，行顺序与走哪条路径无关
     """
-    if OUTPUT_FILE.exists() and not force:
-        print(f"历史文件已存在: {OUTPUT_FILE}")
-        print("使用 --force 强制重新生成")
-        return pd.read_csv(OUTPUT_FILE, dtype={'code': str})
+    state = {}
+    if EXPORT_STATE_FILE.exists():
+        try:
+            with open(EXPORT_STATE_FILE, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+    can_append = (
+        date is not None
+        and _part_path(date).exists()
+        and state.get('sig') is not None
+        and state.get('sig') == _export_signature()
+        and date > state.get('last_date', '')
+    )
+
+    if can_append:
+        records = pd.read_csv(_part_path(date), dtype={'code': str})
+        records.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
+        last_date = date
+    else:
+        result = load_score_price_history()
+        if result.empty:
+            return
+        # 与逐日追加一致：日期在前，同一天内按代码
+        result = result.sort_values(['date', 'code'], kind='mergesort')
+        result.to_csv(OUTPUT_FILE, index=False)
+        last_date = list_history_dates()[-1]
 
-    # 找到所有评分文件
-    score_files = sorted(glob.glob(str(SCORE_DIR / "batch_result_2026*.csv")))
-    print(f"找到 {len(score_files)} 个评分文件")
+    state = {'last_date': last_date, 'sig': _export_signature()}
+    with open(EXPORT_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    print(f"📄 已{'追加' if can_append else '重写'}导出: {OUTPUT_FILE}")
 
-    all_records = []
 
-    for f in score_files:
-        m = re.search(r'batch_result_(\d+)', f)
-        if not m:
-            continue
-        date_str = m.group(1)
-        print(f"\n处理 {date_str} ...", end=" ", flush=True)
+def build_full_history(force: bool = False, start: str = HISTORY_START) -> pd.DataFrame:
+    """
+    全量生成：遍历 start 之后的所有评分日，逐日写分区
 
-        batch_df = pd.read_csv(f)
-        count = len(batch_df)
-        print(f"评分 {count} 只", end=" → ", flush=True)
+    force=False 时只生成缺失的分区；force=True 时全部重建
+    """
+    dates = [d for d in list_score_dates() if d >= start]
+    print(f"找到 {len(dates)} 个评分日")
+
+    existing = set() if force else set(list_history_dates())
+    todo = [d for d in dates if d not in existing]
+    if not todo:
+        print(f"历史分区已是最新: {HISTORY_DIR}")
+        print("使用 --force 强制重新生成")
+        return load_score_price_history()
 
+    written = 0
+    for date_str in todo:
+        print(f"\n处理 {date_str} ...", end=" ", flush=True)
         date_records = build_history_for_date(date_str)
         if len(date_records):
-            all_records.append(date_records)
+            write_partition(date_str, date_records)
+            written += 1
             print(f"价格匹配成功 {len(date_records)} 只", end="", flush=True)
         else:
             print("价格匹配失败", end="", flush=True)
 
-    if not all_records:
+    if not written:
         print("\n没有生成任何数据！")
         return pd.DataFrame()
 
-    result = pd.concat(all_records, ignore_index=True)
-    result = result.sort_values(['code', 'date']).reset_index(drop=True)
-
-    # 保存
-    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    result.to_csv(OUTPUT_FILE, index=False)
-    print(f"\n\n✅ 已保存: {OUTPUT_FILE}")
+    print()
+    export_history()
+    result = load_score_price_history()
+    print(f"\n✅ 已保存: {HISTORY_DIR}（写入 {written} 个分区）")
     print(f"   总记录数: {len(result)}")
     print(f"   股票数: {result['code'].nunique()}")
     print(f"   日期范围: {result['date'].min()} ~ {result['date'].max()}")
@@ -141,15 +285,68 @@ def build_full_history(force: bool = False) -> pd.DataFrame:
     return result
 
 
+def incremental_build(date: str) -> pd.DataFrame:
+    """
+    增量追加：只生成指定日期的数据，写入（覆盖）该日分区
+    """
+    print(f"增量生成日期: {date}")
+
+    if not list_history_dates() and OUTPUT_FILE.exists():
+        migrate_legacy_history()
+
+    new_records = build_history_for_date(date)
+    if len(new_records) == 0:
+        print("没有生成本次数据")
+        return pd.DataFrame()
+
+    write_partition(date, new_records)
+    export_history(date)
+
+    print(f"✅ 追加完成: {len(new_records)} 条")
+    print(f"   分区数: {len(list_history_dates())}")
+
+    return new_records
+
+
+# ============================================================
+# 读取
+# ============================================================
+
+def load_score_price_history(start: str = None, end: str = None) -> pd.DataFrame:
+    """
+    读取评分-价格历史（按 code, date 排序，与旧版单文件格式一致）
+
+    分区目录为空时回退到旧版 score_price_history.csv；
+    均不存在返回空 DataFrame
+    """
+    dates = [d for d in list_history_dates()
+             if not ((start and d < start) or (end and d > end))]
+
+    if dates:
+        frames = [pd.read_csv(_part_path(d), dtype={'code': str}) for d in dates]
+        df = pd.concat(frames, ignore_index=True)
+    elif not list_history_dates() and OUTPUT_FILE.exists():
+        df = pd.read_csv(OUTPUT_FILE, dtype={'code': str})
+        d = df['date'].astype(str)
+        if start:
+            df = df[d >= start]
+        if end:
+            df = df[d <= end]
+    else:
+        return pd.DataFrame(columns=COLUMNS)
+
+    return df.sort_values(['code', 'date'], kind='mergesort').reset_index(drop=True)
+
+
 def query_stock(code: str) -> pd.DataFrame:
     """
     查询单只股票的历史数据（用于K线图展示）
     """
-    if not OUTPUT_FILE.exists():
-        print("历史文件不存在，请先运行全量生成")
+    df = load_score_price_history()
+    if df.empty:
+        print("历史数据不存在，请先运行全量生成")
         return pd.DataFrame()
 
-    df = pd.read_csv(OUTPUT_FILE, dtype={'code': str})
     code = str(code).zfill(6)
     stock_df = df[df['code'] == code].sort_values('date')
 
@@ -168,34 +365,6 @@ def query_stock(code: str) -> pd.DataFrame:
     return stock_df
 
 
-def incremental_build(date: str) -> pd.DataFrame:
-    """
-    增量追加：只生成指定日期的数据，追加到大表
-    """
-    print(f"增量生成日期: {date}")
-
-    new_records = build_history_for_date(date)
-    if len(new_records) == 0:
-        print("没有生成本次数据")
-        return pd.DataFrame()
-
-    if OUTPUT_FILE.exists():
-        existing = pd.read_csv(OUTPUT_FILE, dtype={'code': str})
-        # 移除该日期已有数据，替换为新数据
-        existing = existing[existing['date'] != date]
-        result = pd.concat([existing, new_records], ignore_index=True)
-    else:
-        result = new_records
-
-    result = result.sort_values(['code', 'date']).reset_index(drop=True)
-    result.to_csv(OUTPUT_FILE, index=False)
-
-    print(f"✅ 追加完成: {len(new_records)} 条")
-    print(f"   总记录: {len(result)}")
-
-    return result
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="股票评分-价格历史分析器")
     parser.add_argument('--force', action='store_true', help='强制重新生成全量历史')
@@ -208,4 +377,4 @@ if __name__ == "__main__":
     elif args.date:
         incremental_build(args.date)
     else:
-        build_full_history(force=args.force)
\ No newline at end of file
+        build_full_history(force=args.force)
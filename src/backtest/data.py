@@ -6,8 +6,8 @@
 """
 
 import os
-import re
-import glob
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Optional, Tuple, Dict
@@ -15,6 +15,12 @@ from typing import List, Optional, Tuple, Dict
 import pandas as pd
 import numpy as np
 
+from src.datafactory.price_store import STORE_DIR as PRICE_STORE_DIR, load_price_frame, read_price_csv
+from src.datafactory.score_store import (
+    list_score_dates, read_date as read_score_date, read_range as read_score_range,
+)
+from src.datafactory.trade_calendar import get_calendar
+
 # 路径配置
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
@@ -29,30 +35,19 @@ CALENDAR_FILE = DATA_DIR / "calendar" / "trade_days.csv"
 # ============================================================
 
 def load_trade_days() -> pd.DatetimeIndex:
-    """加载交易日历，返回 DatetimeIndex"""
-    df = pd.read_csv(CALENDAR_FILE)
-    col = df.columns[0]  # 通常是 'trade_date'
-    return pd.to_datetime(df[col])
+    """加载交易日历，返回 DatetimeIndex（基于进程内共享日历）"""
+    days = get_calendar().days
+    return pd.DatetimeIndex(pd.to_datetime(days.astype(str), format='%Y%m%d'))
 
 
 def get_trade_days_between(start: str, end: str) -> List[str]:
     """获取两个日期之间的交易日列表（YYYYMMDD 格式）"""
-    all_days = load_trade_days()
-    start_dt = pd.to_datetime(start, format='%Y%m%d')
-    end_dt = pd.to_datetime(end, format='%Y%m%d')
-    mask = (all_days >= start_dt) & (all_days <= end_dt)
-    return [d.strftime('%Y%m%d') for d in all_days[mask]]
+    return get_calendar().between(start, end)
 
 
 def get_next_trade_day(date: str, offset: int = 1) -> Optional[str]:
     """获取 date 之后第 offset 个交易日"""
-    all_days = load_trade_days()
-    dt = pd.to_datetime(date, format='%Y%m%d')
-    idx = all_days.searchsorted(dt)
-    target_idx = idx + offset
-    if 0 <= target_idx < len(all_days):
-        return all_days[target_idx].strftime('%Y%m%d')
-    return None
+    return get_calendar().shift(date, offset)
 
 
 # ============================================================
@@ -60,15 +55,8 @@ def get_next_trade_day(date: str, offset: int = 1) -> Optional[str]:
 # ============================================================
 
 def get_available_score_dates() -> List[str]:
-    """从 batch_result 文件名提取已有评分日期，排序返回"""
-    pattern = str(SCORE_DIR / "batch_result_*.csv")
-    files = glob.glob(pattern)
-    dates = []
-    for f in files:
-        m = re.search(r'batch_result_(\d{8})', f)
-        if m:
-            dates.append(m.group(1))
-    return sorted(dates)
+    """已有评分日期（评分分区存储 ∪ batch_result 文件），排序返回"""
+    return list_score_dates()
 
 
 # ============================================================
@@ -76,19 +64,13 @@ def get_available_score_dates() -> List[str]:
 # ============================================================
 
 def load_batch_scores(date: str) -> Optional[pd.DataFrame]:
-    """加载指定日期的批量评分结果
+    """加载指定日期的批量评分结果（优先读评分分区存储，回退 CSV）
 
     Returns:
         DataFrame with columns: code, name, total_score, 各因子分
         code 为 zfill(6) 字符串
     """
-    path = SCORE_DIR / f"batch_result_{date}.csv"
-    if not path.exists():
-        return None
-
-    df = pd.read_csv(path, dtype={'code': str})
-    df['code'] = df['code'].astype(str).str.zfill(6)
-    return df
+    return read_score_date(date)
 
 
 def load_all_scores() -> pd.DataFrame:
@@ -97,19 +79,105 @@ def load_all_scores() -> pd.DataFrame:
     Returns:
         DataFrame: date, code, name, total_score, 各因子分
     """
-    dates = get_available_score_dates()
-    frames = []
-    for d in dates:
-        df = load_batch_scores(d)
-        if df is not None:
-            df['date'] = d
-            frames.append(df)
-
-    if not frames:
-        return pd.DataFrame()
+    return read_score_range()
 
-    result = pd.concat(frames, ignore_index=True)
-    return result
+
+# ============================================================
+# 价格缓存（进程内 LRU）
+# ============================================================
+
+# 内存预算（MB），可用环境变量 PRICE_CACHE_MB 覆盖
+PRICE_CACHE_MB = int(os.environ.get('PRICE_CACHE_MB', '512'))
+
+
+def _file_sig(path: Path) -> Optional[Tuple[int, int]]:
+    """文件签名 (mtime_ns, size)，不存在返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _PriceCache:
+    """按股票代码缓存已解析的价格 DataFrame
+
+    - 源文件（CSV / 列式存储）的 mtime/size 变化即失效
+    - 超出内存预算时按最近最少使用淘汰
+    """
+
+    def __init__(self, budget_mb: int):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()  # code -> (sig, df, nbytes)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, code: str, sig) -> Optional[pd.DataFrame]:
+        item = self._items.get(code)
+        if item is not None and item[0] == sig:
+            self._items.move_to_end(code)
+            self.hits += 1
+            return item[1]
+        if item is not None:
+            self._drop(code)
+        self.misses += 1
+        return None
+
+    def put(self, code: str, sig, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(index=True, deep=False).sum())
+        if nbytes > self.budget_bytes:
+            return
+        if code in self._items:
+            self._drop(code)
+        self._items[code] = (sig, df, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.budget_bytes and self._items:
+            oldest = next(iter(self._items))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, code: str):
+        _, _, nbytes = self._items.pop(code)
+        self._bytes -= nbytes
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._items),
+            'memory_mb': self._bytes / 1024 / 1024,
+            'budget_mb': self.budget_bytes / 1024 / 1024,
+        }
+
+
+_PRICE_CACHE = _PriceCache(PRICE_CACHE_MB)
+
+
+def set_price_cache_budget(budget_mb: int):
+    """调整价格缓存内存预算（MB），超出部分立即淘汰"""
+    _PRICE_CACHE.budget_bytes = budget_mb * 1024 * 1024
+    while _PRICE_CACHE._bytes > _PRICE_CACHE.budget_bytes and _PRICE_CACHE._items:
+        _PRICE_CACHE._drop(next(iter(_PRICE_CACHE._items)))
+        _PRICE_CACHE.evictions += 1
+
+
+def price_cache_stats() -> Dict[str, float]:
+    """价格缓存命中统计"""
+    return _PRICE_CACHE.stats()
+
+
+def clear_price_cache():
+    """清空价格缓存（计数器保留）"""
+    _PRICE_CACHE.clear()
 
 
 # ============================================================
@@ -119,20 +187,27 @@ def load_all_scores() -> pd.DataFrame:
 def load_price_df(code: str) -> Optional[pd.DataFrame]:
     """加载个股价格数据，按日期排序
 
+    优先读取列式价格存储（data/price_store），未转换或已过期时回退到 CSV。
+    结果进入进程内 LRU 缓存，多次调用返回同一对象，调用方不得原地修改。
+
     Returns:
         DataFrame: 日期(datetime), 收盘, 成交额, 开盘, 最高, 最低
     """
     code = str(code).zfill(6)
     path = PRICE_DIR / f"{code}.csv"
-    if not path.exists():
+    sig = (_file_sig(path), _file_sig(PRICE_STORE_DIR / f"{code}.npz"))
+    if sig == (None, None):
         return None
 
-    df = pd.read_csv(path)
-    if df.empty:
-        return None
+    df = _PRICE_CACHE.get(code, sig)
+    if df is not None:
+        return df
 
-    df['日期'] = pd.to_datetime(df['日期'].astype(str), format='%Y%m%d')
-    df = df.sort_values('日期').reset_index(drop=True)
+    df = load_price_frame(code)
+    if df is None and path.exists():
+        df = read_price_csv(path)
+    if df is not None:
+        _PRICE_CACHE.put(code, sig, df)
     return df
 
 
@@ -223,14 +298,104 @@ def get_returns_matrix(codes: List[str], signal_date: str, hold_days: int) -> Di
     return result
 
 
+# ============================================================
+# 远期收益张量（批量预计算）
+# ============================================================
+
+@dataclass
+class ForwardReturnTensor:
+    """远期收益张量：values[信号日, 股票, 持有期]
+
+    与 get_forward_return 口径一致（T+1 开盘买入、T+1+h 收盘卖出、双边滑点），
+    数据不足处为 NaN。
+    """
+
+    dates: List[str]
+    codes: List[str]
+    hold_days: List[int]
+    values: np.ndarray
+    _date_idx: Dict[str, int] = field(default_factory=dict, repr=False)
+    _code_idx: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self._date_idx = {d: i for i, d in enumerate(self.dates)}
+        self._code_idx = {c: j for j, c in enumerate(self.codes)}
+
+    def get(self, codes: List[str], signal_date: str, hold_days: int) -> np.ndarray:
+        """按 codes 顺序返回收益数组（未知代码/日期为 NaN）"""
+        out = np.full(len(codes), np.nan)
+        i = self._date_idx.get(signal_date)
+        if i is None or hold_days not in self.hold_days:
+            return out
+        h = self.hold_days.index(hold_days)
+        cols = np.array([self._code_idx.get(c, -1) for c in codes], dtype=np.int64)
+        known = cols >= 0
+        out[known] = self.values[i, cols[known], h]
+        return out
+
+    def returns_dict(self, codes: List[str], signal_date: str, hold_days: int) -> Dict[str, float]:
+        """与 get_returns_matrix 相同的返回格式：{code: return_rate}，跳过数据不足的股票"""
+        rets = self.get(codes, signal_date, hold_days)
+        return {c: float(r) for c, r in zip(codes, rets) if not np.isnan(r)}
+
+
+def build_forward_return_tensor(codes: List[str], signal_dates: List[str],
+                                hold_days: List[int],
+                                slippage: float = 0.001) -> ForwardReturnTensor:
+    """一次性计算 codes × signal_dates × hold_days 的远期收益
+
+    每只股票只加载一次价格，按自身交易行定位 T+1 / T+1+h（停牌日不计），
+    与 get_forward_return 逐笔计算的结果一致。
+    """
+    codes = list(dict.fromkeys(str(c).zfill(6) for c in codes))
+    signal_dates = sorted(set(signal_dates))
+    hold_days = sorted(set(int(h) for h in hold_days))
+    values = np.full((len(signal_dates), len(codes), len(hold_days)), np.nan)
+
+    sig_dt = pd.to_datetime(signal_dates, format='%Y%m%d').values
+
+    for j, code in enumerate(codes):
+        df = load_price_df(code)
+        if df is None or '开盘' not in df.columns or '收盘' not in df.columns:
+            continue
+        dates = df['日期'].values.astype(sig_dt.dtype)
+        opens = df['开盘'].to_numpy(dtype=np.float64)
+        closes = df['收盘'].to_numpy(dtype=np.float64)
+        n = len(dates)
+
+        pos = np.searchsorted(dates, sig_dt, side='left')
+        found = (pos < n) & (dates[np.minimum(pos, n - 1)] == sig_dt)
+        entry_pos = pos + 1
+
+        for k, h in enumerate(hold_days):
+            exit_pos = entry_pos + h
+            ok = found & (exit_pos < n)
+            if not ok.any():
+                continue
+            entry_price = opens[entry_pos[ok]]
+            exit_price = closes[exit_pos[ok]]
+            with np.errstate(invalid='ignore'):
+                valid = ~np.isnan(entry_price) & ~np.isnan(exit_price) & (entry_price > 0)
+            entry_price = entry_price * (1 + slippage)
+            exit_price = exit_price * (1 - slippage)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rets = (exit_price - entry_price) / entry_price
+            rows = np.flatnonzero(ok)[valid]
+            values[rows, j, k] = rets[valid]
+
+    return ForwardReturnTensor(dates=signal_dates, codes=codes,
+                               hold_days=hold_days, values=values)
+
+
 # ============================================================
 # 基准收益
 # ============================================================
 
-def get_benchmark_return(date: str, hold_days: int, benchmark_codes: List[str] = None) -> Optional[float]:
+def get_benchmark_return(date: str, hold_days: int, benchmark_codes: List[str] = None,
+                         tensor: ForwardReturnTensor = None) -> Optional[float]:
     """计算基准（等权组合）的收益率
 
-    默认用 stock_pool 中所有股票等权
+    默认用 stock_pool 中所有股票等权；传入 tensor 时直接查远期收益张量
     """
     if benchmark_codes is None:
         # 用当天有评分的股票作为基准
@@ -239,7 +404,10 @@ def get_benchmark_return(date: str, hold_days: int, benchmark_codes: List[str] =
             return None
         benchmark_codes = scores['code'].tolist()
 
-    returns = get_returns_matrix(benchmark_codes, date, hold_days)
+    if tensor is not None:
+        returns = tensor.returns_dict(benchmark_codes, date, hold_days)
+    else:
+        returns = get_returns_matrix(benchmark_codes, date, hold_days)
     if not returns:
         return None
 
@@ -20,12 +20,15 @@ import numpy as np
 import pandas as pd
 
 from src.backtest.data import (
+    ForwardReturnTensor,
+    build_forward_return_tensor,
     get_available_score_dates,
     get_forward_return,
     get_returns_matrix,
     get_trade_days_between,
     load_batch_scores,
     load_stock_pool,
+    price_cache_stats,
 )
 
 # ============================================================
@@ -104,8 +107,14 @@ class BacktestEngine:
     def run(self) -> BacktestResult:
         """执行回测"""
         if self.config.mode == "live":
-            return self._run_live()
-        return self._run_scored()
+            result = self._run_live()
+        else:
+            result = self._run_scored()
+
+        stats = price_cache_stats()
+        print(f"📦 价格缓存: 命中 {stats['hits']}, 未命中 {stats['misses']}, "
+              f"淘汰 {stats['evictions']}, 占用 {stats['memory_mb']:.0f}MB")
+        return result
 
     def _run_live(self) -> BacktestResult:
         """live模式：使用 HistoricalScorer 实时计算因子
@@ -161,6 +170,13 @@ class BacktestEngine:
         print(f"\n📊 调仓日数量: {len(rebalance_dates)}")
         print(f"📊 Top-N: {cfg.top_n}, 持仓天数: {cfg.hold_days}")
         print(f"📊 交易成本: {cfg.cost_rate*100:.2f}% (双边)")
+
+        # 一次性计算全部调仓日的远期收益
+        t0 = time.time()
+        fwd = build_forward_return_tensor(
+            scores_df['code'].unique().tolist(), rebalance_dates[:-1], [cfg.hold_days]
+        )
+        print(f"📊 远期收益张量: {fwd.values.shape} ({time.time()-t0:.1f}s)")
         print()
 
         # 执行调仓循环
@@ -197,7 +213,7 @@ class BacktestEngine:
             all_codes = day_scores['code'].tolist()
 
             # 计算收益
-            top_returns = get_returns_matrix(
+            top_returns = fwd.returns_dict(
                 top_stocks['code'].tolist(), entry_date, cfg.hold_days
             )
 
@@ -208,7 +224,7 @@ class BacktestEngine:
             gross_return = sum(top_returns.values()) / len(top_returns)
             net_return = gross_return - cfg.cost_rate
 
-            bench_returns = get_returns_matrix(all_codes, entry_date, cfg.hold_days)
+            bench_returns = fwd.returns_dict(all_codes, entry_date, cfg.hold_days)
             bench_return = (
                 sum(bench_returns.values()) / len(bench_returns) if bench_returns else 0
             )
@@ -241,7 +257,7 @@ class BacktestEngine:
             # 计算因子IC
             self._calc_period_ic(
                 day_scores, entry_date, cfg.hold_days,
-                factor_ic_series, quintile_returns_acc,
+                factor_ic_series, quintile_returns_acc, fwd=fwd,
             )
 
             n_traded = len(top_returns)
@@ -312,7 +328,30 @@ class BacktestEngine:
                 pool_codes = set(pool_df['code'].tolist())
                 print(f"📋 股票池: {len(pool_codes)} 只股票")
 
-        # 3. 执行调仓循环
+        # 3. 预加载各期 T-1 评分，一次性计算全部调仓日的远期收益
+        period_scores: Dict[str, Optional[pd.DataFrame]] = {}
+        universe: List[str] = []
+        for entry_date in rebalance_dates[:-1]:
+            entry_idx_in_dates = score_dates.index(entry_date)
+            if entry_idx_in_dates == 0:
+                continue
+            score_date = score_dates[entry_idx_in_dates - 1]
+            if score_date in period_scores:
+                continue
+            df = load_batch_scores(score_date)
+            period_scores[score_date] = df
+            if df is not None:
+                codes = df['code']
+                if pool_codes is not None:
+                    codes = codes[codes.isin(pool_codes)]
+                universe.extend(codes.tolist())
+
+        t0 = time.time()
+        fwd = build_forward_return_tensor(universe, rebalance_dates[:-1], [cfg.hold_days])
+        print(f"📊 远期收益张量: {fwd.values.shape} ({time.time()-t0:.1f}s)")
+        print()
+
+        # 4. 执行调仓循环
         all_trades = []
         daily_nav = []
         benchmark_nav = []
@@ -341,7 +380,7 @@ class BacktestEngine:
             print(f"🔄 调仓 {i+1}/{len(rebalance_dates)-1}: 评分日 {score_date} → 买入日 {entry_date} → 卖出日 {exit_date}", end="")
 
             # 加载评分（用 T-1 日的 batch_result）
-            scores_df = load_batch_scores(score_date)
+            scores_df = period_scores.get(score_date)
             if scores_df is None or scores_df.empty:
                 print(" (无评分数据，跳过)")
                 continue
@@ -384,7 +423,7 @@ class BacktestEngine:
             all_codes = scores_df['code'].tolist()
 
             # 计算 top-N 组合收益（用 entry_date 作为信号日，T+1 开盘买入）
-            top_returns = get_returns_matrix(
+            top_returns = fwd.returns_dict(
                 top_stocks['code'].tolist(), entry_date, cfg.hold_days
             )
 
@@ -401,7 +440,7 @@ class BacktestEngine:
             net_return = gross_return - cfg.cost_rate  # 扣除交易成本
 
             # 基准：全部股票等权
-            bench_returns = get_returns_matrix(all_codes, entry_date, cfg.hold_days)
+            bench_returns = fwd.returns_dict(all_codes, entry_date, cfg.hold_days)
             bench_return = (
                 sum(bench_returns.values()) / len(bench_returns) if bench_returns else 0
             )
@@ -435,13 +474,13 @@ class BacktestEngine:
             # 计算因子IC（如果有多因子列）
             self._calc_period_ic(
                 scores_df, entry_date, cfg.hold_days,
-                factor_ic_series, quintile_returns_acc,
+                factor_ic_series, quintile_returns_acc, fwd=fwd,
             )
 
             n_traded = len(top_returns)
             print(f" ✓ 选{len(top_stocks)}股, 成交{n_traded}股, 收益{net_return*100:+.2f}%")
 
-        # 4. 汇总统计
+        # 5. 汇总统计
         result = self._build_result(
             all_trades, daily_nav, benchmark_nav,
             factor_ic_series, quintile_returns_acc,
@@ -456,14 +495,18 @@ class BacktestEngine:
         hold_days: int,
         ic_series: Dict[str, List[float]],
         quintile_acc: Dict[str, List[List[float]]],
+        fwd: Optional[ForwardReturnTensor] = None,
     ):
-        """计算当期各因子的IC值和分位收益"""
+        """计算当期各因子的IC值和分位收益（传入 fwd 时直接查远期收益张量）"""
         # 因子列（排除非因子列）
         exclude = {'code', 'name', 'total_score', 'rank', 'date'}
         factor_cols = [c for c in scores_df.columns if c not in exclude]
 
         # 计算所有股票的未来收益
-        all_returns = get_returns_matrix(scores_df['code'].tolist(), date, hold_days)
+        if fwd is not None:
+            all_returns = fwd.returns_dict(scores_df['code'].tolist(), date, hold_days)
+        else:
+            all_returns = get_returns_matrix(scores_df['code'].tolist(), date, hold_days)
         if len(all_returns) < 10:
             return
 
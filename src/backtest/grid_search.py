@@ -3,18 +3,27 @@
 
 对多种买入阈值、止盈、止损、仓位、冷却期组合进行回测，
 按夏普比率排序，输出最优策略。
+
+搜索策略可插拔（SEARCH_STRATEGIES）：穷举网格、逐级减半（短窗口筛选后晋级长窗口）、
+TPE 采样（支持连续区间），后两者按计算预算运行并支持按夏普提前停止。
 """
 
 import itertools
+import math
+import multiprocessing as mp
+import random
 import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
 from src.backtest.data import load_price_df, load_stock_pool
-from src.backtest.signal_engine import SignalConfig, SignalEngine, SignalResult
+from src.backtest.result_store import ResultStore, data_version, result_key
+from src.backtest.signal_engine import (BATCH_FIELDS, ArraySignalEngine, BatchSignalEngine,
+                                       SignalArrays, SignalConfig, SignalEngine, SignalResult)
+from src.datafactory.price_panel import PricePanel
 
 
 def load_backtest_data(scores_dir: str, stock_pool: str, year: int = None):
@@ -47,7 +56,26 @@ def load_backtest_data(scores_dir: str, stock_pool: str, year: int = None):
     # 加载价格（预构建 {code: {date_str: price}} 字典，避免重复查DataFrame）
     # 如果指定了年份，只加载当年数据，提高效率
     price_dict = {}
+    panel = PricePanel.open()
+    fresh = panel.fresh_codes(codes) if panel is not None else set()
+    if fresh:
+        sl = panel.date_slice(f"{year}0101", f"{year}1231") if year else panel.date_slice()
+        date_strs = panel.date_strs[sl]
+        present = panel.field('present')[sl]
+        close = panel.field('close')[sl]
+        for code in codes:
+            if code not in fresh:
+                continue
+            j = panel.code_index(code)
+            mask = np.asarray(present[:, j])
+            if mask.any():
+                price_dict[code] = dict(zip(date_strs[mask].tolist(),
+                                            np.asarray(close[:, j])[mask].tolist()))
+        print(f"  行情面板: {len(price_dict)} 只")
+
     for idx, code in enumerate(codes):
+        if code in fresh:
+            continue
         if (idx + 1) % 50 == 0:
             print(f"  加载价格数据: {idx+1}/{len(codes)}")
         pdf = load_price_df(code)
@@ -70,25 +98,461 @@ def load_backtest_data(scores_dir: str, stock_pool: str, year: int = None):
     }
 
 
+def make_config(params: dict, start_date: str = "", end_date: str = "") -> SignalConfig:
+    """参数组合 → SignalConfig（未给出的参数取 v1 默认值）"""
+    return SignalConfig(
+        scores_dir="",
+        stock_pool="",
+        start_date=start_date,
+        end_date=end_date,
+        buy_threshold=params["buy_threshold"],
+        take_profit=params["take_profit"],
+        stop_loss=params["stop_loss"],
+        max_pos_pct=params.get("max_pos_pct", 20),
+        max_positions=params.get("max_positions", 10),
+        cooldown_days=params.get("cooldown_days", 1),
+        sort_by_finance=params.get("sort_by_finance", False),
+        # v2 保守策略参数（缺省即保持 v1 行为）
+        first_break_only=params.get("first_break_only", False),
+        max_pos_pct_basis=params.get("max_pos_pct_basis", "total_assets"),
+        build_days=params.get("build_days", 1),
+    )
+
+
+def result_row(params: dict, result: SignalResult) -> dict:
+    """单组参数的回测指标（网格结果表的一行）"""
+    row = {**params}
+    row["total_return"] = round(result.total_return, 2)
+    row["annual_return"] = round(result.annual_return, 2)
+    row["sharpe"] = round(result.sharpe_ratio, 3)
+    row["max_dd"] = round(result.max_drawdown, 2)
+    row["win_rate"] = round(result.win_rate, 1)
+    row["trades"] = result.total_trades
+    row["avg_hold"] = round(result.avg_hold_days, 1)
+    row["avg_ret"] = round(result.avg_return, 2)
+    return row
+
+
+def run_combo(data: dict, params: dict, start_date: str = "", end_date: str = "",
+              arrays: Optional[SignalArrays] = None) -> dict:
+    """回测一组参数，返回结果行；给出 arrays 时用 ArraySignalEngine"""
+    config = make_config(params, start_date, end_date)
+    engine = ArraySignalEngine(config, arrays) if arrays is not None else SignalEngine(config)
+    result = engine.run(
+        all_scores=data["all_scores"],
+        trade_dates=data["trade_dates"],
+        price_cache=data["price_cache"],
+        name_map=data["name_map"],
+    )
+    return result_row(params, result)
+
+
+def run_batch(data: dict, param_list: List[dict], start_date: str = "", end_date: str = "",
+              arrays: Optional[SignalArrays] = None) -> List[dict]:
+    """一批只在止盈 / 止损 / 冷却期上不同的参数，用 BatchSignalEngine 一起回测，返回各组结果行"""
+    configs = [make_config(params, start_date, end_date) for params in param_list]
+    results = BatchSignalEngine(configs, arrays).run(
+        all_scores=data["all_scores"],
+        trade_dates=data["trade_dates"],
+        price_cache=data["price_cache"],
+        name_map=data["name_map"],
+    )
+    return [result_row(params, result) for params, result in zip(param_list, results)]
+
+
+def _grid_tasks(param_list: List[dict], batched: bool, workers: int) -> List[List[int]]:
+    """把组合序号分成任务：非批量时每个组合一个任务；
+    批量时按 BATCH_FIELDS 以外的参数分组，多进程下再把每组切成若干份，保证各进程都有活干"""
+    if not batched:
+        return [[idx] for idx in range(len(param_list))]
+
+    groups: Dict[tuple, List[int]] = {}
+    for idx, params in enumerate(param_list):
+        key = tuple((k, v) for k, v in params.items() if k not in BATCH_FIELDS)
+        groups.setdefault(key, []).append(idx)
+
+    parts = max(1, -(-workers // len(groups))) if workers > 1 else 1
+    tasks = []
+    for idxs in groups.values():
+        size = -(-len(idxs) // parts)
+        tasks.extend(idxs[lo:lo + size] for lo in range(0, len(idxs), size))
+    return tasks
+
+
+def _run_task(data: dict, param_list: List[dict], idxs: List[int], start_date: str,
+              end_date: str, arrays: Optional[SignalArrays], batched: bool) -> List[tuple]:
+    """回测一个任务内的组合，返回 [(组合序号, 结果行)]"""
+    params = [param_list[idx] for idx in idxs]
+    if batched:
+        rows = run_batch(data, params, start_date, end_date, arrays)
+    else:
+        rows = [run_combo(data, p, start_date, end_date, arrays) for p in params]
+    return list(zip(idxs, rows))
+
+
+# fork 出的子进程通过写时复制只读共享父进程已加载的数据，不重新加载、不经 pickle 传输
+_SHARED_DATA: Optional[dict] = None
+_SHARED_ARRAYS: Optional[SignalArrays] = None
+_SHARED_PARAMS: Optional[List[dict]] = None
+
+
+def _grid_worker(task: tuple) -> List[tuple]:
+    """子进程：回测一个任务，返回 [(组合序号, 结果行)]"""
+    idxs, start_date, end_date, batched = task
+    return _run_task(_SHARED_DATA, _SHARED_PARAMS, idxs, start_date, end_date,
+                     _SHARED_ARRAYS, batched)
+
+
+def _iter_grid(data: dict, param_list: List[dict], start_date: str, end_date: str,
+               arrays: Optional[SignalArrays], workers: int, batched: bool = False):
+    """逐个产出 (组合序号, 结果行)；多进程时按任务完成先后产出"""
+    global _SHARED_DATA, _SHARED_ARRAYS, _SHARED_PARAMS
+
+    tasks = _grid_tasks(param_list, batched, workers)
+    if workers > 1 and len(tasks) > 1:
+        if 'fork' not in mp.get_all_start_methods():
+            print("⚠️ 当前平台不支持 fork，改为单进程计算")
+        else:
+            _SHARED_DATA, _SHARED_ARRAYS, _SHARED_PARAMS = data, arrays, param_list
+            try:
+                with mp.get_context('fork').Pool(workers) as pool:
+                    for rows in pool.imap_unordered(
+                            _grid_worker, [(idxs, start_date, end_date, batched) for idxs in tasks]):
+                        yield from rows
+            finally:
+                _SHARED_DATA = _SHARED_ARRAYS = _SHARED_PARAMS = None
+            return
+
+    for idxs in tasks:
+        yield from _run_task(data, param_list, idxs, start_date, end_date, arrays, batched)
+
+
+def _evaluate(data: dict, param_list: List[dict], start_date: str, end_date: str,
+              arrays: Optional[SignalArrays], workers: int, batched: bool,
+              progress: bool = True, store: Optional[ResultStore] = None,
+              tag: str = "") -> List[dict]:
+    """回测一批参数组合，按输入顺序返回结果行（多进程时按完成先后显示进度）
+
+    给出 store 时：结果库中已有的组合直接复用，其余每完成一组立即追加写入结果库
+    """
+    total = len(param_list)
+    results = [None] * total
+    todo = list(range(total))
+    keys = []
+    if store is not None:
+        version = data_version(data)
+        store.begin_run(tag, version, start_date, end_date)
+        keys = [result_key(params, version, start_date, end_date) for params in param_list]
+        todo = []
+        for idx, key in enumerate(keys):
+            row = store.get(key)
+            if row is None:
+                todo.append(idx)
+            else:
+                results[idx] = row
+                store.add(key, row, tag, version, start_date, end_date)
+        if progress and len(todo) < total:
+            print(f"  ♻️ 复用已有结果: {total - len(todo)} 种组合，待回测 {len(todo)} 种")
+
+    t0 = time.time()
+    n_todo = len(todo)
+    report_every = 50 if workers <= 1 else max(1, min(50, n_todo // 10))
+
+    todo_params = [param_list[idx] for idx in todo]
+    for done, (j, row) in enumerate(_iter_grid(data, todo_params, start_date, end_date,
+                                               arrays, workers, batched), start=1):
+        idx = todo[j]
+        results[idx] = row
+        if store is not None:
+            store.add(keys[idx], row, tag, version, start_date, end_date)
+
+        if progress and (done % report_every == 0 or done == n_todo):
+            elapsed = time.time() - t0
+            eta = elapsed / done * (n_todo - done)
+            print(f"  [{done}/{n_todo}] 已完成, 耗时{elapsed:.0f}s, 预计剩余{eta:.0f}s")
+    return results
+
+
+# ============================================================
+# 搜索策略
+# ============================================================
+#
+# 每个策略签名相同：strategy(evaluate, param_grid, dates, budget, patience, min_sharpe, seed)
+#   evaluate(param_list, end_date=None) -> 结果行列表（顺序与 param_list 一致，end_date 缺省为全区间）
+#   dates: 回测区间内的交易日
+#   budget: 计算预算，单位为"全区间回测次数"（半区间回测一次记 0.5），None 为不限
+# 返回全部评估过的结果行。
+
+# 逐级减半：最短评估窗口（交易日）
+HALVING_MIN_DAYS = 20
+# 逐级减半：每级保留 1/eta，窗口放大 eta 倍
+HALVING_ETA = 3
+# TPE：未给出预算时的评估次数
+TPE_DEFAULT_BUDGET = 100
+# TPE：好样本占比、每次建议时的候选采样数
+TPE_GAMMA = 0.25
+TPE_CANDIDATES = 24
+
+
+def _param_combos(param_grid: dict) -> List[dict]:
+    """参数网格的全部组合（按 itertools.product 顺序）；连续区间不能穷举"""
+    for key, spec in param_grid.items():
+        if isinstance(spec, tuple):
+            raise ValueError(f"参数 {key} 是连续区间 {spec}，只能用于 tpe 搜索")
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, combo)) for combo in itertools.product(*param_grid.values())]
+
+
+def _grid_strategy(evaluate, param_grid: dict, dates: list, budget: Optional[float] = None,
+                   patience: Optional[int] = None, min_sharpe: Optional[float] = None,
+                   seed: int = 0, verbose: bool = True) -> List[dict]:
+    """穷举：全部组合在全区间上回测（不使用预算和提前停止）"""
+    return evaluate(_param_combos(param_grid))
+
+
+def _halving_strategy(evaluate, param_grid: dict, dates: list, budget: Optional[float] = None,
+                      patience: Optional[int] = None, min_sharpe: Optional[float] = None,
+                      seed: int = 0, verbose: bool = True) -> List[dict]:
+    """逐级减半（successive halving）
+
+    全部组合先在区间开头的短窗口上回测，按夏普保留前 1/HALVING_ETA 进入 HALVING_ETA 倍长的窗口，
+    直到最后一级用全区间。结果行带 days 列（该组合最后评估的窗口长度）。
+
+    - min_sharpe: 中间级夏普低于此值的组合不再晋级（提前淘汰）
+    - budget: 第一级超出预算时随机抽样组合，之后各级超出预算时只保留排名靠前的组合
+    - verbose: False 时不打印各级进度
+    """
+    combos = _param_combos(param_grid)
+    n_days = len(dates)
+    rungs = 1
+    while (n_days / HALVING_ETA ** rungs >= HALVING_MIN_DAYS
+           and len(combos) / HALVING_ETA ** rungs >= 1):
+        rungs += 1
+
+    rng = random.Random(seed)
+    survivors = list(range(len(combos)))
+    spent = 0.0
+    rows_by_idx = {}
+    for r in range(rungs):
+        days = max(1, round(n_days / HALVING_ETA ** (rungs - 1 - r)))
+        frac = days / n_days
+        if budget is not None:
+            afford = int((budget - spent) / frac + 1e-9)
+            if afford < len(survivors):
+                survivors = sorted(rng.sample(survivors, afford)) if r == 0 else survivors[:afford]
+            if not survivors:
+                if verbose:
+                    print(f"  ⏹ 预算用尽（已用 {spent:.1f}）")
+                break
+
+        if verbose:
+            print(f"  🔎 第 {r + 1}/{rungs} 级: {len(survivors)} 种组合 × {days} 天")
+        rows = evaluate([combos[i] for i in survivors], dates[days - 1] if days < n_days else None)
+        spent += len(survivors) * frac
+        for i, row in zip(survivors, rows):
+            row["days"] = days
+            rows_by_idx[i] = row
+        if r == rungs - 1:
+            break
+
+        # 稳定排序：同分保持组合顺序
+        ranked = sorted(zip(survivors, rows), key=lambda x: x[1]["sharpe"], reverse=True)
+        if min_sharpe is not None:
+            ranked = [x for x in ranked if x[1]["sharpe"] >= min_sharpe]
+        survivors = [i for i, _ in ranked[:math.ceil(len(survivors) / HALVING_ETA)]]
+        if not survivors:
+            if verbose:
+                print(f"  ⏹ 没有组合的夏普达到 {min_sharpe}，提前停止")
+            break
+
+    return [rows_by_idx[i] for i in sorted(rows_by_idx)]
+
+
+def _tpe_space(param_grid: dict) -> dict:
+    """参数空间：列表为离散选项，(low, high) 为连续区间（两端均为整数时取整数）"""
+    space = {}
+    for key, spec in param_grid.items():
+        if isinstance(spec, tuple):
+            low, high = spec
+            kind = "int" if isinstance(low, int) and isinstance(high, int) else "float"
+            space[key] = (kind, low, high)
+        else:
+            space[key] = ("choice", list(spec))
+    return space
+
+
+def _tpe_sample(spec: tuple, observed: list, rng: np.random.Generator):
+    """从 Parzen 估计 l(x) 中采样一个值（observed 为空时即先验分布）"""
+    if spec[0] == "choice":
+        options = spec[1]
+        weights = np.ones(len(options))
+        for v in observed:
+            weights[options.index(v)] += 1
+        return options[rng.choice(len(options), p=weights / weights.sum())]
+
+    kind, low, high = spec
+    k = int(rng.integers(len(observed) + 1))
+    if k == len(observed):
+        x = rng.uniform(low, high)
+    else:
+        sigma = (high - low) / max(1, len(observed)) ** 0.2 / 2
+        x = min(max(rng.normal(observed[k], sigma), low), high)
+    return int(round(x)) if kind == "int" else round(float(x), 2)
+
+
+def _tpe_log_density(spec: tuple, observed: list, x) -> float:
+    """Parzen 估计（观测点上的高斯核 + 均匀先验）在 x 处的对数密度"""
+    if spec[0] == "choice":
+        options = spec[1]
+        count = sum(1 for v in observed if v == x)
+        return math.log((count + 1) / (len(observed) + len(options)))
+
+    _, low, high = spec
+    width = max(high - low, 1e-12)
+    density = 1 / width
+    if observed:
+        sigma = width / len(observed) ** 0.2 / 2
+        obs = np.asarray(observed, dtype=np.float64)
+        density += np.sum(np.exp(-0.5 * ((x - obs) / sigma) ** 2) / (sigma * math.sqrt(2 * math.pi)))
+    return math.log(density / (len(observed) + 1))
+
+
+def _tpe_suggest(space: dict, history: List[dict], rng: np.random.Generator) -> dict:
+    """按已有结果划分好 / 差两组，从好组分布中采样若干候选，取 l(x)/g(x) 最大者"""
+    ranked = sorted(history, key=lambda row: row["sharpe"], reverse=True)
+    n_good = max(1, math.ceil(TPE_GAMMA * len(ranked)))
+    good, bad = ranked[:n_good], ranked[n_good:]
+
+    best, best_score = None, -math.inf
+    for _ in range(TPE_CANDIDATES):
+        params = {key: _tpe_sample(spec, [row[key] for row in good], rng)
+                  for key, spec in space.items()}
+        score = sum(_tpe_log_density(spec, [row[key] for row in good], params[key])
+                    - _tpe_log_density(spec, [row[key] for row in bad], params[key])
+                    for key, spec in space.items())
+        if score > best_score:
+            best, best_score = params, score
+    return best
+
+
+def _tpe_strategy(evaluate, param_grid: dict, dates: list, budget: Optional[float] = None,
+                  patience: Optional[int] = None, min_sharpe: Optional[float] = None,
+                  seed: int = 0, batch_size: int = 1, verbose: bool = True) -> List[dict]:
+    """TPE（Tree-structured Parzen Estimator）采样搜索
+
+    先随机采样若干组，之后每轮按夏普把已评估结果分成好 / 差两组，分别做 Parzen 估计，
+    选 l(x)/g(x) 最大的候选继续评估。param_grid 中列表为离散选项，(low, high) 为连续区间。
+
+    - budget: 评估次数上限（全区间），默认 TPE_DEFAULT_BUDGET
+    - patience: 连续这么多轮最佳夏普没有提升即停止
+    - batch_size: 每轮并行评估的组合数（多进程时取进程数）
+    - verbose: False 时不打印搜索进度
+    """
+    space = _tpe_space(param_grid)
+    budget = int(budget if budget is not None else TPE_DEFAULT_BUDGET)
+    n_startup = min(budget, max(10, 2 * len(space)))
+    rng = np.random.default_rng(seed)
+
+    history: List[dict] = []
+    tried = set()
+    best_sharpe, stale = -math.inf, 0
+    while len(history) < budget:
+        batch = []
+        for _ in range(min(batch_size, budget - len(history))):
+            # 离散空间可能被试完：重复采样若干次仍是已试过的组合就放弃
+            for _attempt in range(20):
+                if len(history) + len(batch) < n_startup:
+                    params = {key: _tpe_sample(spec, [], rng) for key, spec in space.items()}
+                else:
+                    params = _tpe_suggest(space, history, rng)
+                key = tuple(params.values())
+                if key not in tried:
+                    tried.add(key)
+                    batch.append(params)
+                    break
+        if not batch:
+            if verbose:
+                print("  ⏹ 参数空间已试完")
+            break
+
+        rows = evaluate(batch)
+        history.extend(rows)
+        round_best = max(row["sharpe"] for row in rows)
+        if round_best > best_sharpe:
+            best_sharpe, stale = round_best, 0
+        else:
+            stale += 1
+        if verbose and (len(history) % 10 < len(rows) or len(history) >= budget):
+            print(f"  🔎 已评估 {len(history)}/{budget}，最佳夏普 {best_sharpe:.3f}")
+        if patience is not None and stale >= patience:
+            if verbose:
+                print(f"  ⏹ 连续 {patience} 轮最佳夏普未提升，提前停止")
+            break
+
+    return history
+
+
+# 搜索策略注册表：名称 -> 策略函数（签名见上）
+SEARCH_STRATEGIES = {
+    "grid": _grid_strategy,
+    "halving": _halving_strategy,
+    "tpe": _tpe_strategy,
+}
+
+
 def run_grid_search(
     data: dict,
     param_grid: dict = None,
     start_date: str = "",
     end_date: str = "",
     top_n: int = 10,
+    array_engine: bool = False,
+    workers: int = 1,
+    batched: bool = False,
+    strategy: str = "grid",
+    budget: Optional[float] = None,
+    patience: Optional[int] = None,
+    min_sharpe: Optional[float] = None,
+    seed: int = 0,
+    store: Optional[ResultStore] = None,
+    tag: str = "",
+    arrays: Optional[SignalArrays] = None,
+    verbose: bool = True,
 ) -> pd.DataFrame:
     """运行网格搜索
 
     Args:
         data: load_backtest_data() 的返回值
-        param_grid: 参数网格，None则用默认
+        param_grid: 参数网格，None则用默认；strategy='tpe' 时可用 (low, high) 表示连续区间
         start_date: 回测开始日期
         end_date: 回测结束日期
         top_n: 返回前N个最优策略
+        array_engine: True 时用 ArraySignalEngine（评分/价格矩阵只构建一次，结果与 SignalEngine 一致）
+        workers: 进程数；>1 时各组合分发到子进程（fork 只读共享已加载数据），
+                 结果按完成先后回传并显示进度，最终排序与单进程一致
+        batched: True 时只在止盈 / 止损 / 冷却期上不同的组合用 BatchSignalEngine 一起回测
+                 （均分与候选排序只算一次，隐含 array_engine），结果与逐组回测一致
+        strategy: 搜索策略，见 SEARCH_STRATEGIES：
+                  grid=穷举（默认）；halving=逐级减半；tpe=TPE 采样
+        budget: 计算预算（全区间回测次数），grid 不使用
+        patience: tpe 连续多少轮最佳夏普未提升即停止
+        min_sharpe: halving 中间级夏普低于此值的组合提前淘汰
+        seed: 随机种子（halving 预算抽样、tpe 采样）
+        store: 结果库；每完成一组即写入，已有结果（同参数、同数据、同区间）直接复用，
+               中途退出后重跑即从断点继续
+        tag: 写入结果库时的结果集名称（view_launch_results / API 按此读取）；
+             halving 的短窗口结果只入库复用，不计入该结果集
+        arrays: 已构建的 SignalArrays（多次搜索共用，如滚动优化的各个窗口），隐含 array_engine
+        verbose: False 时不打印搜索概况和进度
 
     Returns:
         DataFrame: 参数组合及其回测指标，按夏普排序
+                   （halving 多一列 days，先按评估窗口长度、再按夏普排序）
     """
+    if strategy not in SEARCH_STRATEGIES:
+        available = list(SEARCH_STRATEGIES.keys())
+        raise ValueError(f"未知搜索策略: {strategy!r}，可选: {available}")
+
     if param_grid is None:
         param_grid = {
             "buy_threshold": [30],  # 固定30分启动信号
@@ -99,63 +563,46 @@ def run_grid_search(
             "cooldown_days": [0, 1, 3],
         }
 
-    # 生成所有组合
-    keys = list(param_grid.keys())
-    values = list(param_grid.values())
-    combos = list(itertools.product(*values))
-    total = len(combos)
-    print(f"📊 网格搜索: {total} 种参数组合")
+    if verbose:
+        if strategy == "grid":
+            print(f"📊 网格搜索: {len(_param_combos(param_grid))} 种参数组合")
+        else:
+            print(f"📊 参数搜索（{strategy}）: {len(param_grid)} 个参数"
+                  + (f"，预算 {budget}" if budget is not None else ""))
 
-    results = []
-    t0 = time.time()
+    if arrays is None and (array_engine or batched):
+        arrays = SignalArrays(data["all_scores"], data["trade_dates"], data["price_cache"])
+        if verbose:
+            print(f"  数组引擎: {len(arrays.dates)} 天 × {len(arrays.codes)} 只")
 
-    for idx, combo in enumerate(combos):
-        params = dict(zip(keys, combo))
-
-        config = SignalConfig(
-            scores_dir="",
-            stock_pool="",
-            start_date=start_date,
-            end_date=end_date,
-            buy_threshold=params["buy_threshold"],
-            take_profit=params["take_profit"],
-            stop_loss=params["stop_loss"],
-            max_pos_pct=params.get("max_pos_pct", 20),
-            max_positions=params.get("max_positions", 10),
-            cooldown_days=params.get("cooldown_days", 1),
-            sort_by_finance=params.get("sort_by_finance", False),
-            # v2 保守策略参数（缺省即保持 v1 行为）
-            first_break_only=params.get("first_break_only", False),
-            max_pos_pct_basis=params.get("max_pos_pct_basis", "total_assets"),
-            build_days=params.get("build_days", 1),
-        )
-
-        engine = SignalEngine(config)
-        result = engine.run(
-            all_scores=data["all_scores"],
-            trade_dates=data["trade_dates"],
-            price_cache=data["price_cache"],
-            name_map=data["name_map"],
-        )
-
-        row = {**params}
-        row["total_return"] = round(result.total_return, 2)
-        row["annual_return"] = round(result.annual_return, 2)
-        row["sharpe"] = round(result.sharpe_ratio, 3)
-        row["max_dd"] = round(result.max_drawdown, 2)
-        row["win_rate"] = round(result.win_rate, 1)
-        row["trades"] = result.total_trades
-        row["avg_hold"] = round(result.avg_hold_days, 1)
-        row["avg_ret"] = round(result.avg_return, 2)
-        results.append(row)
-
-        if (idx + 1) % 50 == 0 or idx + 1 == total:
-            elapsed = time.time() - t0
-            eta = elapsed / (idx + 1) * (total - idx - 1)
-            print(f"  [{idx+1}/{total}] 已完成, 耗时{elapsed:.0f}s, 预计剩余{eta:.0f}s")
+    if workers > 1 and verbose:
+        print(f"  并行进程: {workers}")
+
+    dates = [d for d in data["trade_dates"]
+             if (not start_date or d >= start_date) and (not end_date or d <= end_date)]
+
+    def evaluate(param_list: List[dict], window_end: Optional[str] = None) -> List[dict]:
+        if batched and verbose and strategy == "grid":
+            n_groups = len({tuple(v for k, v in p.items() if k not in BATCH_FIELDS)
+                            for p in param_list})
+            print(f"  批量回测: {n_groups} 组（每组 {len(param_list) // max(n_groups, 1)} "
+                  f"种止盈/止损/冷却组合同步推进）")
+        # 短窗口（halving 中间级）结果只入库复用，不计入结果集
+        return _evaluate(data, param_list, start_date, window_end or end_date, arrays, workers,
+                         batched, progress=verbose and strategy != "tpe", store=store,
+                         tag=tag if window_end is None else "")
+
+    kwargs = dict(budget=budget, patience=patience, min_sharpe=min_sharpe, seed=seed, verbose=verbose)
+    if strategy == "tpe":
+        kwargs["batch_size"] = max(1, workers)
+    results = SEARCH_STRATEGIES[strategy](evaluate, param_grid, dates, **kwargs)
 
+    # 按组合顺序建表后再排序，多进程与单进程结果（含并列名次）完全一致
     df = pd.DataFrame(results)
-    df = df.sort_values("sharpe", ascending=False).reset_index(drop=True)
+    if strategy == "halving" and not df.empty:
+        df = df.sort_values(["days", "sharpe"], ascending=False, kind="stable").reset_index(drop=True)
+    else:
+        df = df.sort_values("sharpe", ascending=False).reset_index(drop=True)
     return df
 
 
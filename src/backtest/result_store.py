@@ -0,0 +1,183 @@
+"""
+网格搜索结果库 — 追加写入的 JSONL，断点续跑、跨搜索复用
+
+每完成一组参数即追加一行，进程中途退出时已完成的组合不会丢失。
+每行以 key = hash(参数, 数据版本, 回测区间) 标识：
+  - 重跑同一搜索时 key 已存在的组合直接取结果，不再回测
+  - 参数范围有重叠的新搜索同样复用重叠部分
+每行另带 tag（结果集名称，如 "2025/2025_每日_200_启动信号/grid_results"），
+同一 key 被新的 tag 复用时追加一行只改 tag 的记录，文件始终只追加。
+同一 tag 换了数据或区间重跑时先追加一行运行标记，读取结果集只取该 tag 最近一次运行
+（数据版本 + 区间）的记录，旧数据上的结果不再混入。
+
+行格式：
+  {"key", "tag", "data_version", "start_date", "end_date", "row": {参数 + 指标}, "created_at"}
+  运行标记：{"run": true, "tag", "data_version", "start_date", "end_date", "created_at"}
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+STORE_PATH = BASE_DIR / "result" / "backtest" / "grid_results.jsonl"
+
+# 回测口径（引擎逻辑 / 指标定义）变化时递增，旧结果不再复用
+RESULT_VERSION = 1
+
+
+def data_version(data: dict) -> str:
+    """load_backtest_data() 返回数据的内容指纹（评分 + 价格），首次计算后缓存在 data 中"""
+    cached = data.get("data_version")
+    if cached:
+        return cached
+
+    h = hashlib.sha1()
+    for date in sorted(data["all_scores"]):
+        df = data["all_scores"][date]
+        h.update(date.encode())
+        h.update(",".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    for code in sorted(data["price_cache"]):
+        cache = data["price_cache"][code]
+        h.update(code.encode())
+        if isinstance(cache, dict):
+            h.update("|".join(cache).encode())
+            h.update(np.array(list(cache.values()), dtype=np.float64).tobytes())
+        else:
+            h.update(pd.util.hash_pandas_object(cache, index=False).values.tobytes())
+
+    version = h.hexdigest()[:16]
+    data["data_version"] = version
+    return version
+
+
+def result_key(params: dict, version: str, start_date: str, end_date: str) -> str:
+    """一组参数在某份数据、某个区间上的回测结果标识"""
+    payload = json.dumps({
+        "result_version": RESULT_VERSION,
+        "params": params,
+        "data_version": version,
+        "start_date": start_date,
+        "end_date": end_date,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """JSONL 结果库：读入时建立 key 索引，写入时逐行追加"""
+
+    def __init__(self, path: Path = STORE_PATH):
+        self.path = Path(path)
+        self._by_key: Dict[str, dict] = {}
+        self._tagged = set()      # 已有的 (key, tag)
+        self._records: List[dict] = []
+        self._runs: Dict[str, tuple] = {}   # tag -> 最近一次运行的 (数据版本, 开始, 结束)
+        self._partial = False     # 文件末尾是否有未写完的半行
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                self._partial = f.read(1) != b"\n"
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 写入中途退出留下的半行
+                    continue
+                self._index(record)
+
+    @staticmethod
+    def _run_of(record: dict) -> tuple:
+        return (record.get("data_version", ""), record.get("start_date", ""), record.get("end_date", ""))
+
+    def _index(self, record: dict):
+        if record.get("tag"):
+            self._runs[record["tag"]] = self._run_of(record)
+        if record.get("run"):
+            return
+        self._by_key[record["key"]] = record
+        tag_key = (record["key"], record.get("tag", ""))
+        if tag_key not in self._tagged:
+            self._tagged.add(tag_key)
+            self._records.append(record)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def get(self, key: str) -> Optional[dict]:
+        """key 对应的结果行（副本），没有返回 None"""
+        record = self._by_key.get(key)
+        return dict(record["row"]) if record is not None else None
+
+    def begin_run(self, tag: str, version: str, start_date: str = "", end_date: str = ""):
+        """开始写入结果集 tag：数据版本或区间与该 tag 上次运行不同时追加运行标记"""
+        if not tag or self._runs.get(tag) == (version, start_date, end_date):
+            return
+        self._append({
+            "run": True,
+            "tag": tag,
+            "data_version": version,
+            "start_date": start_date,
+            "end_date": end_date,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def add(self, key: str, row: dict, tag: str = "", version: str = "",
+            start_date: str = "", end_date: str = ""):
+        """记录一组结果（同一 key + tag 已存在时不重复写入）"""
+        if (key, tag) in self._tagged:
+            return
+        self._append({
+            "key": key,
+            "tag": tag,
+            "data_version": version,
+            "start_date": start_date,
+            "end_date": end_date,
+            "row": row,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def _append(self, record: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(record, ensure_ascii=False, default=_json_default)
+        with open(self.path, "a", encoding="utf-8") as f:
+            # 半行之后另起一行，避免与新记录粘连
+            f.write(("\n" if self._partial else "") + line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._partial = False
+        self._index(json.loads(line))
+
+    def tags(self) -> List[str]:
+        """全部结果集名称（按首次出现顺序）"""
+        return list(dict.fromkeys(r.get("tag", "") for r in self._records if r.get("tag")))
+
+    def frame(self, tag: str) -> Optional[pd.DataFrame]:
+        """某个结果集最近一次运行（数据版本 + 区间）的结果行，按夏普降序；没有记录返回 None"""
+        run = self._runs.get(tag)
+        rows = [r["row"] for r in self._records
+                if r.get("tag") == tag and self._run_of(r) == run]
+        if not rows:
+            return None
+        df = pd.DataFrame(rows)
+        return df.sort_values("sharpe", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _json_default(value):
+    # 参数 / 指标里的 numpy 标量
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
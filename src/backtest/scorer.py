@@ -16,15 +16,22 @@
 """
 
 import gc
+import multiprocessing as mp
 import os
 import sys
 import time
+import warnings
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.backtest.snapshot import load_kind
+from src.datafactory.price_panel import PricePanel
+from src.datafactory.trade_calendar import get_calendar
 
 # 路径配置
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -33,6 +40,124 @@ PRICE_DIR = DATA_DIR / "price"
 RESULT_DIR = BASE_DIR / "result"
 
 
+# 单日涨跌幅：各趋势下涨跌幅区间 [lo, hi) 对应得分，均不命中得 5 分
+_TREND_NAMES = ['strong_up', 'weak_up', 'weak_down', 'strong_down']
+_DAILY_BOUNDS = [(-10, -7), (-7, -3), (-3, 0), (0, 3), (3, 7), (7, 10)]
+_DAILY_SCORES = {
+    'strong_up':   [8, 6, 4, 2, 1, 0],
+    'weak_up':     [7, 5, 3, 4, 6, 3],
+    'weak_down':   [6, 4, 2, 5, 7, 8],
+    'strong_down': [9, 7, 3, 6, 8, 9],
+}
+
+
+def _dividend_yield_score(dy: float):
+    """股息率分段线性得分（>10% 视为异常，给 6 分）"""
+    pts = [(0, 0), (0.02, 4), (0.05, 8), (0.08, 10), (0.10, 10)]
+    if dy > 0.10:
+        return 6
+    for i in range(len(pts) - 1):
+        x1, y1 = pts[i]
+        x2, y2 = pts[i + 1]
+        if x1 <= dy <= x2:
+            return round(y1 + (dy - x1) * (y2 - y1) / (x2 - x1), 2)
+    return 0
+
+
+# ============================================================
+# 预加载：单只股票从源 CSV 构建（结果写入快照，字段见 preload_all）
+# ============================================================
+
+_FINANCE_COLUMNS = ['扣非净利润同比增长率', '净利润同比增长率', '营业总收入同比增长率']
+_DIVIDEND_DATE_COLUMNS = ['公告日期', '实施公告日', '除权日', '股权登记日']
+
+
+def _build_price(code: str, panel: Optional[PricePanel], fresh: set) -> Optional[dict]:
+    """收盘价序列（面板新鲜时直接切片，否则读 CSV）"""
+    if code in fresh:
+        j = panel.code_index(code)
+        mask = np.asarray(panel.field('present')[:, j])
+        if not mask.any():
+            return None
+        return {
+            'dates': panel.datetimes[mask].astype('datetime64[ns]'),
+            'closes': np.asarray(panel.field('close')[:, j])[mask].astype(np.float32),
+        }
+
+    path = PRICE_DIR / f"{code}.csv"
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_csv(path, usecols=['日期', '收盘'], dtype={'收盘': np.float32})
+        if df.empty:
+            return None
+        dates = pd.to_datetime(df['日期'].astype(str), format='%Y%m%d').values
+        return {'dates': dates.astype('datetime64[ns]'), 'closes': df['收盘'].values}
+    except Exception:
+        return None
+
+
+def _build_finance(code: str) -> Optional[dict]:
+    """报告期（文本）+ 三项增长率（已解析为 float，缺列为 0）"""
+    path = DATA_DIR / "finance" / f"{code}.csv"
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_csv(path)
+        if df.empty:
+            return None
+        if '报告期' in df.columns:
+            periods = [str(v) for v in df['报告期'].tolist()]
+        else:
+            periods = [''] * len(df)
+        values = np.zeros((len(df), len(_FINANCE_COLUMNS)))
+        for k, col in enumerate(_FINANCE_COLUMNS):
+            if col in df.columns:
+                values[:, k] = [HistoricalScorer._to_float(v) for v in df[col].tolist()]
+        return {'periods': np.array(periods, dtype=str), 'values': values}
+    except Exception:
+        return None
+
+
+def _build_disclosure(code: str) -> Optional[dict]:
+    """报告期 → 公告日期（报告期缺失的行无法匹配，直接丢弃）"""
+    path = DATA_DIR / "disclosure" / f"{code}.csv"
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_csv(path)
+        if df.empty:
+            return None
+        df = df[df['报告期'].notna()]
+        return {
+            'periods': np.array(df['报告期'].astype(str).tolist(), dtype=str),
+            'dates': np.array(df['公告日期'].astype(str).fillna('').tolist(), dtype=str),
+        }
+    except Exception:
+        return None
+
+
+def _build_dividend(code: str) -> Optional[dict]:
+    """分红日期（首个存在的日期列）+ 每 10 股派息；缺日期列或派息列视为无分红"""
+    path = DATA_DIR / "dividend" / f"{code}.csv"
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_csv(path)
+        if df.empty or '派息' not in df.columns:
+            return None
+        date_col = next((c for c in _DIVIDEND_DATE_COLUMNS if c in df.columns), None)
+        if date_col is None:
+            return None
+        dates = pd.to_datetime(df[date_col], errors='coerce').values
+        return {
+            'dates': dates.astype('datetime64[ns]'),
+            'pays': pd.to_numeric(df['派息'], errors='coerce').fillna(0).to_numpy(np.float64),
+        }
+    except Exception:
+        return None
+
+
 class HistoricalScorer:
     """历史因子评分器（预加载优化版）"""
 
@@ -40,9 +165,11 @@ class HistoricalScorer:
         self._stock_codes: List[str] = []
         self._name_map: Dict[str, str] = {}
         self._price_data: Dict[str, tuple] = {}  # code -> (dates_array, closes_array)
-        self._finance_data: Dict[str, list] = {}  # code -> list of dicts
+        self._finance_data: Dict[str, dict] = {}  # code -> {'periods', 'values'}
         self._disclosure_map: Dict[str, dict] = {}  # code -> {报告期: 公告日期}
-        self._dividend_data: Dict[str, pd.DataFrame] = {}
+        self._dividend_data: Dict[str, tuple] = {}  # code -> (dates, 每10股派息)
+        # code -> {'dates': 生效日, 'scores': 财报得分, 'is_int': 得分是否 int}
+        self._finance_timeline: Dict[str, dict] = {}
 
         if stock_codes is None:
             stock_codes = [f.stem for f in PRICE_DIR.glob("*.csv")]
@@ -60,77 +187,68 @@ class HistoricalScorer:
 
         print(f"📊 历史评分器: {len(self._stock_codes)} 只股票")
 
-    def preload_all(self):
-        """预加载所有数据"""
-        t0 = time.time()
+    def preload_all(self, use_snapshot: bool = True):
+        """预加载所有数据
+
+        Args:
+            use_snapshot: True 时经由 data/snapshot/scorer 二进制快照加载
+                          （内存映射，只重建源文件有变化的代码），False 时直接解析 CSV
+        """
+        panel_cache = []
+
+        def open_panel():
+            if not panel_cache:
+                panel = PricePanel.open()
+                fresh = panel.fresh_codes(self._stock_codes) if panel is not None else set()
+                panel_cache.append((panel, fresh))
+            return panel_cache[0]
+
+        kinds = [
+            ('price', '价格数据', PRICE_DIR,
+             {'dates': 'datetime64[ns]', 'closes': np.float32},
+             lambda code: _build_price(code, *open_panel())),
+            ('finance', '财报数据', DATA_DIR / "finance",
+             {'periods': str, 'values': np.float64}, _build_finance),
+            ('disclosure', '公告日期', DATA_DIR / "disclosure",
+             {'periods': str, 'dates': str}, _build_disclosure),
+            ('dividend', '分红数据', DATA_DIR / "dividend",
+             {'dates': 'datetime64[ns]', 'pays': np.float64}, _build_dividend),
+            # 依赖上面已加载的财报和公告日期，签名取两者的源文件
+            ('finance_timeline', '财报时间线', [DATA_DIR / "finance", DATA_DIR / "disclosure"],
+             {'dates': 'datetime64[ns]', 'scores': np.float64, 'is_int': bool},
+             self._build_finance_timeline),
+        ]
+
+        for kind, label, src_dir, fields, build in kinds:
+            t0 = time.time()
+            if use_snapshot:
+                if isinstance(src_dir, list):
+                    source = lambda code, ds=src_dir: [d / f"{code}.csv" for d in ds]
+                else:
+                    source = lambda code, d=src_dir: d / f"{code}.csv"
+                entries, rebuilt = load_kind(kind, self._stock_codes, fields, source, build)
+                note = f", 重建 {rebuilt}" if rebuilt else ""
+            else:
+                entries = {code: build(code) for code in self._stock_codes}
+                note = ""
 
-        # 价格数据
-        loaded = 0
-        for code in self._stock_codes:
-            path = PRICE_DIR / f"{code}.csv"
-            if not path.exists():
-                continue
-            try:
-                df = pd.read_csv(path, usecols=['日期', '收盘'], dtype={'收盘': np.float32})
-                if df.empty:
+            loaded = 0
+            for code, e in entries.items():
+                if e is None:
                     continue
-                dates = pd.to_datetime(df['日期'].astype(str), format='%Y%m%d').values
-                closes = df['收盘'].values
-                self._price_data[code] = (dates, closes)
+                if kind == 'price':
+                    self._price_data[code] = (e['dates'], e['closes'])
+                elif kind == 'finance':
+                    self._finance_data[code] = e
+                elif kind == 'disclosure':
+                    self._disclosure_map[code] = dict(zip(e['periods'].tolist(),
+                                                          e['dates'].tolist()))
+                elif kind == 'dividend':
+                    self._dividend_data[code] = (e['dates'], e['pays'])
+                else:
+                    self._finance_timeline[code] = e
                 loaded += 1
-            except Exception:
-                pass
-        print(f"  价格数据: {loaded} 只 ({time.time()-t0:.1f}s)")
-
-        # 财报数据
-        t0 = time.time()
-        finance_dir = DATA_DIR / "finance"
-        loaded = 0
-        for code in self._stock_codes:
-            path = finance_dir / f"{code}.csv"
-            if path.exists():
-                try:
-                    df = pd.read_csv(path)
-                    if not df.empty:
-                        self._finance_data[code] = df.to_dict('records')
-                        loaded += 1
-                except Exception:
-                    pass
-        print(f"  财报数据: {loaded} 只 ({time.time()-t0:.1f}s)")
-
-        # 公告日期
-        t0 = time.time()
-        disc_dir = DATA_DIR / "disclosure"
-        loaded = 0
-        for code in self._stock_codes:
-            path = disc_dir / f"{code}.csv"
-            if path.exists():
-                try:
-                    df = pd.read_csv(path)
-                    if not df.empty:
-                        self._disclosure_map[code] = dict(
-                            zip(df['报告期'].astype(str), df['公告日期'].astype(str))
-                        )
-                        loaded += 1
-                except Exception:
-                    pass
-        print(f"  公告日期: {loaded} 只 ({time.time()-t0:.1f}s)")
-
-        # 分红数据
-        t0 = time.time()
-        div_dir = DATA_DIR / "dividend"
-        loaded = 0
-        for code in self._stock_codes:
-            path = div_dir / f"{code}.csv"
-            if path.exists():
-                try:
-                    df = pd.read_csv(path)
-                    if not df.empty:
-                        self._dividend_data[code] = df
-                        loaded += 1
-                except Exception:
-                    pass
-        print(f"  分红数据: {loaded} 只 ({time.time()-t0:.1f}s)")
+            print(f"  {label}: {loaded} 只{note} ({time.time()-t0:.1f}s)")
 
     def score_all_stocks(self, date: str) -> pd.DataFrame:
         """计算指定日期所有股票的因子得分"""
@@ -151,6 +269,221 @@ class HistoricalScorer:
         df = df.sort_values('total_score', ascending=False).reset_index(drop=True)
         return df
 
+    def score_dates(self, date_strs: List[str]) -> Dict[str, pd.DataFrame]:
+        """向量化评分：逐只股票一次算出全部日期的因子
+
+        5日/单日/今年强弱/股息率在每只股票的价格序列上用滑动窗口和
+        searchsorted 一次求出所有日期的值，结果与逐日 score_all_stocks 完全一致。
+
+        Returns:
+            {date: DataFrame}，无数据的日期对应空 DataFrame
+        """
+        targets = pd.to_datetime(list(date_strs), format='%Y%m%d')
+        year_starts = np.array([np.datetime64(f'{y}-01-01') for y in targets.year])
+        target_vals = targets.values
+
+        codes, parts = [], []
+        for code in self._stock_codes:
+            part = self._score_code_dates(code, targets, target_vals, year_starts)
+            if part is not None:
+                codes.append(code)
+                parts.append(part)
+
+        results = {}
+        if not parts:
+            return {ds: pd.DataFrame() for ds in date_strs}
+
+        columns = ['5日涨跌幅', '单日涨跌幅', '财报', '股息率', '今年相对大盘强弱']
+        valid = np.stack([p['valid'] for p in parts])                    # (codes, dates)
+        values = {c: np.stack([p[c][0] for p in parts]) for c in columns}
+        is_int = {c: np.stack([p[c][1] for p in parts]) for c in columns}
+        codes_arr = np.array(codes, dtype=object)
+        names_arr = np.array([self._name_map.get(c, '') for c in codes], dtype=object)
+
+        for t, ds in enumerate(date_strs):
+            rows = np.flatnonzero(valid[:, t])
+            if len(rows) == 0:
+                results[ds] = pd.DataFrame()
+                continue
+
+            data = {'code': codes_arr[rows]}
+            total = None
+            total_int = np.ones(len(rows), dtype=bool)
+            for c in columns:
+                v, k = values[c][rows, t], is_int[c][rows, t]
+                # 与逐条记录建表相同：整列均为 int 时为 int64，否则为 float64
+                data[c] = v.astype(np.int64) if k.all() else v
+                total = v if total is None else total + v
+                total_int &= k
+            total = [round(int(x), 2) if ki else round(x, 2)
+                     for x, ki in zip(total.tolist(), total_int)]
+            data['total_score'] = total
+            data['date'] = ds
+            data['name'] = names_arr[rows]
+
+            df = pd.DataFrame(data)
+            df = df.sort_values('total_score', ascending=False).reset_index(drop=True)
+            results[ds] = df
+
+        return results
+
+    def _score_code_dates(self, code: str, targets: pd.DatetimeIndex,
+                          target_vals: np.ndarray,
+                          year_starts: np.ndarray) -> Optional[dict]:
+        """单只股票在全部目标日期上的因子值
+
+        Returns:
+            {'valid': bool[n_dates], 因子名: (float64 值, 是否 int 型)}；无价格数据返回 None
+        """
+        if code not in self._price_data:
+            return None
+
+        dates, closes = self._price_data[code]
+        n_t = len(target_vals)
+        if len(dates) > 1 and not (dates[1:] >= dates[:-1]).all():
+            # 日期未排序时无法用 searchsorted，逐日回退
+            return self._score_code_dates_slow(code, targets)
+
+        # 每个目标日对应的最后一行（mask.sum() == last + 1）
+        last = np.searchsorted(dates, target_vals, side='right') - 1
+        valid = last + 1 >= 21
+        at = np.maximum(last, 0)
+
+        fiveday_row, daily_row, daily_int_row = self._fiveday_daily_rows(closes)
+        fiveday = fiveday_row[at]
+        daily, daily_int = daily_row[at], daily_int_row[at]
+
+        # 今年相对大盘强弱
+        prev = np.searchsorted(dates, year_starts, side='left') - 1
+        has_year = dates[at] >= year_starts
+        ok = valid & has_year & (prev >= 0)
+        s = closes[np.maximum(prev, 0)].astype(np.float64)
+        e = closes[at].astype(np.float64)
+        ok &= ~np.isnan(s) & ~np.isnan(e) & (s > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ret = (e / s - 1) * 100
+        ytd = np.select([ret > 20, ret > 10, ret > 0, ret > -5, ret > -10],
+                        [10, 8, 6, 4, 3], 2).astype(np.float64)
+        ytd[~ok] = 0
+
+        dividend, dividend_int = self._dividend_series(code, dates, closes, at, valid)
+
+        finance = np.zeros(n_t)
+        finance_int = np.ones(n_t, dtype=bool)
+        timeline = self._finance_timeline.get(code)
+        if timeline is not None:
+            k = np.searchsorted(timeline['dates'], target_vals, side='right') - 1
+            hit = valid & (k >= 0)
+            finance[hit] = timeline['scores'][k[hit]]
+            finance_int[hit] = timeline['is_int'][k[hit]]
+
+        zeros = np.zeros(n_t)
+        ones = np.ones(n_t, dtype=bool)
+        return {
+            'valid': valid,
+            '5日涨跌幅': (np.where(valid, fiveday, zeros), ones),
+            '单日涨跌幅': (np.where(valid, daily, zeros), daily_int | ~valid),
+            '财报': (finance, finance_int),
+            '股息率': (np.where(valid, dividend, zeros), dividend_int | ~valid),
+            '今年相对大盘强弱': (ytd, ones),
+        }
+
+    def _score_code_dates_slow(self, code: str, targets: pd.DatetimeIndex) -> dict:
+        """逐日调用 _score_one 组装成 _score_code_dates 的格式"""
+        n_t = len(targets)
+        columns = ['5日涨跌幅', '单日涨跌幅', '财报', '股息率', '今年相对大盘强弱']
+        part = {'valid': np.zeros(n_t, dtype=bool)}
+        for c in columns:
+            part[c] = (np.zeros(n_t), np.ones(n_t, dtype=bool))
+        for t, target in enumerate(targets):
+            score = self._score_one(code, target)
+            if score is None:
+                continue
+            part['valid'][t] = True
+            for c in columns:
+                part[c][0][t] = score[c]
+                part[c][1][t] = isinstance(score[c], (int, np.integer))
+        return part
+
+    @staticmethod
+    def _fiveday_daily_rows(closes: np.ndarray):
+        """以第 i 行为最后一行时的 5日涨跌幅 / 单日涨跌幅得分（float32 运算与逐日版一致）
+
+        Returns:
+            (fiveday, daily, daily_is_int)，长度同 closes；不足窗口的行为 0
+        """
+        n = len(closes)
+        fiveday = np.zeros(n)
+        daily = np.zeros(n)
+        daily_int = np.ones(n, dtype=bool)
+
+        if n >= 6:
+            s, e = closes[:-5], closes[5:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ret = (e / s - 1) * 100
+            sc = np.select([ret > 10, ret > 5, ret > 0, ret > -5], [10, 8, 6, 4], 2)
+            sc[np.isnan(s) | np.isnan(e) | (s <= 0)] = 0
+            fiveday[5:] = sc
+
+        if n >= 21:
+            cur, prev = closes[20:], closes[19:-1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                chg = (cur - prev) / prev * 100
+            with np.errstate(invalid='ignore'), warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                ma5 = np.nanmean(np.ascontiguousarray(sliding_window_view(closes, 5)), axis=1)[16:]
+                ma20 = np.nanmean(np.ascontiguousarray(sliding_window_view(closes, 20)), axis=1)[1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                strength = (ma5 - ma20) / ma20
+            default = np.isnan(ma5) | np.isnan(ma20) | (ma20 <= 0)
+            trend = np.select([strength > 0.05, strength > 0, strength > -0.05], [0, 1, 2], 3)
+            trend[default] = 1  # weak_up
+
+            base = np.full(len(chg), 5.0)
+            in_range = [(chg >= lo) & (chg < hi) for lo, hi in _DAILY_BOUNDS]
+            for k, name in enumerate(_TREND_NAMES):
+                sel = trend == k
+                base[sel] = np.select(in_range, _DAILY_SCORES[name], 5)[sel]
+
+            zero = np.isnan(cur) | np.isnan(prev) | (prev <= 0)
+            base[zero] = 0
+            daily[20:] = np.clip(base, 0, 10)
+            daily_int[20:] = zero
+
+        return fiveday, daily, daily_int
+
+    def _dividend_series(self, code: str, dates: np.ndarray, closes: np.ndarray,
+                         at: np.ndarray, valid: np.ndarray):
+        """全部目标日的股息率得分（(值, 是否 int 型)）"""
+        n_t = len(at)
+        out = np.zeros(n_t)
+        out_int = np.ones(n_t, dtype=bool)
+
+        if code not in self._dividend_data:
+            return out, out_int
+        div_dates, pays = self._dividend_data[code]
+        div_vals = pays / 10
+
+        prices = closes[at].astype(np.float64)
+        ok = valid & ~np.isnan(prices) & (prices > 0)
+        target_dt = dates[at]
+        year_ago = target_dt - np.timedelta64(365, 'D')
+        hit = ((div_dates[None, :] <= target_dt[:, None])
+               & (div_dates[None, :] > year_ago[:, None]))
+        ok &= hit.any(axis=1)
+
+        # 窗口内分红组合相同的日期共享一次求和（求和顺序与逐日版一致）
+        sums = {}
+        for t in np.flatnonzero(ok):
+            key = hit[t].tobytes()
+            if key not in sums:
+                sums[key] = float(div_vals[hit[t]].sum())
+            dy = max(0.0, sums[key] / float(prices[t]))
+            score = _dividend_yield_score(dy)
+            out[t] = score
+            out_int[t] = isinstance(score, int)
+        return out, out_int
+
     def _score_one(self, code: str, target_date: pd.Timestamp) -> Optional[dict]:
         """计算单只股票在指定日期的因子得分"""
         if code not in self._price_data:
@@ -224,53 +557,77 @@ class HistoricalScorer:
             else:
                 trend = 'strong_down'
 
-        scores = {
-            'strong_up': [(-10,-7,8),(-7,-3,6),(-3,0,4),(0,3,2),(3,7,1),(7,10,0)],
-            'weak_up':   [(-10,-7,7),(-7,-3,5),(-3,0,3),(0,3,4),(3,7,6),(7,10,3)],
-            'weak_down': [(-10,-7,6),(-7,-3,4),(-3,0,2),(0,3,5),(3,7,7),(7,10,8)],
-            'strong_down':[(-10,-7,9),(-7,-3,7),(-3,0,3),(0,3,6),(3,7,8),(7,10,9)],
-        }
         base = 5
-        for lo, hi, sc in scores[trend]:
+        for (lo, hi), sc in zip(_DAILY_BOUNDS, _DAILY_SCORES[trend]):
             if lo <= chg < hi:
                 base = sc
                 break
         return float(min(10, max(0, base)))
 
     def _calc_finance(self, code: str, target_date: pd.Timestamp) -> float:
-        rows = self._finance_data.get(code)
-        if not rows:
+        timeline = self._finance_timeline.get(code)
+        if timeline is None:
             return 0
-
-        period_map = self._disclosure_map.get(code, {})
-
-        available = []
-        for row in rows:
-            rp = str(row.get('报告期', ''))
-            if rp in period_map:
-                try:
-                    if pd.to_datetime(period_map[rp]) <= target_date:
-                        available.append(row)
-                except Exception:
-                    pass
-            else:
-                if self._conservative_available(rp, target_date):
-                    available.append(row)
-
-        if len(available) < 3:
+        k = int(np.searchsorted(timeline['dates'], target_date.to_datetime64(), side='right')) - 1
+        if k < 0:
             return 0
+        score = float(timeline['scores'][k])
+        return int(score) if timeline['is_int'][k] else score
+
+    def _build_finance_timeline(self, code: str) -> Optional[dict]:
+        """财报得分随时间的阶梯序列（Point-in-Time）
+
+        每个报告期的生效日：有公告日期用公告日期，否则用法定披露截止日，
+        都无法确定则永不生效。可用报告期集合只在生效日变化，
+        因此在每个不同的生效日按“已生效的最近 3 期（文件顺序）”算一次得分，
+        目标日得分 = 不晚于目标日的最后一个生效日的得分（之前为 0）。
+        """
+        fin = self._finance_data.get(code)
+        if fin is None:
+            return None
+        period_map = self._disclosure_map.get(code, {})
 
-        recent3 = available[-3:]
-        koufei = [self._to_float(r.get('扣非净利润同比增长率', 0)) for r in recent3]
-        guimu = [self._to_float(r.get('净利润同比增长率', 0)) for r in recent3]
-        yingshou = [self._to_float(r.get('营业总收入同比增长率', 0)) for r in recent3]
+        effective = np.array([self._effective_date(rp, period_map)
+                              for rp in fin['periods'].tolist()], dtype='datetime64[ns]')
+        dates = np.unique(effective[~np.isnat(effective)])
+        values = fin['values'].tolist()
 
-        k_base = self._growth_score(koufei[2], 10, 50)
-        k_trend = self._trend_score(koufei, 10)
-        g_base = self._growth_score(guimu[2], 5, 25)
-        g_trend = self._trend_score(guimu, 5)
-        y_base = self._growth_score(yingshou[2], 5, 25)
-        y_trend = self._trend_score(yingshou, 5)
+        scores = np.zeros(len(dates))
+        is_int = np.ones(len(dates), dtype=bool)
+        for t, d in enumerate(dates):
+            available = np.flatnonzero(effective <= d)
+            if len(available) < 3:
+                continue
+            score = self._finance_score([values[i] for i in available[-3:]])
+            scores[t] = score
+            is_int[t] = isinstance(score, int)
+        return {'dates': dates, 'scores': scores, 'is_int': is_int}
+
+    @classmethod
+    def _effective_date(cls, rp: str, period_map: dict):
+        """报告期生效日（datetime64[ns]），无法确定返回 NaT"""
+        if rp in period_map:
+            try:
+                ts = pd.to_datetime(period_map[rp])
+            except Exception:
+                return np.datetime64('NaT')
+        else:
+            ts = cls._conservative_deadline(rp)
+        if ts is None or pd.isna(ts) or ts.tzinfo is not None:
+            return np.datetime64('NaT')
+        return ts.to_datetime64()
+
+    @classmethod
+    def _finance_score(cls, recent3: List[list]) -> float:
+        """最近 3 期 [扣非, 归母, 营收] 同比增长率 → 财报得分"""
+        koufei, guimu, yingshou = (list(col) for col in zip(*recent3))
+
+        k_base = cls._growth_score(koufei[2], 10, 50)
+        k_trend = cls._trend_score(koufei, 10)
+        g_base = cls._growth_score(guimu[2], 5, 25)
+        g_trend = cls._trend_score(guimu, 5)
+        y_base = cls._growth_score(yingshou[2], 5, 25)
+        y_trend = cls._trend_score(yingshou, 5)
 
         total = k_base + k_trend + g_base + g_trend + y_base + y_trend
         return max(min(round(total, 2), 20), -10)
@@ -285,41 +642,20 @@ class HistoricalScorer:
         if np.isnan(price) or price <= 0:
             return 0
 
-        ddf = self._dividend_data.get(code)
-        if ddf is None:
-            return 0
-
-        date_col = None
-        for col in ['公告日期', '实施公告日', '除权日', '股权登记日']:
-            if col in ddf.columns:
-                date_col = col
-                break
-        if date_col is None or '派息' not in ddf.columns:
+        if code not in self._dividend_data:
             return 0
-
-        ddf2 = ddf.copy()
-        ddf2[date_col] = pd.to_datetime(ddf2[date_col], errors='coerce')
-        ddf2['派息'] = pd.to_numeric(ddf2['派息'], errors='coerce').fillna(0)
+        div_dates, pays = self._dividend_data[code]
 
         target_dt = d[-1]
         year_ago = target_dt - np.timedelta64(365, 'D')
 
-        valid = ddf2[(ddf2[date_col] <= target_dt) & (ddf2[date_col] > year_ago)]
-        if valid.empty:
+        hit = (div_dates <= target_dt) & (div_dates > year_ago)
+        if not hit.any():
             return 0
 
-        total_div = (valid['派息'] / 10).sum()
+        total_div = (pays[hit] / 10).sum()
         dy = max(0.0, float(total_div) / price)
-
-        pts = [(0, 0), (0.02, 4), (0.05, 8), (0.08, 10), (0.10, 10)]
-        if dy > 0.10:
-            return 6
-        for i in range(len(pts) - 1):
-            x1, y1 = pts[i]
-            x2, y2 = pts[i + 1]
-            if x1 <= dy <= x2:
-                return round(y1 + (dy - x1) * (y2 - y1) / (x2 - x1), 2)
-        return 0
+        return _dividend_yield_score(dy)
 
     @staticmethod
     def _calc_ytd(dates: np.ndarray, closes: np.ndarray,
@@ -394,40 +730,95 @@ class HistoricalScorer:
         return max(min(t, 0.1 * full), -0.1 * full)
 
     @staticmethod
-    def _conservative_available(rp: str, target: pd.Timestamp) -> bool:
+    def _conservative_deadline(rp: str) -> Optional[pd.Timestamp]:
+        """无公告日期时的法定披露截止日（年报次年4/30，一季报4/30，中报8/31，三季报10/31）"""
         try:
             dt = pd.to_datetime(rp)
         except Exception:
-            return False
+            return None
         y, m = dt.year, dt.month
         if m == 12:
-            ddl = pd.Timestamp(y + 1, 4, 30)
+            return pd.Timestamp(y + 1, 4, 30)
         elif m == 3:
-            ddl = pd.Timestamp(y, 4, 30)
+            return pd.Timestamp(y, 4, 30)
         elif m == 6:
-            ddl = pd.Timestamp(y, 8, 31)
+            return pd.Timestamp(y, 8, 31)
         elif m == 9:
-            ddl = pd.Timestamp(y, 10, 31)
+            return pd.Timestamp(y, 10, 31)
+        return None
+
+
+# ============================================================
+# 预计算（支持按日期分片多进程）
+# ============================================================
+
+# fork 出的子进程通过写时复制直接使用父进程已预加载的评分器，不重新加载数据
+_SHARED_SCORER: Optional[HistoricalScorer] = None
+_SHARED_VECTORIZED = True
+
+
+def _score_shard(date_strs: List[str]) -> Dict[str, pd.DataFrame]:
+    """子进程：计算一个日期分片"""
+    scorer = _SHARED_SCORER
+    if _SHARED_VECTORIZED:
+        return scorer.score_dates(date_strs)
+    return {ds: scorer.score_all_stocks(ds) for ds in date_strs}
+
+
+def _iter_scores(scorer: HistoricalScorer, date_strs: List[str],
+                 vectorized: bool, workers: int):
+    """按日期顺序逐个产出 (date, DataFrame)"""
+    global _SHARED_SCORER, _SHARED_VECTORIZED
+
+    if workers > 1 and len(date_strs) > 1:
+        if 'fork' not in mp.get_all_start_methods():
+            print("⚠️ 当前平台不支持 fork，改为单进程计算")
         else:
-            return False
-        return ddl <= target
+            n_shards = min(len(date_strs), workers * 4)
+            shards = [[str(d) for d in shard]
+                      for shard in np.array_split(np.array(date_strs), n_shards)]
+            print(f"⚡ 多进程评分: {workers} 进程, {len(shards)} 个日期分片")
+
+            _SHARED_SCORER, _SHARED_VECTORIZED = scorer, vectorized
+            try:
+                with mp.get_context('fork').Pool(workers) as pool:
+                    # imap 按提交顺序返回，合并结果与单进程完全一致
+                    for shard, scored in zip(shards, pool.imap(_score_shard, shards)):
+                        for ds in shard:
+                            yield ds, scored[ds]
+            finally:
+                _SHARED_SCORER = None
+            return
+
+    if vectorized:
+        t0 = time.time()
+        print("⚡ 向量化评分...", end="", flush=True)
+        scored = scorer.score_dates(date_strs)
+        print(f" {time.time()-t0:.1f}s")
+        for ds in date_strs:
+            yield ds, scored[ds]
+    else:
+        for ds in date_strs:
+            yield ds, scorer.score_all_stocks(ds)
 
 
 def precompute_scores(start_date: str, end_date: str,
                       stock_codes: List[str] = None,
                       rebalance_days: int = 5,
-                      output_dir: str = "") -> pd.DataFrame:
-    """预计算指定日期范围内的所有评分"""
-    calendar_file = DATA_DIR / "calendar" / "trade_days.csv"
-    cal_df = pd.read_csv(calendar_file)
-    cal_col = cal_df.columns[0]
-    all_days = pd.to_datetime(cal_df[cal_col])
-
-    start_dt = pd.to_datetime(start_date, format='%Y%m%d')
-    end_dt = pd.to_datetime(end_date, format='%Y%m%d')
-    trade_days = all_days[(all_days >= start_dt) & (all_days <= end_dt)]
-    trade_days = trade_days[::rebalance_days]
-    date_strs = [d.strftime('%Y%m%d') for d in trade_days]
+                      output_dir: str = "",
+                      vectorized: bool = True,
+                      workers: int = 1,
+                      use_snapshot: bool = True) -> pd.DataFrame:
+    """预计算指定日期范围内的所有评分
+
+    Args:
+        vectorized: True 时用 score_dates 一次算出全部日期（结果与逐日计算一致），
+                    False 时逐日调用 score_all_stocks
+        workers: 进程数；>1 时把日期范围切成连续分片并行计算（fork 共享预加载数据），
+                 结果按日期顺序合并，与单进程输出一致
+        use_snapshot: 预加载是否经由二进制快照（见 src/backtest/snapshot.py）
+    """
+    date_strs = get_calendar().between(start_date, end_date)[::rebalance_days]
 
     if not date_strs:
         print("❌ 指定范围内无交易日")
@@ -437,23 +828,23 @@ def precompute_scores(start_date: str, end_date: str,
 
     scorer = HistoricalScorer(stock_codes)
     print("⏳ 预加载数据...")
-    scorer.preload_all()
+    scorer.preload_all(use_snapshot=use_snapshot)
 
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
     all_frames = []
-    for i, ds in enumerate(date_strs):
-        t0 = time.time()
+    t0 = time.time()
+    for i, (ds, df) in enumerate(_iter_scores(scorer, date_strs, vectorized, workers)):
         print(f"  [{i+1}/{len(date_strs)}] {ds}", end="", flush=True)
 
-        df = scorer.score_all_stocks(ds)
         if df.empty:
             print(" (无数据)")
             continue
 
         elapsed = time.time() - t0
         print(f" → {len(df)}只, 均分{df['total_score'].mean():.1f}, {elapsed:.1f}s")
+        t0 = time.time()
 
         all_frames.append(df)
 
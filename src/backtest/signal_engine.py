@@ -8,7 +8,7 @@
 """
 
 import os
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
@@ -134,16 +134,63 @@ class SignalEngine:
         self._finance_dicts = finance_dicts
         return score_dicts
 
-    def _get_avg_score(self, code: str, current_idx: int, trade_dates: list,
-                       score_dicts: dict, lookback: int = 7) -> float:
-        """计算过去lookback天的平均评分（使用预计算的字典）"""
-        scores = []
-        for j in range(max(0, current_idx - lookback), current_idx):
-            d = trade_dates[j]
-            day_dict = score_dicts.get(d, {})
-            if code in day_dict:
-                scores.append(day_dict[code])
-        return np.mean(scores) if scores else None
+    def _precompute_avg_scores(self, trade_dates: list, score_dicts: dict,
+                               lookback: int = 7) -> dict:
+        """预计算日期 × 股票的前 lookback 天平均评分矩阵（不含当天）
+
+        第 i 天的均分取 [i-lookback, i) 内有评分的日期，按日期顺序逐个累加后除以天数，
+        与对同样的列表求 np.mean 结果一致（≤7 个元素时 numpy 也是顺序累加）。
+
+        Returns:
+            {'day_cols': 每天评分字典中各代码的列号（按字典顺序）,
+             'avg': (天数, 股票数) 均分，无数据为 NaN,
+             'has': (天数, 股票数) 是否有数据}
+        """
+        col = {}
+        day_cols = []
+        for date in trade_dates:
+            day_cols.append(np.array([col.setdefault(c, len(col)) for c in score_dicts[date]],
+                                     dtype=np.int64))
+
+        n_days, n_codes = len(trade_dates), len(col)
+        values = np.full((n_days, n_codes), np.nan)
+        present = np.zeros((n_days, n_codes), dtype=bool)
+        for i, date in enumerate(trade_dates):
+            if len(day_cols[i]):
+                values[i, day_cols[i]] = np.array(list(score_dicts[date].values()), dtype=np.float64)
+                present[i, day_cols[i]] = True
+
+        avg, has = self._rolling_avg(values, present, lookback)
+        return {'day_cols': day_cols, 'avg': avg, 'has': has}
+
+    @staticmethod
+    def _rolling_avg(values: np.ndarray, present: np.ndarray, lookback: int):
+        """(天数, 股票数) 评分矩阵 → 前 lookback 天均分 (avg, has)，逐日顺序累加"""
+        n_days, n_codes = values.shape
+        # 从最早的一天开始顺序累加：第 k 轮把 i-k 天的评分加到第 i 行
+        total = np.zeros((n_days, n_codes))
+        count = np.zeros((n_days, n_codes), dtype=np.int64)
+        for k in range(min(lookback, n_days), 0, -1):
+            x, p = values[:n_days - k], present[:n_days - k]
+            acc, cnt = total[k:], count[k:]
+            np.add(acc, x, out=acc, where=p & (cnt > 0))
+            np.copyto(acc, x, where=p & (cnt == 0))
+            cnt += p
+
+        has = count > 0
+        avg = np.full((n_days, n_codes), np.nan)
+        np.divide(total, count, out=avg, where=has)
+        return avg, has
+
+    def _buy_mask(self, avg: np.ndarray, has: np.ndarray) -> np.ndarray:
+        """可买入掩码：有均分且不低于阈值（NaN 与逐只比较一样视为不低于）"""
+        cfg = self.config
+        buy_mask = has & ~(avg < cfg.buy_threshold)
+        if cfg.first_break_only:
+            # v2 新增：首次突破过滤——仅在前 7 日均分今日首次跨过阈值时买入
+            # 昨日也满足 → 不是首次突破；昨日无数据 → 也不视作突破（第 0 天不过滤）
+            buy_mask[1:] &= has[:-1] & ~(avg[:-1] >= cfg.buy_threshold)
+        return buy_mask
 
     def run(self, all_scores: dict, trade_dates: list,
             price_cache: dict, name_map: dict) -> SignalResult:
@@ -181,6 +228,10 @@ class SignalEngine:
         # 预计算评分字典，提高查询效率
         score_dicts = self._precompute_score_dicts(all_scores, trade_dates)
 
+        # 前7天均分矩阵
+        avg_scores = self._precompute_avg_scores(trade_dates, score_dicts, lookback=7)
+        buy_mask = self._buy_mask(avg_scores['avg'], avg_scores['has'])
+
         positions = {}
         capital = cfg.initial_capital
         all_trades = []
@@ -290,27 +341,16 @@ class SignalEngine:
                         pos['shares'] = new_shares
                         pos['filled_days'] = pos.get('filled_days', 1) + 1
 
-                # 2b. 寻找新候选
+                # 2b. 寻找新候选（前7天平均分作为买入判断，阈值判断取预计算的掩码）
                 candidates = []
-                for code in score_dict.keys():
-                    # 使用前7天平均分作为买入判断
-                    avg_score = self._get_avg_score(code, i, trade_dates, score_dicts, lookback=7)
-                    if avg_score is None:
-                        continue
+                today_codes = list(score_dict.keys())
+                for k in np.flatnonzero(buy_mask[i, avg_scores['day_cols'][i]]):
+                    code = today_codes[k]
                     if code in positions:
                         continue
-                    if avg_score < cfg.buy_threshold:
-                        continue
                     if code in cooldown_until and i < cooldown_until[code]:
                         continue
-                    # v2 新增：首次突破过滤——仅在前 7 日均分今日首次跨过阈值时买入
-                    if cfg.first_break_only and i > 0:
-                        prev_avg = self._get_avg_score(
-                            code, i - 1, trade_dates, score_dicts, lookback=7
-                        )
-                        # 昨日也满足 → 不是首次突破；昨日无数据 → 也不视作突破
-                        if prev_avg is None or prev_avg >= cfg.buy_threshold:
-                            continue
+                    avg_score = avg_scores['avg'][i, avg_scores['day_cols'][i][k]]
                     # 获取财报评分用于排序
                     finance_score = self._finance_dicts.get(date, {}).get(code, 0)
                     candidates.append((code, avg_score, finance_score))
@@ -385,6 +425,12 @@ class SignalEngine:
                 ))
 
         # 5. 统计
+        return self._summarize(all_trades, daily_nav, capital)
+
+    def _summarize(self, all_trades: list, daily_nav: list, capital: float,
+                   config: Optional[SignalConfig] = None) -> SignalResult:
+        """由交易记录和每日净值计算统计指标（config 缺省为 self.config）"""
+        cfg = config or self.config
         result = SignalResult(config=cfg, trades=all_trades, daily_nav=daily_nav, final_capital=capital)
         if daily_nav:
             result.total_return = (daily_nav[-1][1] - 1) * 100
@@ -418,3 +464,537 @@ class SignalEngine:
 
     def _empty_result(self):
         return SignalResult(config=self.config, trades=[], daily_nav=[])
+
+
+# ============================================================
+# 数组版引擎（网格搜索用：同一份数据跑成百上千组参数）
+# ============================================================
+
+# SignalArrays 缓存的回测区间数（网格搜索 / 滚动优化的各个窗口）
+WINDOW_CACHE_SIZE = 16
+
+
+class SignalArrays:
+    """评分 / 价格的矩阵形式，一份回测数据只构建一次，供多次 ArraySignalEngine.run 共用
+
+    - 评分: (日期, 股票) float64 + 是否有评分；每天评分字典仍保留（卖出评分、候选顺序）
+    - 价格: (日期, 股票) 收盘价，NaN 表示 get_price 会返回 None；
+            全部价格可无损表示为 float32 时用 float32（行情面板数据即如此），否则 float64
+    """
+
+    def __init__(self, all_scores: dict, trade_dates: list, price_cache: dict):
+        self._all_scores = all_scores
+        self._price_cache = price_cache
+
+        self.dates = sorted(set(trade_dates))
+        self.row = {d: i for i, d in enumerate(self.dates)}
+
+        engine = SignalEngine(SignalConfig(scores_dir="", stock_pool=""))
+        self.score_dicts = engine._precompute_score_dicts(all_scores, self.dates)
+        self.finance_dicts = engine._finance_dicts
+
+        col = {}
+        self.day_cols = []
+        for date in self.dates:
+            self.day_cols.append(np.array([col.setdefault(c, len(col)) for c in self.score_dicts[date]],
+                                          dtype=np.int64))
+        self.codes = list(col)
+
+        n_days, n_codes = len(self.dates), len(self.codes)
+        self.scores = np.full((n_days, n_codes), np.nan)
+        self.present = np.zeros((n_days, n_codes), dtype=bool)
+        for i, date in enumerate(self.dates):
+            if len(self.day_cols[i]):
+                self.scores[i, self.day_cols[i]] = np.array(list(self.score_dicts[date].values()),
+                                                            dtype=np.float64)
+                self.present[i, self.day_cols[i]] = True
+
+        prices = np.full((n_days, n_codes), np.nan)
+        for j, code in enumerate(self.codes):
+            cache = price_cache.get(code)
+            if cache is None:
+                continue
+            if isinstance(cache, dict):
+                # 与 get_price 一致：缺失、0、NaN 均视为无价格
+                col_prices = np.array([cache.get(d) or np.nan for d in self.dates], dtype=np.float64)
+            else:
+                # DataFrame 格式（兼容旧调用）：按零点日期匹配，同一天取第一行，价格 0 仍视为有效
+                first = cache[cache['日期'] == cache['日期'].dt.normalize()].drop_duplicates('日期')
+                by_date = dict(zip(first['日期'].dt.strftime('%Y%m%d'),
+                                   first['收盘'].astype(float)))
+                col_prices = np.array([by_date.get(d, np.nan) for d in self.dates], dtype=np.float64)
+            prices[:, j] = col_prices
+        as32 = prices.astype(np.float32)
+        lossless = np.array_equal(as32.astype(np.float64), prices, equal_nan=True)
+        self.prices = as32 if lossless else prices
+
+        # 回测区间 → (行号, 7 日均分, 是否有均分)：同一区间的各组参数共用
+        self._windows: Dict[tuple, tuple] = {}
+
+    def window(self, trade_dates: list, warmup: int = 0) -> tuple:
+        """区间内的 (行号, 均分, 是否有均分)，按区间缓存（最多 WINDOW_CACHE_SIZE 个）
+
+        warmup > 0 时区间前最多 warmup 个交易日一起参与计算（区间开头的均分不再从零开始），
+        返回的三个数组都多出这些前导行，由调用方切掉
+        """
+        key = (tuple(trade_dates), warmup)
+        cached = self._windows.get(key)
+        if cached is None:
+            rows = np.array([self.row[d] for d in trade_dates], dtype=np.int64)
+            if warmup and len(rows):
+                lead = np.arange(max(rows[0] - warmup, 0), rows[0], dtype=np.int64)
+                rows = np.concatenate([lead, rows])
+            avg, has = SignalEngine._rolling_avg(self.scores[rows], self.present[rows], 7)
+            if len(self._windows) >= WINDOW_CACHE_SIZE:
+                self._windows.pop(next(iter(self._windows)))
+            cached = self._windows[key] = (rows, avg, has)
+        return cached
+
+    def matches(self, all_scores: dict, price_cache: dict, trade_dates: list) -> bool:
+        """是否由同一份数据构建且覆盖这些日期"""
+        return (all_scores is self._all_scores and price_cache is self._price_cache
+                and all(d in self.row for d in trade_dates))
+
+
+class ArraySignalEngine(SignalEngine):
+    """数组版 SignalEngine：结果（交易、净值、统计）与 SignalEngine.run 完全一致
+
+    价格取自 (日期, 股票) 矩阵，持仓存放在长度 max_positions 的定长数组中（按建仓先后排列），
+    止盈止损判断和持仓市值对全部持仓向量化计算；资金的逐笔增减仍按持仓顺序进行，
+    保证浮点结果与逐只处理相同。
+    """
+
+    def __init__(self, config: SignalConfig, arrays: Optional[SignalArrays] = None,
+                 warmup: int = 0):
+        super().__init__(config)
+        self.arrays = arrays
+        # 区间前预热的交易日数：均分和首次突破判断用到区间开始前的评分（滚动优化的测试窗口）
+        self.warmup = warmup
+
+    def _close_trade(self, code: str, name: str, buy_date: str, sell_date: str,
+                     buy_score: float, sell_score: float, buy_price: float, sell_price: float,
+                     shares: int, cost: float, hold: int, reason: str):
+        """平仓结算（与 SignalEngine 相同的计算顺序），返回 (交易记录, 到账金额)"""
+        sell_value = sell_price * shares
+        fee = sell_value * self.config.cost_rate
+        trade = SignalTrade(
+            code=code, name=name,
+            buy_date=buy_date, sell_date=sell_date,
+            buy_score=buy_score, sell_score=sell_score,
+            buy_price=buy_price, sell_price=sell_price,
+            shares=shares, hold_days=hold,
+            return_rate=(sell_price - buy_price) / buy_price * 100,
+            net_return=((sell_value - fee) - cost) / cost * 100,
+            reason=reason,
+        )
+        return trade, sell_value - fee
+
+    def _prepare(self, all_scores: dict, trade_dates: list, price_cache: dict):
+        """按回测区间取矩阵：(区间日期, 行号, SignalArrays, 价格, 均分, 可买入掩码)；区间不足 2 天返回 None"""
+        cfg = self.config
+        if cfg.start_date:
+            trade_dates = [d for d in trade_dates if d >= cfg.start_date]
+        if cfg.end_date:
+            trade_dates = [d for d in trade_dates if d <= cfg.end_date]
+        if len(trade_dates) < 2:
+            return None
+
+        arrays = self.arrays
+        if arrays is None or not arrays.matches(all_scores, price_cache, trade_dates):
+            arrays = SignalArrays(all_scores, trade_dates, price_cache)
+        rows, avg, has = arrays.window(trade_dates, self.warmup)
+        buy_mask = self._buy_mask(avg, has)
+        lead = len(rows) - len(trade_dates)     # 预热行只参与均分和买入掩码
+        rows, avg, buy_mask = rows[lead:], avg[lead:], buy_mask[lead:]
+        return trade_dates, rows, arrays, arrays.prices[rows], avg, buy_mask
+
+    def _sorted_candidates(self, i: int, date: str, arrays: SignalArrays, row: int,
+                           avg: np.ndarray, buy_mask: np.ndarray, eligible=None) -> list:
+        """当天候选 [(code, 均分, 财报分, 列号)]，按评分字典顺序收集后稳定排序"""
+        cols = arrays.day_cols[row]
+        ok = buy_mask[i, cols]
+        if eligible is not None:
+            ok = ok & eligible[cols]
+        day_codes = list(arrays.score_dicts[date].keys())
+        finance_dict = arrays.finance_dicts.get(date, {})
+        candidates = []
+        for k in np.flatnonzero(ok):
+            code = day_codes[k]
+            candidates.append((code, avg[i, cols[k]], finance_dict.get(code, 0), cols[k]))
+
+        if self.config.sort_by_finance:
+            candidates.sort(key=lambda x: (x[2], x[1]), reverse=True)
+        else:
+            candidates.sort(key=lambda x: x[1], reverse=True)
+        return candidates
+
+    def run(self, all_scores: dict, trade_dates: list,
+            price_cache: dict, name_map: dict) -> SignalResult:
+        """执行信号策略回测（逻辑与 SignalEngine.run 相同，见其说明）"""
+        cfg = self.config
+        prepared = self._prepare(all_scores, trade_dates, price_cache)
+        if prepared is None:
+            return self._empty_result()
+        trade_dates, rows, arrays, prices, avg, buy_mask = prepared
+        codes = arrays.codes
+
+        # 持仓数组：前 n 个槽位有效，按建仓先后排列
+        cap = max(cfg.max_positions, 0)
+        pos_col = np.zeros(cap, dtype=np.int64)
+        pos_price = np.zeros(cap)        # 持仓均价
+        pos_shares = np.zeros(cap, dtype=np.int64)
+        pos_cost = np.zeros(cap)         # 累计成本（含手续费）
+        pos_entry = np.zeros(cap, dtype=np.int64)
+        pos_filled = np.zeros(cap, dtype=np.int64)
+        pos_score = np.zeros(cap)
+        pos_date = [''] * cap
+        n = 0
+
+        held = np.zeros(len(codes), dtype=bool)
+        cooldown_until = np.full(len(codes), -1, dtype=np.int64)
+
+        capital = cfg.initial_capital
+        all_trades = []
+        daily_nav = []
+
+        def portfolio_value(i):
+            # 与逐只累加顺序相同（cumsum 为严格顺序求和）
+            px = prices[i, pos_col[:n]].astype(np.float64)
+            ok = ~np.isnan(px) & (px != 0)
+            if not ok.any():
+                return 0
+            return np.cumsum(px[ok] * pos_shares[:n][ok])[-1]
+
+        def close(k, cp, date, hold, reason, score_dict):
+            """卖出第 k 个槽位，返回到账金额"""
+            code = codes[pos_col[k]]
+            trade, proceeds = self._close_trade(
+                code, name_map.get(code, ''), pos_date[k], date,
+                pos_score[k], score_dict.get(code, 0),
+                float(pos_price[k]), cp, int(pos_shares[k]), float(pos_cost[k]), hold, reason,
+            )
+            all_trades.append(trade)
+            return proceeds
+
+        for i, date in enumerate(trade_dates):
+            r = rows[i]
+            score_dict = arrays.score_dicts[date]
+
+            # 1. 检查卖出（向量化判断，按持仓顺序结算）
+            if n:
+                cp = prices[i, pos_col[:n]].astype(np.float64)
+                bp = pos_price[:n]
+                with np.errstate(invalid='ignore'):
+                    ret_pct = (cp - bp) / bp * 100
+                    tp = ret_pct >= cfg.take_profit
+                    sl = ~tp & (ret_pct <= -cfg.stop_loss)
+                sell = ~np.isnan(cp) & (tp | sl)
+                if sell.any():
+                    for k in np.flatnonzero(sell):
+                        capital += close(k, float(cp[k]), date, i - int(pos_entry[k]),
+                                         "take_profit" if tp[k] else "stop_loss", score_dict)
+                        held[pos_col[k]] = False
+                        if cfg.cooldown_days > 0:
+                            cooldown_until[pos_col[k]] = i + cfg.cooldown_days
+                    keep = ~sell
+                    m = int(keep.sum())
+                    for arr in (pos_col, pos_price, pos_shares, pos_cost,
+                                pos_entry, pos_filled, pos_score):
+                        arr[:m] = arr[:n][keep]
+                    pos_date[:m] = [d for d, kp in zip(pos_date[:n], keep) if kp]
+                    n = m
+
+            # 2. 检查买入
+            if score_dict and n < cfg.max_positions:
+                total_assets = capital + portfolio_value(i)
+
+                # 2a. 先处理已有持仓的"分 N 天建仓"剩余仓位
+                if cfg.build_days > 1:
+                    for k in range(n):
+                        if pos_filled[k] >= cfg.build_days:
+                            continue
+                        bp = prices[i, pos_col[k]]
+                        if np.isnan(bp) or bp <= 0:
+                            continue
+                        bp = float(bp)
+                        target_amount = total_assets * cfg.max_pos_pct / 100
+                        amount_per_day = target_amount / cfg.build_days
+                        buy_amount = min(amount_per_day, capital * 0.95)
+                        if buy_amount < bp:
+                            continue
+                        shares = int(buy_amount / bp)
+                        if shares <= 0:
+                            continue
+                        cost = shares * bp
+                        total_cost = cost + cost * cfg.cost_rate
+                        if total_cost > capital:
+                            continue
+                        capital -= total_cost
+                        new_shares = int(pos_shares[k]) + shares
+                        new_cost_basis = float(pos_cost[k]) + total_cost
+                        pos_price[k] = new_cost_basis / new_shares
+                        pos_cost[k] = new_cost_basis
+                        pos_shares[k] = new_shares
+                        pos_filled[k] += 1
+
+                # 2b. 寻找新候选（与 SignalEngine 相同：按评分字典顺序收集后稳定排序）
+                eligible = ~held & ~(i < cooldown_until)
+                candidates = self._sorted_candidates(i, date, arrays, r, avg, buy_mask, eligible)
+
+                for code, score, finance_score, j in candidates:
+                    if n >= cfg.max_positions:
+                        break
+                    bp = prices[i, j]
+                    if np.isnan(bp) or bp <= 0:
+                        continue
+                    bp = float(bp)
+                    if cfg.max_pos_pct_basis == "capital":
+                        max_amount = capital * cfg.max_pos_pct / 100
+                    else:
+                        max_amount = total_assets * cfg.max_pos_pct / 100
+                    if cfg.build_days > 1:
+                        max_amount = max_amount / cfg.build_days
+                    buy_amount = min(max_amount, capital * 0.95)
+                    if buy_amount < bp:
+                        continue
+                    shares = int(buy_amount / bp)
+                    if shares <= 0:
+                        continue
+                    cost = shares * bp
+                    total_cost = cost + cost * cfg.cost_rate
+                    if total_cost > capital:
+                        continue
+                    capital -= total_cost
+                    pos_col[n], pos_price[n], pos_shares[n] = j, bp, shares
+                    pos_cost[n], pos_entry[n], pos_filled[n] = total_cost, i, 1
+                    pos_score[n], pos_date[n] = score, date
+                    held[j] = True
+                    n += 1
+
+            # 3. 记录净值
+            daily_nav.append((date, (capital + portfolio_value(i)) / cfg.initial_capital))
+
+        # 4. 年末平仓
+        last = len(trade_dates) - 1
+        for k in range(n):
+            cp = prices[last, pos_col[k]]
+            if not np.isnan(cp) and cp > 0:
+                capital += close(k, float(cp), trade_dates[last], last - int(pos_entry[k]),
+                                 "year_end", score_dict)
+
+        # 5. 统计
+        return self._summarize(all_trades, daily_nav, capital)
+
+
+# ============================================================
+# 参数批量引擎（止盈 / 止损 / 冷却期扫描：K 组参数同步推进）
+# ============================================================
+
+# BatchSignalEngine 中各组参数允许不同的字段
+BATCH_FIELDS = ("take_profit", "stop_loss", "cooldown_days")
+
+
+class BatchSignalEngine(ArraySignalEngine):
+    """K 组只在 BATCH_FIELDS 上不同的参数一起回测，每组结果与单独运行 ArraySignalEngine 完全一致
+
+    均分、买入掩码和每天的候选排序与参数无关，只算一次；资金、持仓、冷却期等状态
+    带一个参数维度 (K, ...)，逐日对 K 组向量化推进。卖出结算和年末平仓仍逐笔进行，
+    同一组内的资金增减顺序与单独回测相同。
+    """
+
+    def __init__(self, configs: List[SignalConfig], arrays: Optional[SignalArrays] = None):
+        if not configs:
+            raise ValueError("BatchSignalEngine 至少需要一组参数")
+        base = configs[0]
+        for cfg in configs[1:]:
+            if replace(cfg, **{f: getattr(base, f) for f in BATCH_FIELDS}) != base:
+                raise ValueError(f"批量回测的各组参数只能在 {', '.join(BATCH_FIELDS)} 上不同")
+        super().__init__(base, arrays)
+        self.configs = list(configs)
+
+    def run(self, all_scores: dict, trade_dates: list,
+            price_cache: dict, name_map: dict) -> List[SignalResult]:
+        """执行 K 组回测，返回与 configs 顺序对应的结果列表"""
+        cfg = self.config
+        configs = self.configs
+        prepared = self._prepare(all_scores, trade_dates, price_cache)
+        if prepared is None:
+            return [SignalResult(config=c, trades=[], daily_nav=[]) for c in configs]
+        trade_dates, rows, arrays, prices, avg, buy_mask = prepared
+        codes = arrays.codes
+
+        K = len(configs)
+        ks = np.arange(K)
+        take_profit = np.array([c.take_profit for c in configs], dtype=np.float64)
+        stop_loss = np.array([c.stop_loss for c in configs], dtype=np.float64)
+        cooldown_days = np.array([c.cooldown_days for c in configs], dtype=np.int64)
+
+        # 持仓数组 (K, max_positions)：每组前 n[k] 个槽位有效，按建仓先后排列
+        cap = max(cfg.max_positions, 0)
+        pos_col = np.zeros((K, cap), dtype=np.int64)
+        pos_price = np.zeros((K, cap))
+        pos_shares = np.zeros((K, cap), dtype=np.int64)
+        pos_cost = np.zeros((K, cap))
+        pos_entry = np.zeros((K, cap), dtype=np.int64)
+        pos_filled = np.zeros((K, cap), dtype=np.int64)
+        pos_score = np.zeros((K, cap))
+        pos_date = np.full((K, cap), '', dtype=object)
+        n = np.zeros(K, dtype=np.int64)
+
+        held = np.zeros((K, len(codes)), dtype=bool)
+        cooldown_until = np.full((K, len(codes)), -1, dtype=np.int64)
+
+        capital = np.full(K, float(cfg.initial_capital))
+        all_trades = [[] for _ in range(K)]
+        navs = np.zeros((len(trade_dates), K))
+
+        def portfolio_value(px):
+            # 每组按槽位顺序逐只累加（与 ArraySignalEngine 的 cumsum 相同）
+            total = np.zeros(K)
+            for s in range(int(n.max(initial=0))):
+                p = px[pos_col[:, s]]
+                ok = (s < n) & ~np.isnan(p) & (p != 0)
+                total = np.where(ok, total + p * pos_shares[:, s], total)
+            return total
+
+        def close(k, s, cp, date, hold, reason, score_dict):
+            """卖出第 k 组第 s 个槽位，返回到账金额"""
+            code = codes[pos_col[k, s]]
+            trade, proceeds = self._close_trade(
+                code, name_map.get(code, ''), pos_date[k, s], date,
+                pos_score[k, s], score_dict.get(code, 0),
+                float(pos_price[k, s]), cp, int(pos_shares[k, s]), float(pos_cost[k, s]),
+                hold, reason,
+            )
+            all_trades[k].append(trade)
+            return proceeds
+
+        def buy_new(i, date, px, mask, total_assets, candidates):
+            """按候选顺序为 mask 中的各组买入新股票（K 组同步，资金逐组独立）"""
+            for code, score, finance_score, j in candidates:
+                open_k = mask & (n < cfg.max_positions)
+                if not open_k.any():
+                    break
+                bp = px[j]
+                if np.isnan(bp) or bp <= 0:
+                    continue
+                act = open_k & ~held[:, j] & ~(i < cooldown_until[:, j])
+                if not act.any():
+                    continue
+                if cfg.max_pos_pct_basis == "capital":
+                    max_amount = capital * cfg.max_pos_pct / 100
+                else:
+                    max_amount = total_assets * cfg.max_pos_pct / 100
+                if cfg.build_days > 1:
+                    max_amount = max_amount / cfg.build_days
+                buy_amount = np.minimum(max_amount, capital * 0.95)
+                act &= ~(buy_amount < bp)
+                shares = np.where(act, np.trunc(buy_amount / bp), 0).astype(np.int64)
+                act &= shares > 0
+                cost = shares * bp
+                total_cost = cost + cost * cfg.cost_rate
+                act &= ~(total_cost > capital)
+                if not act.any():
+                    continue
+                capital[act] -= total_cost[act]
+                kk, ss = ks[act], n[act]
+                pos_col[kk, ss], pos_price[kk, ss], pos_shares[kk, ss] = j, bp, shares[act]
+                pos_cost[kk, ss], pos_entry[kk, ss], pos_filled[kk, ss] = total_cost[act], i, 1
+                pos_score[kk, ss], pos_date[kk, ss] = score, date
+                held[kk, j] = True
+                n[act] += 1
+
+        slots = np.arange(cap)
+        for i, date in enumerate(trade_dates):
+            r = rows[i]
+            score_dict = arrays.score_dicts[date]
+            px = prices[i].astype(np.float64)
+
+            # 1. 检查卖出（K 组一起判断，每组按持仓顺序结算）
+            live = slots[None, :] < n[:, None]
+            if live.any():
+                cp = px[pos_col]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    ret_pct = (cp - pos_price) / pos_price * 100
+                    tp = ret_pct >= take_profit[:, None]
+                    sl = ~tp & (ret_pct <= -stop_loss[:, None])
+                sell = live & ~np.isnan(cp) & (tp | sl)
+                if sell.any():
+                    for k, s in zip(*np.nonzero(sell)):
+                        capital[k] += close(k, s, float(cp[k, s]), date, i - int(pos_entry[k, s]),
+                                            "take_profit" if tp[k, s] else "stop_loss", score_dict)
+                        held[k, pos_col[k, s]] = False
+                        if cooldown_days[k] > 0:
+                            cooldown_until[k, pos_col[k, s]] = i + cooldown_days[k]
+                    # 未卖出的槽位稳定前移
+                    keep = live & ~sell
+                    order = np.argsort(~keep, axis=1, kind='stable')
+                    for arr in (pos_col, pos_price, pos_shares, pos_cost,
+                                pos_entry, pos_filled, pos_score, pos_date):
+                        arr[:] = np.take_along_axis(arr, order, axis=1)
+                    n = keep.sum(axis=1)
+
+            # 2. 检查买入
+            buying = (n < cfg.max_positions) if score_dict else np.zeros(K, dtype=bool)
+            if buying.any():
+                total_assets = capital + portfolio_value(px)
+
+                # 2a. 先处理已有持仓的"分 N 天建仓"剩余仓位（按槽位顺序，K 组同步）
+                if cfg.build_days > 1:
+                    for s in range(int(n.max(initial=0))):
+                        bp = px[pos_col[:, s]]
+                        act = buying & (s < n) & (pos_filled[:, s] < cfg.build_days)
+                        act &= ~np.isnan(bp) & (bp > 0)
+                        if not act.any():
+                            continue
+                        target_amount = total_assets * cfg.max_pos_pct / 100
+                        amount_per_day = target_amount / cfg.build_days
+                        buy_amount = np.minimum(amount_per_day, capital * 0.95)
+                        with np.errstate(invalid='ignore', divide='ignore'):
+                            act &= ~(buy_amount < bp)
+                            shares = np.where(act, np.trunc(buy_amount / bp), 0).astype(np.int64)
+                        act &= shares > 0
+                        cost = shares * bp
+                        total_cost = cost + cost * cfg.cost_rate
+                        act &= ~(total_cost > capital)
+                        if not act.any():
+                            continue
+                        capital[act] -= total_cost[act]
+                        new_shares = pos_shares[act, s] + shares[act]
+                        new_cost_basis = pos_cost[act, s] + total_cost[act]
+                        pos_price[act, s] = new_cost_basis / new_shares
+                        pos_cost[act, s] = new_cost_basis
+                        pos_shares[act, s] = new_shares
+                        pos_filled[act, s] += 1
+
+                # 2b. 寻找新候选：排序与参数无关只做一次，持仓 / 冷却期按组过滤。
+                # 均分 / 财报分含 NaN 时比较不构成全序，先排序再过滤与先过滤再排序可能不同，
+                # 这种日子改为每组按自己的可选集合单独排序
+                candidates = self._sorted_candidates(i, date, arrays, r, avg, buy_mask)
+                if any(c[1] != c[1] or c[2] != c[2] for c in candidates):
+                    for k in np.flatnonzero(buying):
+                        eligible = ~held[k] & ~(i < cooldown_until[k])
+                        buy_new(i, date, px, ks == k, total_assets,
+                                self._sorted_candidates(i, date, arrays, r, avg, buy_mask, eligible))
+                else:
+                    buy_new(i, date, px, buying, total_assets, candidates)
+
+            # 3. 记录净值
+            navs[i] = (capital + portfolio_value(px)) / cfg.initial_capital
+
+        # 4. 年末平仓
+        last = len(trade_dates) - 1
+        px = prices[last].astype(np.float64)
+        for k in range(K):
+            for s in range(int(n[k])):
+                cp = px[pos_col[k, s]]
+                if not np.isnan(cp) and cp > 0:
+                    capital[k] += close(k, s, float(cp), trade_dates[last],
+                                        last - int(pos_entry[k, s]), "year_end", score_dict)
+
+        # 5. 统计
+        results = []
+        for k, c in enumerate(configs):
+            daily_nav = list(zip(trade_dates, navs[:, k].tolist()))
+            results.append(self._summarize(all_trades[k], daily_nav, float(capital[k]), c))
+        return results
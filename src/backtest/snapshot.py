@@ -0,0 +1,179 @@
+"""
+评分器预加载快照 — HistoricalScorer.preload_all 的二进制缓存
+
+preload_all 需要逐个读取 price / finance / disclosure / dividend 四个目录下的 CSV，
+全市场启动要数分钟。快照把每类数据按代码拼接成若干 .npy 数组（附 offsets），
+读取时内存映射，每只股票取到的都是视图，不再做 CSV 解析。
+
+每只股票记录源文件签名 (mtime_ns, size)（依赖多个源文件时依次拼接）：
+  - 签名一致：直接用快照中的数据
+  - 签名变化或新代码：从源文件重建该代码，并写出新一版快照
+快照整体带版本号，SNAPSHOT_VERSION 变化后全部重建。
+
+目录结构：
+  data/snapshot/scorer/meta.json          {version, kinds: {kind: 当前版本目录}}
+  data/snapshot/scorer/{kind}_{build}/    codes / sigs / offsets / present / 各字段 .npy
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SNAPSHOT_DIR = BASE_DIR / "data" / "snapshot" / "scorer"
+
+# 快照内数组布局或解析口径变化时递增
+SNAPSHOT_VERSION = 1
+
+Entry = Optional[Dict[str, np.ndarray]]
+
+
+def file_signature(path: Path) -> tuple:
+    """源文件签名 (mtime_ns, size)，文件不存在为 (0, 0)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _source_signature(src: Union[Path, List[Path]]) -> tuple:
+    if isinstance(src, (list, tuple)):
+        return sum((file_signature(p) for p in src), ())
+    return file_signature(src)
+
+
+def _read_meta(snapshot_dir: Path) -> dict:
+    try:
+        with open(snapshot_dir / "meta.json", encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {'version': SNAPSHOT_VERSION, 'kinds': {}}
+    if meta.get('version') != SNAPSHOT_VERSION:
+        return {'version': SNAPSHOT_VERSION, 'kinds': {}}
+    return meta
+
+
+class _Table:
+    """单类数据的快照（只读内存映射）"""
+
+    def __init__(self, path: Path, fields: List[str]):
+        self.codes = [str(c) for c in np.load(path / "codes.npy")]
+        self.sigs = np.load(path / "sigs.npy")
+        self.offsets = np.load(path / "offsets.npy")
+        self.present = np.load(path / "present.npy")
+        self.arrays = {f: np.load(path / f"{f}.npy", mmap_mode='r') for f in fields}
+        self.index = {c: i for i, c in enumerate(self.codes)}
+
+    def entry(self, i: int) -> Entry:
+        if not self.present[i]:
+            return None
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return {f: np.asarray(arr[lo:hi]) for f, arr in self.arrays.items()}
+
+
+def _open_table(snapshot_dir: Path, meta: dict, kind: str,
+                fields: List[str]) -> Optional[_Table]:
+    name = meta['kinds'].get(kind)
+    if not name:
+        return None
+    try:
+        return _Table(snapshot_dir / name, fields)
+    except Exception:
+        return None
+
+
+def _write_table(snapshot_dir: Path, kind: str, fields: Dict[str, np.dtype],
+                 codes: List[str], sigs: List[tuple], entries: List[Entry]) -> str:
+    """写出新一版快照目录，返回目录名"""
+    name = f"{kind}_{time.time_ns()}"
+    tmp = snapshot_dir / f"{name}.tmp"
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    lengths = [0 if e is None else len(next(iter(e.values()))) for e in entries]
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+
+    np.save(tmp / "codes.npy", np.array(codes, dtype=str))
+    width = len(sigs[0]) if sigs else 2
+    np.save(tmp / "sigs.npy", np.array(sigs, dtype=np.int64).reshape(-1, width))
+    np.save(tmp / "offsets.npy", offsets)
+    np.save(tmp / "present.npy", np.array([e is not None for e in entries], dtype=bool))
+    for f, dtype in fields.items():
+        parts = [np.asarray(e[f]) for e in entries if e is not None]
+        if parts:
+            arr = np.concatenate(parts)
+        else:
+            arr = np.zeros(0, dtype=dtype)
+        np.save(tmp / f"{f}.npy", arr)
+
+    os.replace(tmp, snapshot_dir / name)
+    return name
+
+
+def load_kind(kind: str, codes: List[str], fields: Dict[str, np.dtype],
+              source: Callable[[str], Union[Path, List[Path]]],
+              build: Callable[[str], Entry],
+              snapshot_dir: Path = SNAPSHOT_DIR) -> Tuple[Dict[str, Entry], int]:
+    """按快照加载一类数据，源文件有变化的代码重建后写回快照
+
+    Args:
+        kind: 数据类别（price / finance / disclosure / dividend）
+        fields: 字段名 -> dtype，每个字段按行拼接
+        source: code -> 源文件路径或路径列表（用于签名）
+        build: code -> {字段: ndarray}，源文件缺失或无效返回 None
+
+    Returns:
+        ({code: {字段: ndarray} 或 None}, 本次重建的代码数)
+    """
+    meta = _read_meta(snapshot_dir)
+    table = _open_table(snapshot_dir, meta, kind, list(fields))
+
+    result: Dict[str, Entry] = {}
+    rebuilt: Dict[str, tuple] = {}
+    for code in codes:
+        sig = _source_signature(source(code))
+        i = table.index.get(code) if table is not None else None
+        if i is not None and tuple(table.sigs[i]) == sig:
+            result[code] = table.entry(i)
+            continue
+        result[code] = build(code)
+        rebuilt[code] = sig
+
+    if rebuilt:
+        # 新快照 = 旧快照中未重建的代码 + 本次重建的代码
+        all_codes, all_sigs, all_entries = [], [], []
+        if table is not None:
+            for i, code in enumerate(table.codes):
+                if code in rebuilt:
+                    continue
+                all_codes.append(code)
+                all_sigs.append(tuple(table.sigs[i]))
+                all_entries.append(table.entry(i))
+        for code, sig in rebuilt.items():
+            all_codes.append(code)
+            all_sigs.append(sig)
+            all_entries.append(result[code])
+
+        try:
+            name = _write_table(snapshot_dir, kind, fields, all_codes, all_sigs, all_entries)
+            meta = _read_meta(snapshot_dir)
+            old = meta['kinds'].get(kind)
+            meta['kinds'][kind] = name
+            meta['built_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            tmp_meta = snapshot_dir / f"meta.json.{os.getpid()}.tmp"
+            with open(tmp_meta, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_meta, snapshot_dir / "meta.json")
+            # 旧版本目录：已打开的内存映射在 Linux 上删除后仍然有效
+            if old and old != name:
+                shutil.rmtree(snapshot_dir / old, ignore_errors=True)
+        except OSError as e:
+            print(f"  ⚠️ 写入 {kind} 快照失败: {e}")
+
+    return result, len(rebuilt)
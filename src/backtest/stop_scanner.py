@@ -0,0 +1,168 @@
+"""
+止盈止损首次触达扫描 — 按日最高 / 最低价判断持仓从买入日起首次触达哪一侧
+
+规则（与原 calc_signals.check_kline_stop 逐行扫描一致）：
+  - 扫描 [买入日, end_date] 内的交易日，最高或最低价缺失的日子跳过
+  - 最高 ≥ 止盈价 为止盈，最低 ≤ 止损价 为止损
+  - 同一天两侧都触达 → both，保守按止损价卖出
+  - 卖出价取目标价（不取当天最高 / 最低）
+
+全部持仓一次处理：行情面板中的股票直接切出 (交易日, 持仓) 的最高 / 最低矩阵，
+用布尔掩码整体比较后按列取首个命中行；面板中没有或已过期的股票读价格 CSV 逐只计算。
+first_touch 只依赖数组，回测中需要盘中止盈止损的场景可直接使用。
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.datafactory.price_panel import PricePanel
+from src.datafactory.price_store import PRICE_DIR, load_price_frame, read_price_csv
+
+# first_touch 返回的触达类型
+NO_TOUCH, TAKE_PROFIT, STOP_LOSS, BOTH = 0, 1, 2, 3
+STOP_TYPES = {TAKE_PROFIT: 'take_profit', STOP_LOSS: 'stop_loss', BOTH: 'both'}
+
+
+def first_touch(high: np.ndarray, low: np.ndarray,
+                tp_price: np.ndarray, sl_price: np.ndarray,
+                start: Optional[np.ndarray] = None,
+                stop: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(交易日, 持仓) 最高 / 最低矩阵中每列首次触达止盈或止损的行
+
+    Args:
+        high, low: (T, N) 价格矩阵，NaN 为缺失
+        tp_price, sl_price: (N,) 止盈 / 止损价
+        start, stop: (N,) 每列的扫描行范围 [start, stop)，缺省为全部行
+
+    Returns:
+        (row, kind)：row 为首次触达的行号（未触达为 -1），
+                     kind 为 NO_TOUCH / TAKE_PROFIT / STOP_LOSS / BOTH
+    """
+    n_rows, n_cols = high.shape
+    if n_rows == 0:
+        return np.full(n_cols, -1, dtype=np.int64), np.zeros(n_cols, dtype=np.int64)
+
+    t = np.arange(n_rows)[:, None]
+    valid = ~np.isnan(high) & ~np.isnan(low)
+    if start is not None:
+        valid &= t >= np.asarray(start)[None, :]
+    if stop is not None:
+        valid &= t < np.asarray(stop)[None, :]
+
+    tp_hit = valid & (high >= np.asarray(tp_price)[None, :])
+    sl_hit = valid & (low <= np.asarray(sl_price)[None, :])
+    # 累计命中数首次达到 1 的行即首次触达
+    touched = np.cumsum(tp_hit | sl_hit, axis=0) >= 1
+    first = np.argmax(touched, axis=0)
+    cols = np.arange(n_cols)
+    triggered = touched[-1]
+
+    kind = tp_hit[first, cols] * TAKE_PROFIT + sl_hit[first, cols] * STOP_LOSS
+    return np.where(triggered, first, -1), np.where(triggered, kind, NO_TOUCH).astype(np.int64)
+
+
+def _not_triggered() -> dict:
+    return {'triggered': False, 'type': None, 'sell_price': 0, 'trigger_date': ''}
+
+
+def _csv_arrays(code: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """价格 CSV（或列式存储）→ (日期 int, 最高, 最低)"""
+    df = load_price_frame(code)
+    if df is None:
+        path = PRICE_DIR / f"{code}.csv"
+        if not path.exists():
+            return None
+        try:
+            df = read_price_csv(path)
+        except Exception:
+            return None
+    if df is None or df.empty or '最高' not in df.columns or '最低' not in df.columns:
+        return None
+    dates = df['日期'].dt.strftime('%Y%m%d').astype(np.int64).to_numpy()
+    high = pd.to_numeric(df['最高'], errors='coerce').to_numpy(dtype=np.float64)
+    low = pd.to_numeric(df['最低'], errors='coerce').to_numpy(dtype=np.float64)
+    return dates, high, low
+
+
+def scan_stops(positions: List[dict],
+               take_profit: Union[float, Sequence[float]],
+               stop_loss: Union[float, Sequence[float]],
+               end_date: str = None,
+               use_panel: bool = True) -> List[dict]:
+    """批量检查持仓是否触达止盈 / 止损
+
+    Args:
+        positions: [{'code', 'cost', 'buy_date'(YYYYMMDD)}, ...]
+        take_profit / stop_loss: 比例（0.2 = 20%），可为每个持仓单独给出
+        end_date: 扫描截止日（含），默认今天
+
+    Returns:
+        与 positions 顺序对应的
+        [{'triggered': bool, 'type': 'take_profit'|'stop_loss'|'both'|None,
+          'trigger_date': str, 'sell_price': float}, ...]
+    """
+    n = len(positions)
+    results = [_not_triggered() for _ in range(n)]
+    if not n:
+        return results
+
+    end_date = end_date or datetime.now().strftime('%Y%m%d')
+    codes = [str(p['code']).zfill(6) for p in positions]
+    costs = np.array([float(p['cost']) for p in positions], dtype=np.float64)
+    buy_dates = np.array([int(p['buy_date']) for p in positions], dtype=np.int64)
+    tp = np.broadcast_to(np.asarray(take_profit, dtype=np.float64), (n,))
+    sl = np.broadcast_to(np.asarray(stop_loss, dtype=np.float64), (n,))
+    tp_price = costs * (1 + tp)
+    sl_price = costs * (1 - sl)
+
+    def fill(idx: List[int], rows: np.ndarray, kind: np.ndarray, dates: np.ndarray):
+        for k, i in enumerate(idx):
+            if kind[k] == NO_TOUCH:
+                continue
+            results[i] = {
+                'triggered': True,
+                'type': STOP_TYPES[kind[k]],
+                'trigger_date': str(dates[rows[k]]),
+                # 同日双触达，保守取止损
+                'sell_price': float(tp_price[i] if kind[k] == TAKE_PROFIT else sl_price[i]),
+            }
+
+    # 1. 行情面板中未过期的股票：一次切出 (交易日, 持仓) 矩阵
+    rest = list(range(n))
+    panel = PricePanel.open() if use_panel else None
+    if panel is not None:
+        fresh = panel.fresh_codes(sorted(set(codes)))
+        idx = [i for i in range(n) if codes[i] in fresh]
+        if idx:
+            sl_rows = panel.date_slice(str(buy_dates[idx].min()), end_date)
+            dates = panel.dates[sl_rows]
+            cols = [panel.code_index(codes[i]) for i in idx]
+            high = np.asarray(panel.field('high')[sl_rows])[:, cols]
+            low = np.asarray(panel.field('low')[sl_rows])[:, cols]
+            start = np.searchsorted(dates, buy_dates[idx], side='left')
+            rows, kind = first_touch(high, low, tp_price[idx], sl_price[idx], start)
+            fill(idx, rows, kind, dates)
+            done = set(idx)
+            rest = [i for i in range(n) if i not in done]
+
+    # 2. 其余股票逐只读价格文件（同一股票的多个持仓共用一次读取）
+    by_code: Dict[str, List[int]] = {}
+    for i in rest:
+        by_code.setdefault(codes[i], []).append(i)
+    end = int(end_date)
+    for code, idx in by_code.items():
+        arrays = _csv_arrays(code)
+        if arrays is None:
+            continue
+        dates, high, low = arrays
+        m = len(idx)
+        start = np.searchsorted(dates, buy_dates[idx], side='left')
+        stop = np.full(m, np.searchsorted(dates, end, side='right'))
+        rows, kind = first_touch(np.repeat(high[:, None], m, axis=1), np.repeat(low[:, None], m, axis=1),
+                                 tp_price[idx], sl_price[idx], start, stop)
+        fill(idx, rows, kind, dates)
+
+    return results
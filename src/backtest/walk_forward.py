@@ -0,0 +1,244 @@
+"""
+滚动优化（walk-forward）— 训练窗口选参数，紧随其后的测试窗口做样本外检验
+
+  |—— 训练 ——|— 测试 —|
+             |—— 训练 ——|— 测试 —|
+                        |—— 训练 ——|— 测试 —|
+
+每个折（fold）在训练窗口上跑参数搜索（run_grid_search，可用任一搜索策略），
+取夏普最高的参数在测试窗口上回测；各折测试窗口首尾相接，净值按折连乘拼成一条样本外净值曲线。
+
+测试窗口的 7 日均分带上测试开始前的评分一起计算（WARMUP_DAYS），测试首日即可正常买入；
+各折参数不同，持仓不跨折延续：每折期末按收盘价强制平仓，强平笔数逐折记在 test_forced 并汇总打印。
+
+数据只加载一次，评分 / 价格矩阵（SignalArrays）在所有折之间共用；
+同一窗口的 7 日均分由 SignalArrays 按区间缓存，各组参数不重复计算。
+多进程时按折并行（fork 只读共享已加载数据）。
+"""
+
+import multiprocessing as mp
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+
+from src.backtest.grid_search import make_config, run_grid_search
+from src.backtest.signal_engine import ArraySignalEngine, SignalArrays, SignalResult
+
+# 测试窗口预热的交易日数：7 日均分（不含当天）+ 首次突破判断所需的前一天
+WARMUP_DAYS = 8
+
+
+@dataclass
+class Fold:
+    index: int
+    train_start: str
+    train_end: str
+    test_start: str
+    test_end: str
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame                      # 每折选出的参数、训练期 / 测试期指标
+    nav: List[tuple] = field(default_factory=list)   # 拼接后的样本外净值 [(date, nav)]
+    summary: Optional[SignalResult] = None   # 样本外整体指标（收益、夏普、回撤、胜率…）
+
+
+def make_folds(trade_dates: list, train_days: int, test_days: int,
+               anchored: bool = False) -> List[Fold]:
+    """按交易日切分折：测试窗口依次相接，最后一折测试窗口不足 test_days 时取剩余天数（至少 2 天）
+
+    anchored=True 时训练窗口起点固定在第一天（扩张窗口），否则为长度 train_days 的滚动窗口
+    """
+    folds = []
+    test_lo = train_days
+    while test_lo + 2 <= len(trade_dates):
+        test_hi = min(test_lo + test_days, len(trade_dates))
+        train_lo = 0 if anchored else test_lo - train_days
+        folds.append(Fold(
+            index=len(folds),
+            train_start=trade_dates[train_lo],
+            train_end=trade_dates[test_lo - 1],
+            test_start=trade_dates[test_lo],
+            test_end=trade_dates[test_hi - 1],
+        ))
+        test_lo = test_hi
+    return folds
+
+
+def _native(value):
+    # DataFrame 取出的 numpy 标量转回 Python 类型（参数传给 SignalConfig）
+    return value.item() if hasattr(value, "item") else value
+
+
+def run_fold(data: dict, fold: Fold, param_grid: dict, arrays: SignalArrays,
+             search: dict) -> tuple:
+    """跑一折：训练窗口搜索参数 → 测试窗口回测，返回 (汇总行, 测试期 SignalResult)"""
+    train = run_grid_search(
+        data=data,
+        param_grid=param_grid,
+        start_date=fold.train_start,
+        end_date=fold.train_end,
+        arrays=arrays,
+        verbose=False,
+        **search,
+    )
+    best = train.iloc[0]
+    # 按列取值保留各列原有类型（整行取出会统一成 float）
+    params = {key: _native(train[key].iloc[0]) for key in param_grid}
+
+    test = ArraySignalEngine(make_config(params, fold.test_start, fold.test_end), arrays,
+                             warmup=WARMUP_DAYS).run(
+        all_scores=data["all_scores"],
+        trade_dates=data["trade_dates"],
+        price_cache=data["price_cache"],
+        name_map=data["name_map"],
+    )
+
+    row = {
+        "fold": fold.index,
+        "train_start": fold.train_start,
+        "train_end": fold.train_end,
+        "test_start": fold.test_start,
+        "test_end": fold.test_end,
+        **params,
+        "train_sharpe": round(float(best["sharpe"]), 3),
+        "train_return": round(float(best["total_return"]), 2),
+        "test_return": round(test.total_return, 2),
+        "test_sharpe": round(test.sharpe_ratio, 3),
+        "test_max_dd": round(test.max_drawdown, 2),
+        "test_trades": test.total_trades,
+        "test_forced": sum(t.reason == "year_end" for t in test.trades),   # 折末强制平仓
+    }
+    return row, test
+
+
+# fork 出的子进程通过写时复制只读共享父进程已加载的数据
+_SHARED: Optional[tuple] = None
+
+
+def _fold_worker(fold: Fold) -> tuple:
+    data, param_grid, arrays, search = _SHARED
+    return fold.index, run_fold(data, fold, param_grid, arrays, search)
+
+
+def _stitch(results: List[SignalResult]) -> List[tuple]:
+    """各折测试期净值首尾连乘：每折从上一折的期末净值出发"""
+    nav = []
+    base = 1.0
+    for result in results:
+        for date, value in result.daily_nav:
+            nav.append((date, base * value))
+        if result.daily_nav:
+            base *= result.daily_nav[-1][1]
+    return nav
+
+
+def run_walk_forward(
+    data: dict,
+    param_grid: dict,
+    train_days: int = 120,
+    test_days: int = 20,
+    start_date: str = "",
+    end_date: str = "",
+    anchored: bool = False,
+    workers: int = 1,
+    strategy: str = "grid",
+    batched: bool = False,
+    budget: Optional[float] = None,
+    patience: Optional[int] = None,
+    min_sharpe: Optional[float] = None,
+    seed: int = 0,
+) -> WalkForwardResult:
+    """滚动优化
+
+    Args:
+        data: load_backtest_data() 的返回值
+        param_grid: 参数网格（同 run_grid_search，tpe 可用连续区间）
+        train_days / test_days: 训练 / 测试窗口长度（交易日）
+        start_date / end_date: 参与切分的日期范围
+        anchored: True 时训练窗口从第一天起扩张
+        workers: 按折并行的进程数（折内搜索单进程）
+        strategy / batched / budget / patience / min_sharpe / seed: 传给每折的 run_grid_search
+
+    Returns:
+        WalkForwardResult：每折明细、拼接后的样本外净值、样本外整体指标
+    """
+    dates = [d for d in data["trade_dates"]
+             if (not start_date or d >= start_date) and (not end_date or d <= end_date)]
+    folds = make_folds(dates, train_days, test_days, anchored)
+    if not folds:
+        print(f"❌ 交易日不足：{len(dates)} 天，训练窗口需 {train_days} 天 + 测试至少 2 天")
+        return WalkForwardResult(folds=pd.DataFrame())
+
+    print(f"📊 滚动优化: {len(folds)} 折（训练 {train_days} 天{'（扩张）' if anchored else ''}"
+          f" / 测试 {test_days} 天），样本外 {folds[0].test_start} ~ {folds[-1].test_end}")
+
+    arrays = SignalArrays(data["all_scores"], data["trade_dates"], data["price_cache"])
+    print(f"  数组引擎: {len(arrays.dates)} 天 × {len(arrays.codes)} 只")
+    search = dict(strategy=strategy, batched=batched, budget=budget, patience=patience,
+                  min_sharpe=min_sharpe, seed=seed)
+
+    outputs = [None] * len(folds)
+    t0 = time.time()
+
+    def report(done, fold_index):
+        row = outputs[fold_index][0]
+        print(f"  [{done}/{len(folds)}] 折 {fold_index + 1}: 测试 {row['test_start']}~{row['test_end']} "
+              f"收益 {row['test_return']:+.2f}% 夏普 {row['test_sharpe']:.2f}，耗时{time.time() - t0:.0f}s")
+
+    global _SHARED
+    if workers > 1 and len(folds) > 1 and 'fork' in mp.get_all_start_methods():
+        print(f"  并行进程: {min(workers, len(folds))}")
+        _SHARED = (data, param_grid, arrays, search)
+        try:
+            with mp.get_context('fork').Pool(min(workers, len(folds))) as pool:
+                for done, (idx, output) in enumerate(pool.imap_unordered(_fold_worker, folds), start=1):
+                    outputs[idx] = output
+                    report(done, idx)
+        finally:
+            _SHARED = None
+    else:
+        for done, fold in enumerate(folds, start=1):
+            outputs[fold.index] = run_fold(data, fold, param_grid, arrays, search)
+            report(done, fold.index)
+
+    rows = [row for row, _ in outputs]
+    tests = [test for _, test in outputs]
+    nav = _stitch(tests)
+
+    # 样本外整体指标：拼接净值 + 全部测试期交易
+    engine = ArraySignalEngine(make_config(rows[0], folds[0].test_start, folds[-1].test_end))
+    trades = [t for test in tests for t in test.trades]
+    final_nav = nav[-1][1] if nav else 1.0
+    summary = engine._summarize(trades, nav, engine.config.initial_capital * final_nav)
+
+    return WalkForwardResult(folds=pd.DataFrame(rows), nav=nav, summary=summary)
+
+
+def print_walk_forward(result: WalkForwardResult):
+    """打印每折明细与样本外汇总"""
+    df = result.folds
+    if df.empty:
+        return
+    print()
+    print("=" * 100)
+    print("                        🔁 滚动优化结果（样本外）")
+    print("=" * 100)
+    print(f"  {'折':>3} {'测试区间':<19} {'止盈%':>6} {'止损%':>6} {'冷却':>4} "
+          f"{'训练夏普':>8} {'测试收益%':>9} {'测试夏普':>8} {'回撤%':>7} {'笔数':>5} {'强平':>4}")
+    print("  " + "-" * 98)
+    for _, row in df.iterrows():
+        print(f"  {row['fold'] + 1:>3} {row['test_start']}~{row['test_end']} "
+              f"{row['take_profit']:>6.1f} {row['stop_loss']:>6.1f} {row['cooldown_days']:>4.0f} "
+              f"{row['train_sharpe']:>8.2f} {row['test_return']:>+9.2f} {row['test_sharpe']:>8.2f} "
+              f"{row['test_max_dd']:>7.2f} {row['test_trades']:>5.0f} {row['test_forced']:>4.0f}")
+
+    s = result.summary
+    print()
+    print(f"  样本外总收益: {s.total_return:+.2f}%  年化: {s.annual_return:+.2f}%  "
+          f"夏普: {s.sharpe_ratio:.3f}  最大回撤: {s.max_drawdown:.2f}%  "
+          f"胜率: {s.win_rate:.1f}%  交易: {s.total_trades} 笔（折末强平 {df['test_forced'].sum()} 笔）")
+    print()
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, List
 
 class BaseFactor:
     """因子基类：所有因子应继承并实现 calculate() 方法。
@@ -8,10 +8,35 @@ class BaseFactor:
       - score: float (该因子得分，0~max)
       - weight: float (该因子占比, 例如 0.1 表示10%)
       - meta: dict (可选，附加信息用于展示)
+
+    uses_network: calculate() 每次都会请求远程接口时设为 True，
+      批量评分只对这类因子做请求限速，本地 CSV 因子不受影响。
+
+    calculate_batch(codes, date) 为可选的截面批量接口，返回
+    {code: 与 calculate() 同格式的结果}；默认逐只调用 calculate()，
+    基于价格的因子可重写为对整个股票池的一次数组计算。
     """
+    uses_network = False
+
     def __init__(self, code, name=None):
         self.code = code
         self.name = name or ""
 
     def calculate(self) -> Dict:
         raise NotImplementedError("子类必须实现 calculate 方法")
+
+    @classmethod
+    def calculate_batch(cls, codes: List[str], date: str = None) -> Dict[str, Dict]:
+        """批量计算一组股票的因子结果
+
+        Args:
+            codes: 股票代码列表
+            date: 截面日期 YYYYMMDD，None 表示最新数据（默认实现逐只调用
+                  calculate()，不使用 date）
+        """
+        return {code: cls(code).calculate() for code in codes}
+
+    @classmethod
+    def has_batch(cls) -> bool:
+        """是否重写了 calculate_batch（向量化实现）"""
+        return cls.calculate_batch.__func__ is not BaseFactor.calculate_batch.__func__
@@ -1,17 +1,42 @@
 import pkgutil
 import importlib
+import threading
+import time
 from typing import List, Dict
 from pathlib import Path
 
+from src.core.base_factor import BaseFactor
+
 FACTORS_PACKAGE = "src.factors"
 
 
-def discover_and_run(code: str) -> List[Dict]:
-    """动态发现 src/factors 下的因子模块并执行 calculate，返回因子结果列表。"""
-    results = []
+class RateLimiter:
+    """线程安全的请求限速器：相邻两次 wait() 放行的时间至少间隔 interval 秒"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _discover_factor_classes():
+    """按模块、属性名顺序列出 src/factors 下带 calculate 方法的类
+
+    Returns:
+        [(module_name, attr, cls), ...]
+    """
+    classes = []
     package_dir = Path(__file__).resolve().parents[1] / "factors"
     for finder, name, ispkg in pkgutil.iter_modules([str(package_dir)]):
-        module_name = f"src.factors.{name}"
+        module_name = f"{FACTORS_PACKAGE}.{name}"
         try:
             module = importlib.import_module(module_name)
         except Exception as e:
@@ -19,14 +44,37 @@ def discover_and_run(code: str) -> List[Dict]:
             print(f"加载因子 {module_name} 失败: {e}")
             continue
 
-        # 在模块内查找所有继承 BaseFactor 的类并执行
         for attr in dir(module):
             cls = getattr(module, attr)
+            # 判断是否为类且有 calculate 方法
+            if isinstance(cls, type) and hasattr(cls, 'calculate'):
+                classes.append((module_name, attr, cls))
+    return classes
+
+
+def discover_and_run(code: str) -> List[Dict]:
+    """动态发现 src/factors 下的因子模块并执行 calculate，返回因子结果列表。"""
+    return discover_and_run_batch([code])[code]
+
+
+def discover_and_run_batch(codes: List[str], date: str = None) -> Dict[str, List[Dict]]:
+    """对一组股票执行全部因子，返回 {code: 因子结果列表}。
+
+    重写了 calculate_batch 的因子整池一次计算，其余因子逐只 calculate；
+    批量计算失败时该因子回退为逐只计算。
+    """
+    results = {code: [] for code in codes}
+    for module_name, attr, cls in _discover_factor_classes():
+        batch = None
+        if issubclass(cls, BaseFactor) and cls.has_batch():
+            try:
+                batch = cls.calculate_batch(codes, date)
+            except Exception as e:
+                print(f"批量执行因子 {module_name}.{attr} 失败，改为逐只计算: {e}")
+
+        for code in codes:
             try:
-                # 判断是否为类且有 calculate 方法
-                if isinstance(cls, type) and hasattr(cls, 'calculate'):
-                    inst = cls(code)
-                    results.append(inst.calculate())
+                results[code].append(batch[code] if batch is not None else cls(code).calculate())
             except Exception as e:
                 print(f"执行因子 {module_name}.{attr} 失败: {e}")
     return results
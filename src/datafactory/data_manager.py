@@ -6,6 +6,8 @@ import time
 import akshare as ak
 import pandas as pd
 
+from src.datafactory.price_panel import PricePanel
+
 DATA_DIR = "data"
 PRICE_PATH = os.path.join(DATA_DIR, "price")
 FINANCE_PATH = os.path.join(DATA_DIR, "finance")
@@ -20,6 +22,22 @@ for path in [PRICE_PATH, FINANCE_PATH, DIVIDEND_PATH, ATTENTION_PATH, NEWS_PATH,
     os.makedirs(path, exist_ok=True)
 
 
+# 批量评分时由 main.run_batch 设置的请求限速器（RateLimiter），
+# 本地缓存缺失 / 过期而回退远程接口的取数函数在请求前调用 wait()
+_remote_limiter = None
+
+
+def set_remote_limiter(limiter):
+    """设置（None 为取消）远程取数的请求限速器"""
+    global _remote_limiter
+    _remote_limiter = limiter
+
+
+def _throttle():
+    if _remote_limiter is not None:
+        _remote_limiter.wait()
+
+
 def normalize_code(code: str) -> str:
     if len(code) == 6:
         return code
@@ -50,6 +68,7 @@ def get_finance(code, refresh=False):
         if local is not None and not local.empty:
             return local
 
+    _throttle()
     try:
         remote = ak.stock_financial_abstract_ths(symbol=code, indicator="按单季度")
     except Exception:
@@ -70,6 +89,7 @@ def get_dividend(code, refresh=False):
     if not refresh and local is not None and not local.empty:
         return local
 
+    _throttle()
     try:
         remote = ak.stock_history_dividend_detail(symbol=code, indicator="分红")
     except Exception:
@@ -722,15 +742,19 @@ def get_kline_after_disclosure(code, quarter: str = "本季度", days: int = 7):
     if not disclosure_info or not disclosure_info.get('公告日期'):
         return {"error": f"未找到 {quarter} 的财报公告日期", "kline": []}
 
-    # 获取价格数据
-    price_df = get_price(code)
+    # 获取价格数据（优先从共享行情面板切片，日期已是 datetime）
+    panel = PricePanel.open()
+    if panel is not None and panel.fresh_codes([code]):
+        price_df = panel.frame(code)
+    else:
+        price_df = get_price(code)
+        if price_df is not None and not price_df.empty:
+            # 转换日期格式
+            price_df = price_df.copy()
+            price_df['日期'] = pd.to_datetime(price_df['日期'].astype(str), format='%Y%m%d')
     if price_df is None or price_df.empty:
         return {"error": "未找到价格数据，请先更新行情数据", "kline": []}
 
-    # 转换日期格式
-    price_df = price_df.copy()
-    price_df['日期'] = pd.to_datetime(price_df['日期'].astype(str), format='%Y%m%d')
-
     # 公告日期
     disclosure_date = pd.to_datetime(disclosure_info['公告日期'])
 
@@ -7,6 +7,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 import pandas as pd
 
 from src.datafactory.data_manager import PRICE_PATH, normalize_code
+from src.datafactory.price_store import sync_price_store
+from src.datafactory.price_panel import build_panel
 
 HIST_MARKET_PATH = "data/hist_price"
 LOG_FILE = "data/hist_price_built.csv"
@@ -53,6 +55,7 @@ def build_price():
 
     success_count = 0
     fail_count = 0
+    touched = []
 
     for filename in todo_files:
         # 文件名就是股票代码，如 600660.csv
@@ -100,6 +103,7 @@ def build_price():
 
             save_built(code, "success")
             success_count += 1
+            touched.append(code)
 
         except Exception as e:
             print(f"{code} 处理失败: {e}")
@@ -108,6 +112,11 @@ def build_price():
 
     print(f"\n完成! 成功: {success_count}, 失败: {fail_count}")
 
+    # 增量同步列式价格存储
+    if touched:
+        sync_price_store(codes=touched)
+        build_panel(sync_store=False)
+
 
 if __name__ == "__main__":
     build_price()
\ No newline at end of file
@@ -6,6 +6,8 @@ import pandas as pd
 logger = logging.getLogger()
 
 from src.datafactory.data_manager import PRICE_PATH, normalize_code
+from src.datafactory.price_store import sync_price_store
+from src.datafactory.price_panel import build_panel
 
 MARKET_PATHS = ("data/daily_market", "data/market_daily")
 
@@ -24,6 +26,7 @@ def build_price():
         )
 
     files = sorted(file for file in os.listdir(market_path) if file.endswith(".csv"))
+    touched = set()
 
     for filename in files:
         path = os.path.join(market_path, filename)
@@ -33,6 +36,7 @@ def build_price():
         for _, row in df.iterrows():
             code = normalize_code(row["代码"])
             stock_path = os.path.join(PRICE_PATH, f"{code}.csv")
+            touched.add(code)
 
             new_row = pd.DataFrame(
                 [{
@@ -60,5 +64,12 @@ def build_price():
         os.rename(path, os.path.join(bak_path, filename))
         logger.info(f"移动 {filename} 到 bak 目录")
 
+    # 增量同步列式价格存储（只转换本次更新过的代码）
+    if touched:
+        sync_price_store(codes=sorted(touched), verbose=False)
+        logger.info(f"列式价格存储已同步 {len(touched)} 只")
+        build_panel(sync_store=False, verbose=False)
+        logger.info("行情面板已重建")
+
 if __name__ == "__main__":
     build_price()
\ No newline at end of file
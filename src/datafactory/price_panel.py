@@ -0,0 +1,370 @@
+"""
+共享行情面板 — 交易日 × 股票代码 的稠密 OHLCV 矩阵
+
+每个字段（收盘/开盘/最高/最低/成交额）一个 .npy 文件，行对齐
+data/calendar/trade_days.csv 中的交易日，列为股票代码，停牌日为 NaN。
+另有 present 矩阵标记源 CSV 中是否存在该行（区分"无记录"与"有记录但价格为空"）。
+
+读取方通过 numpy 内存映射打开，多个进程共享同一份页缓存，
+PricePanel 返回的代码/日期切片均为视图，不复制数据。
+
+用法：
+  python -m src.datafactory.price_panel            # 先同步列式存储，再重建面板
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.datafactory.price_store import (
+    BASE_DIR, PRICE_DIR, list_csv_codes, load_price_frame, read_price_csv,
+    sync_price_store,
+)
+from src.datafactory.trade_calendar import get_calendar
+
+PANEL_DIR = BASE_DIR / "data" / "panel"
+
+# 面板字段 -> 价格 CSV 列名
+FIELDS = {
+    'close': '收盘',
+    'open': '开盘',
+    'high': '最高',
+    'low': '最低',
+    'amount': '成交额',
+}
+
+
+def _load_code_frame(code: str) -> Optional[pd.DataFrame]:
+    df = load_price_frame(code)
+    if df is not None:
+        return df
+    path = PRICE_DIR / f"{code}.csv"
+    if not path.exists():
+        return None
+    return read_price_csv(path)
+
+
+def _csv_signature(code: str) -> tuple:
+    try:
+        st = os.stat(PRICE_DIR / f"{code}.csv")
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _frame_date_ints(df: pd.DataFrame) -> np.ndarray:
+    return df['日期'].dt.strftime('%Y%m%d').astype(np.int64).to_numpy()
+
+
+# ============================================================
+# 构建
+# ============================================================
+
+def build_panel(codes: List[str] = None, sync_store: bool = True,
+                verbose: bool = True) -> bool:
+    """重建行情面板
+
+    Args:
+        codes: 股票代码列表，None 表示 data/price 下全部
+        sync_store: 构建前先增量同步列式价格存储
+
+    Returns:
+        是否构建成功
+    """
+    t0 = time.time()
+    codes = list_csv_codes() if codes is None else [str(c).zfill(6) for c in codes]
+    if not codes:
+        print("❌ 没有价格数据，跳过面板构建")
+        return False
+
+    if sync_store:
+        sync_price_store(codes=codes, verbose=verbose)
+
+    calendar = get_calendar().days
+
+    # 第一遍：确定日期范围
+    first, last = None, None
+    for code in codes:
+        df = _load_code_frame(code)
+        if df is None or df.empty:
+            continue
+        d = _frame_date_ints(df)
+        first = d[0] if first is None else min(first, d[0])
+        last = d[-1] if last is None else max(last, d[-1])
+    if first is None:
+        print("❌ 没有可用的价格数据")
+        return False
+
+    lo = int(np.searchsorted(calendar, first, side='left'))
+    hi = int(np.searchsorted(calendar, last, side='right'))
+    dates = calendar[lo:hi]
+    n_dates, n_codes = len(dates), len(codes)
+
+    if verbose:
+        print(f"🧱 构建行情面板: {n_dates} 个交易日 × {n_codes} 只股票 "
+              f"({dates[0]} ~ {dates[-1]})")
+
+    PANEL_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = {}
+    for field in FIELDS:
+        path = PANEL_DIR / f"{field}.npy.tmp"
+        tmp[field] = (path, np.lib.format.open_memmap(
+            path, mode='w+', dtype=np.float64, shape=(n_dates, n_codes)))
+        tmp[field][1][:] = np.nan
+    present_path = PANEL_DIR / "present.npy.tmp"
+    present = np.lib.format.open_memmap(
+        present_path, mode='w+', dtype=np.bool_, shape=(n_dates, n_codes))
+    present[:] = False
+
+    # 第二遍：逐只写入（同时记录源 CSV 签名，供读取方判断是否过期）
+    sigs = np.zeros((n_codes, 2), dtype=np.int64)
+    for j, code in enumerate(codes):
+        sigs[j] = _csv_signature(code)
+        df = _load_code_frame(code)
+        if df is None or df.empty:
+            continue
+        d = _frame_date_ints(df)
+        pos = np.searchsorted(dates, d)
+        ok = (pos < n_dates) & (dates[np.minimum(pos, n_dates - 1)] == d)
+        rows = pos[ok]
+        present[rows, j] = True
+        for field, col in FIELDS.items():
+            if col in df.columns:
+                tmp[field][1][rows, j] = pd.to_numeric(df[col], errors='coerce').to_numpy(
+                    dtype=np.float64)[ok]
+
+        if verbose and (j + 1) % 1000 == 0:
+            print(f"  进度: {j + 1}/{n_codes}")
+
+    for field, (path, arr) in tmp.items():
+        arr.flush()
+        os.replace(path, PANEL_DIR / f"{field}.npy")
+    tmp.clear()
+    present.flush()
+    del present
+    os.replace(present_path, PANEL_DIR / "present.npy")
+
+    np.save(PANEL_DIR / "dates.npy", dates)
+    np.save(PANEL_DIR / "codes.npy", np.array(codes))
+    np.save(PANEL_DIR / "src_sig.npy", sigs)
+    meta = {
+        'n_dates': n_dates,
+        'n_codes': n_codes,
+        'first_date': int(dates[0]),
+        'last_date': int(dates[-1]),
+        'fields': list(FIELDS),
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(PANEL_DIR / "meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    _PANEL_CACHE.clear()
+    if verbose:
+        print(f"✅ 面板构建完成 ({time.time() - t0:.1f}s) → {PANEL_DIR}")
+    return True
+
+
+# ============================================================
+# 读取
+# ============================================================
+
+class PricePanel:
+    """内存映射行情面板访问器
+
+    矩阵为 (交易日, 股票) 的 C 顺序布局：
+      - 某日全市场截面 row(date) 是连续视图
+      - 某只股票的时间序列 series(code) 是跨步视图
+    两者都不复制数据。
+    """
+
+    def __init__(self, panel_dir: Path = PANEL_DIR):
+        self.panel_dir = Path(panel_dir)
+        with open(self.panel_dir / "meta.json", encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.dates = np.load(self.panel_dir / "dates.npy")
+        self.codes = [str(c) for c in np.load(self.panel_dir / "codes.npy")]
+        self._code_idx = {c: i for i, c in enumerate(self.codes)}
+        self._fields: Dict[str, np.ndarray] = {}
+        self._sigs = None
+        self._dt = None
+        self._date_strs = None
+
+    @classmethod
+    def open(cls, panel_dir: Path = PANEL_DIR) -> Optional["PricePanel"]:
+        """打开面板（进程内缓存），面板不存在返回 None"""
+        key = str(panel_dir)
+        if key in _PANEL_CACHE:
+            return _PANEL_CACHE[key]
+        if not (Path(panel_dir) / "meta.json").exists():
+            return None
+        try:
+            panel = cls(panel_dir)
+        except Exception:
+            return None
+        _PANEL_CACHE[key] = panel
+        return panel
+
+    # --- 索引 ---
+
+    def field(self, name: str) -> np.ndarray:
+        """字段矩阵（只读内存映射），name 为 close/open/high/low/amount/present"""
+        arr = self._fields.get(name)
+        if arr is None:
+            arr = np.load(self.panel_dir / f"{name}.npy", mmap_mode='r')
+            self._fields[name] = arr
+        return arr
+
+    def code_index(self, code: str) -> Optional[int]:
+        return self._code_idx.get(str(code).zfill(6))
+
+    def has_code(self, code: str) -> bool:
+        return self.code_index(code) is not None
+
+    def fresh_codes(self, codes: List[str]) -> set:
+        """面板中存在且源 CSV 自构建后未变化的代码集合"""
+        if self._sigs is None:
+            self._sigs = np.load(self.panel_dir / "src_sig.npy")
+        sigs = self._sigs
+        fresh = set()
+        for code in codes:
+            code = str(code).zfill(6)
+            j = self._code_idx.get(code)
+            if j is not None and tuple(sigs[j]) == _csv_signature(code):
+                fresh.add(code)
+        return fresh
+
+    def date_slice(self, start: str = None, end: str = None) -> slice:
+        """YYYYMMDD 闭区间对应的行切片"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, int(start), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, int(end), side='right'))
+        return slice(lo, hi)
+
+    def date_index(self, date: str) -> Optional[int]:
+        """交易日对应的行号，非面板内交易日返回 None"""
+        d = int(date)
+        i = int(np.searchsorted(self.dates, d))
+        if i < len(self.dates) and self.dates[i] == d:
+            return i
+        return None
+
+    @property
+    def datetimes(self) -> np.ndarray:
+        """日期轴（datetime64）"""
+        if self._dt is None:
+            self._dt = pd.to_datetime(self.dates.astype(str), format='%Y%m%d').values
+        return self._dt
+
+    @property
+    def date_strs(self) -> np.ndarray:
+        """日期轴（YYYYMMDD 字符串）"""
+        if self._date_strs is None:
+            self._date_strs = self.dates.astype(str)
+        return self._date_strs
+
+    # --- 切片（视图）---
+
+    def series(self, code: str, field: str = 'close',
+               start: str = None, end: str = None) -> Optional[np.ndarray]:
+        """单只股票的时间序列视图"""
+        j = self.code_index(code)
+        if j is None:
+            return None
+        return self.field(field)[self.date_slice(start, end), j]
+
+    def row(self, date: str, field: str = 'close') -> Optional[np.ndarray]:
+        """某交易日全市场截面视图（列顺序同 self.codes）"""
+        i = self.date_index(date)
+        if i is None:
+            return None
+        return self.field(field)[i]
+
+    def block(self, field: str = 'close', start: str = None, end: str = None) -> np.ndarray:
+        """日期区间内全部股票的矩阵视图"""
+        return self.field(field)[self.date_slice(start, end)]
+
+    def frame(self, code: str, start: str = None, end: str = None) -> Optional[pd.DataFrame]:
+        """还原为 load_price_df 格式的 DataFrame（仅保留源数据中存在的行）"""
+        j = self.code_index(code)
+        if j is None:
+            return None
+        sl = self.date_slice(start, end)
+        mask = np.asarray(self.field('present')[sl, j])
+        if not mask.any():
+            return None
+        data = {'日期': self.datetimes[sl][mask]}
+        for field, col in FIELDS.items():
+            data[col] = np.asarray(self.field(field)[sl, j])[mask]
+        return pd.DataFrame(data)
+
+
+_PANEL_CACHE: Dict[str, PricePanel] = {}
+
+
+def load_tails(codes: List[str], k: int, field: str = 'close',
+               end: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """批量取每只股票截至 end（含）最后 k 条源数据行的字段值
+
+    面板中未过期的代码一次性从矩阵中取出，其余逐只读列式存储 / CSV。
+
+    Returns:
+        (values, counts)
+        values: (k, len(codes))，按行尾对齐，不足 k 条时前部为 NaN
+        counts: 每只股票截至 end 的源数据总行数
+    """
+    codes = [str(c).zfill(6) for c in codes]
+    n = len(codes)
+    values = np.full((k, n), np.nan)
+    counts = np.zeros(n, dtype=np.int64)
+
+    rest = list(range(n))
+    panel = PricePanel.open()
+    if panel is not None and n:
+        fresh = panel.fresh_codes(codes)
+        idx = np.array([j for j, c in enumerate(codes) if c in fresh], dtype=np.int64)
+        sl = panel.date_slice(None, end)
+        if len(idx) and sl.stop > sl.start:
+            cols = np.array([panel.code_index(codes[j]) for j in idx])
+            present = np.asarray(panel.field('present')[sl])[:, cols]
+            data = np.asarray(panel.field(field)[sl])[:, cols]
+            cum = np.cumsum(present, axis=0)
+            total = cum[-1]
+            arange = np.arange(len(idx))
+            for m in range(k):
+                # 倒数第 m+1 条源数据行：累计计数首次达到 total-m 的行
+                rank = total - m
+                row = np.argmax(cum >= rank, axis=0)
+                values[k - 1 - m, idx] = np.where(rank >= 1, data[row, arange], np.nan)
+            counts[idx] = total
+        if len(idx):
+            done = set(idx.tolist())
+            rest = [j for j in range(n) if j not in done]
+
+    col = FIELDS[field]
+    for j in rest:
+        df = _load_code_frame(codes[j])
+        if df is None or df.empty or col not in df.columns:
+            continue
+        if end is not None:
+            df = df[df['日期'] <= pd.Timestamp(str(end))]
+        arr = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        counts[j] = len(arr)
+        tail = arr[-k:]
+        if len(tail):
+            values[k - len(tail):, j] = tail
+
+    return values, counts
+
+
+def main():
+    ok = build_panel()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+列式价格存储 — data/price/{code}.csv 的二进制镜像
+
+每只股票一个 .npz 文件，按列保存已排序、已解析日期的价格数组，
+读取时无需再做 CSV 解析和 pd.to_datetime，直接还原成 DataFrame。
+
+存储文件同时记录源 CSV 的 mtime/size，CSV 被价格清洗更新后自动视为过期，
+读取方回退到 CSV，直到下一次 sync。
+
+用法：
+  python -m src.datafactory.price_store              # 增量同步（仅转换有变化的代码）
+  python -m src.datafactory.price_store --force      # 全量重建
+  python -m src.datafactory.price_store --code 600519
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 路径配置（与 src/backtest/data.py 一致，使用绝对路径，不依赖 cwd）
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+PRICE_DIR = BASE_DIR / "data" / "price"
+STORE_DIR = BASE_DIR / "data" / "price_store"
+
+DATE_COL = "日期"
+
+
+# ============================================================
+# CSV 解析（唯一的解析口径，CSV 回退与转换共用）
+# ============================================================
+
+def read_price_csv(path) -> Optional[pd.DataFrame]:
+    """读取价格 CSV：解析日期并按日期排序
+
+    Returns:
+        DataFrame: 日期(datetime) + CSV 中的其余列；空文件返回 None
+    """
+    df = pd.read_csv(path)
+    if df.empty:
+        return None
+
+    df[DATE_COL] = pd.to_datetime(df[DATE_COL].astype(str), format='%Y%m%d')
+    df = df.sort_values(DATE_COL).reset_index(drop=True)
+    return df
+
+
+def _csv_path(code: str) -> Path:
+    return PRICE_DIR / f"{code}.csv"
+
+
+def _store_path(code: str) -> Path:
+    return STORE_DIR / f"{code}.npz"
+
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    """文件签名 (mtime_ns, size)，文件不存在返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# ============================================================
+# 读取
+# ============================================================
+
+def load_price_arrays(code: str) -> Optional[Dict[str, np.ndarray]]:
+    """从列式存储读取个股价格数组
+
+    Returns:
+        {列名: ndarray}，列顺序与源 CSV 一致；
+        未转换或已过期（源 CSV 有更新）返回 None
+    """
+    code = str(code).zfill(6)
+    path = _store_path(code)
+    if not path.exists():
+        return None
+
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            src_sig = (int(z['src_mtime_ns']), int(z['src_size']))
+            columns = [str(c) for c in z['columns']]
+            arrays = {c: z[f'col_{i}'] for i, c in enumerate(columns)}
+    except Exception:
+        return None
+
+    csv_sig = _file_signature(_csv_path(code))
+    if csv_sig is not None and csv_sig != src_sig:
+        return None
+    return arrays
+
+
+def load_price_frame(code: str) -> Optional[pd.DataFrame]:
+    """从列式存储读取个股价格 DataFrame（与 read_price_csv 的结果一致）
+
+    Returns:
+        DataFrame 或 None（未转换 / 已过期）
+    """
+    arrays = load_price_arrays(code)
+    if arrays is None:
+        return None
+    return pd.DataFrame(arrays)
+
+
+# ============================================================
+# 转换 / 增量同步
+# ============================================================
+
+def convert_code(code: str) -> bool:
+    """把单只股票的 CSV 转换为列式存储文件
+
+    Returns:
+        是否写入成功（CSV 不存在、为空或含非数值列时返回 False）
+    """
+    code = str(code).zfill(6)
+    csv_path = _csv_path(code)
+    sig = _file_signature(csv_path)
+    if sig is None:
+        return False
+
+    df = read_price_csv(csv_path)
+    if df is None:
+        return False
+
+    arrays = {}
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        if values.dtype == object:
+            # 非数值列无法无 pickle 保存，留给 CSV 回退
+            return False
+        arrays[f'col_{i}'] = values
+
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _store_path(code)
+    tmp_path = path.with_suffix('.npz.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            columns=np.array([str(c) for c in df.columns]),
+            src_mtime_ns=np.int64(sig[0]),
+            src_size=np.int64(sig[1]),
+            **arrays,
+        )
+    os.replace(tmp_path, path)
+    return True
+
+
+def _is_fresh(code: str) -> bool:
+    """存储文件是否与源 CSV 同步"""
+    path = _store_path(code)
+    if not path.exists():
+        return False
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            src_sig = (int(z['src_mtime_ns']), int(z['src_size']))
+    except Exception:
+        return False
+    return src_sig == _file_signature(_csv_path(code))
+
+
+def list_csv_codes() -> List[str]:
+    """列出 data/price 下所有股票代码"""
+    if not PRICE_DIR.exists():
+        return []
+    return sorted(f[:-4] for f in os.listdir(PRICE_DIR) if f.endswith('.csv'))
+
+
+def sync_price_store(codes: Iterable[str] = None, force: bool = False,
+                     verbose: bool = True) -> Dict[str, int]:
+    """增量同步：只转换新增或 CSV 有变化的代码
+
+    Args:
+        codes: 指定代码列表，None 表示 data/price 下全部
+        force: 忽略签名，全部重新转换
+
+    Returns:
+        {'converted': n, 'skipped': n, 'failed': n}
+    """
+    codes = list_csv_codes() if codes is None else [str(c).zfill(6) for c in codes]
+    stats = {'converted': 0, 'skipped': 0, 'failed': 0}
+
+    if verbose:
+        print(f"📦 同步列式价格存储: {len(codes)} 只股票 → {STORE_DIR}")
+
+    for i, code in enumerate(codes):
+        if not force and _is_fresh(code):
+            stats['skipped'] += 1
+            continue
+        try:
+            ok = convert_code(code)
+        except Exception as e:
+            ok = False
+            if verbose:
+                print(f"  ⚠️ {code} 转换失败: {e}")
+        stats['converted' if ok else 'failed'] += 1
+
+        if verbose and (i + 1) % 500 == 0:
+            print(f"  进度: {i + 1}/{len(codes)}")
+
+    if verbose:
+        print(f"✅ 完成: 转换 {stats['converted']}, 未变化 {stats['skipped']}, "
+              f"失败 {stats['failed']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列式价格存储同步')
+    parser.add_argument('--force', action='store_true', help='全量重建')
+    parser.add_argument('--code', nargs='*', help='只同步指定代码')
+    args = parser.parse_args()
+
+    sync_price_store(codes=args.code, force=args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
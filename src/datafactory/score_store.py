@@ -0,0 +1,511 @@
+"""
+评分分区存储 — result/daily_score/batch_result_*.csv 的列式镜像
+
+按日期分区（每个评分日一个 .npz），保存 code、name、total_score 及全部因子列，
+只追加新日期，不重写历史分区。分区记录源 CSV 的 mtime/size，
+CSV 被重新生成后自动视为过期，读取方回退到 CSV。
+
+另有按代码排列的索引（score_store/by_code/，行按 (code, date) 排序的 .npy，内存映射读取），
+写入分区时同步并入；单只股票的全部日期只读其连续的几行，不必逐日解开分区。
+
+读取接口：
+  read_date(date)            单日全市场评分（等同 load_batch_scores）
+  read_code(code)            单只股票全部日期的评分走势
+  read_range(start, end)     日期区间长表（等同 load_all_scores）
+
+用法：
+  python -m src.datafactory.score_store             # 增量同步已有 CSV
+  python -m src.datafactory.score_store --force     # 全量重建
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SCORE_DIR = BASE_DIR / "result" / "daily_score"
+STORE_DIR = BASE_DIR / "result" / "score_store"
+INDEX_DIR = STORE_DIR / "by_code"
+
+_CSV_RE = re.compile(r'^batch_result_(\d{8})\.csv$')
+_PART_RE = re.compile(r'^scores_(\d{8})\.npz$')
+
+
+def _csv_path(date: str) -> Path:
+    return SCORE_DIR / f"batch_result_{date}.csv"
+
+
+def _part_path(date: str) -> Path:
+    return STORE_DIR / f"scores_{date}.npz"
+
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_score_csv(path) -> pd.DataFrame:
+    """读取 batch_result CSV（code 补齐 6 位字符串）"""
+    df = pd.read_csv(path, dtype={'code': str})
+    df['code'] = df['code'].astype(str).str.zfill(6)
+    return df
+
+
+# ============================================================
+# 写入
+# ============================================================
+
+def store_batch_result(date: str) -> bool:
+    """把某日的 batch_result CSV 写成分区（main.run_batch 写完 CSV 后调用）
+
+    Returns:
+        是否写入成功（CSV 不存在或含无法列式保存的列时返回 False）
+    """
+    csv_path = _csv_path(date)
+    sig = _file_signature(csv_path)
+    if sig is None:
+        return False
+
+    df = read_score_csv(csv_path)
+
+    arrays = {}
+    numeric, is_int = [], []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        if values.dtype.kind in 'iufb':
+            numeric.append(col)
+            is_int.append(values.dtype.kind in 'iub')
+        elif values.dtype == object or values.dtype.kind in 'UT' or str(values.dtype) == 'str':
+            if not all(isinstance(v, str) for v in values):
+                return False
+            arrays[f's_{i}'] = np.array(values.tolist(), dtype=str)
+        else:
+            return False
+
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _part_path(date)
+    tmp_path = path.with_suffix('.npz.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            columns=np.array([str(c) for c in df.columns]),
+            numeric=np.array(numeric, dtype=str),
+            is_int=np.array(is_int, dtype=bool),
+            values=df[numeric].to_numpy(dtype=np.float64) if numeric
+            else np.zeros((len(df), 0)),
+            src_mtime_ns=np.int64(sig[0]),
+            src_size=np.int64(sig[1]),
+            **arrays,
+        )
+    os.replace(tmp_path, path)
+    try:
+        update_code_index([date])
+    except Exception as e:
+        # 索引中该日期仍是旧签名或缺失，读取时逐日回退，不影响分区本身
+        print(f"⚠️ 评分按代码索引更新失败 {date}: {e}")
+    return True
+
+
+def sync_score_store(force: bool = False, verbose: bool = True) -> Dict[str, int]:
+    """增量同步：只转换新增或重新生成过的 batch_result CSV"""
+    stats = {'converted': 0, 'skipped': 0, 'failed': 0}
+    dates = _csv_dates()
+    if verbose:
+        print(f"📦 同步评分存储: {len(dates)} 个评分日 → {STORE_DIR}")
+
+    for date in dates:
+        if not force and _is_fresh(date):
+            stats['skipped'] += 1
+            continue
+        try:
+            ok = store_batch_result(date)
+        except Exception as e:
+            ok = False
+            if verbose:
+                print(f"  ⚠️ {date} 转换失败: {e}")
+        stats['converted' if ok else 'failed'] += 1
+
+    # 按代码索引不存在（或全量重建）时由全部分区重建；增量转换的日期已在写入分区时并入
+    if force or not (INDEX_DIR / "meta.json").exists():
+        update_code_index(_part_dates(), rebuild=True)
+
+    if verbose:
+        print(f"✅ 完成: 转换 {stats['converted']}, 未变化 {stats['skipped']}, "
+              f"失败 {stats['failed']}")
+    return stats
+
+
+# ============================================================
+# 读取
+# ============================================================
+
+def _csv_dates() -> List[str]:
+    if not SCORE_DIR.exists():
+        return []
+    return sorted(m.group(1) for m in map(_CSV_RE.match, os.listdir(SCORE_DIR)) if m)
+
+
+def _part_dates() -> List[str]:
+    if not STORE_DIR.exists():
+        return []
+    return sorted(m.group(1) for m in map(_PART_RE.match, os.listdir(STORE_DIR)) if m)
+
+
+def _is_fresh(date: str) -> bool:
+    path = _part_path(date)
+    if not path.exists():
+        return False
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            src_sig = (int(z['src_mtime_ns']), int(z['src_size']))
+    except Exception:
+        return False
+    return src_sig == _file_signature(_csv_path(date))
+
+
+def list_score_dates() -> List[str]:
+    """所有已有评分的日期（分区 ∪ 尚未同步的 CSV），升序"""
+    return sorted(set(_part_dates()) | set(_csv_dates()))
+
+
+def _read_partition(date: str) -> Optional[dict]:
+    """读取分区原始数组；不存在或已过期返回 None"""
+    path = _part_path(date)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            src_sig = (int(z['src_mtime_ns']), int(z['src_size']))
+            csv_sig = _file_signature(_csv_path(date))
+            if csv_sig is not None and csv_sig != src_sig:
+                return None
+
+            columns = [str(c) for c in z['columns']]
+            return {
+                'src_sig': src_sig,
+                'columns': columns,
+                'numeric': [str(c) for c in z['numeric']],
+                'is_int': z['is_int'],
+                'values': z['values'],
+                'strings': {columns[int(k[2:])]: z[k] for k in z.files if k.startswith('s_')},
+            }
+    except Exception:
+        return None
+
+
+def _partition_columns(part: dict) -> Dict[str, np.ndarray]:
+    """分区各列数组（整数列还原为 int64），按列顺序"""
+    data = {}
+    for col in part['columns']:
+        if col in part['strings']:
+            data[col] = part['strings'][col]
+        else:
+            k = part['numeric'].index(col)
+            arr = part['values'][:, k]
+            data[col] = arr.astype(np.int64) if part['is_int'][k] else arr
+    return data
+
+
+def _partition_frame(part: dict) -> pd.DataFrame:
+    return pd.DataFrame(_partition_columns(part), columns=part['columns'])
+
+
+def _partition_row(part: dict, i: int) -> dict:
+    """分区第 i 行转为 {列名: 标量}"""
+    row = {}
+    for col in part['columns']:
+        if col in part['strings']:
+            row[col] = str(part['strings'][col][i])
+        else:
+            k = part['numeric'].index(col)
+            v = part['values'][i, k]
+            row[col] = int(v) if part['is_int'][k] else float(v)
+    return row
+
+
+def read_date(date: str) -> Optional[pd.DataFrame]:
+    """单日评分（列顺序、行顺序与 batch_result CSV 一致）
+
+    Returns:
+        DataFrame: code, name, 各因子分, total_score；无数据返回 None
+    """
+    part = _read_partition(date)
+    if part is not None:
+        return _partition_frame(part)
+    path = _csv_path(date)
+    if not path.exists():
+        return None
+    return read_score_csv(path)
+
+
+def _date_columns(date: str) -> Optional[Dict[str, np.ndarray]]:
+    """单日评分的列数组（分区优先，过期或缺失时读 CSV），无数据返回 None"""
+    part = _read_partition(date)
+    if part is not None:
+        return _partition_columns(part)
+    path = _csv_path(date)
+    if not path.exists():
+        return None
+    df = read_score_csv(path)
+    return {col: df[col].to_numpy() for col in df.columns}
+
+
+def read_range(start: str = None, end: str = None) -> pd.DataFrame:
+    """日期区间内全部评分的长表（末尾追加 date 列）
+
+    逐日取列数组，按列拼接后一次构建 DataFrame；各日列不同时缺失处为 NaN（同 pd.concat）
+    """
+    blocks = []
+    for d in list_score_dates():
+        if (start and d < start) or (end and d > end):
+            continue
+        cols = _date_columns(d)
+        if cols is None:
+            continue
+        n = len(next(iter(cols.values()))) if cols else 0
+        cols['date'] = np.full(n, d)
+        blocks.append((cols, n))
+    if not blocks:
+        return pd.DataFrame()
+
+    columns = list(dict.fromkeys(col for cols, _ in blocks for col in cols))
+    data = {}
+    for col in columns:
+        arrays = [cols.get(col) for cols, _ in blocks]
+        if any(a is None for a in arrays):
+            text = any(a is not None and a.dtype.kind not in 'iufb' for a in arrays)
+            arrays = [np.full(n, np.nan, dtype=object if text else np.float64) if a is None
+                      else (a.astype(object) if text else a)
+                      for a, (_, n) in zip(arrays, blocks)]
+        data[col] = np.concatenate(arrays)
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_code(code: str, start: str = None, end: str = None) -> pd.DataFrame:
+    """单只股票在全部日期的评分（date 列在最前，按日期升序）
+
+    已并入按代码索引且源 CSV 未变化的日期直接取索引中该代码的行，其余日期逐日读取
+    """
+    code = str(code).zfill(6)
+    index = _load_code_index()
+    parts = index['meta']['parts'] if index is not None else {}
+    rows = {}       # 日期 -> 索引中该代码的行号
+    if index is not None:
+        codes, offsets = index['codes'], index['offsets']
+        j = int(np.searchsorted(codes, code))
+        if j < len(codes) and codes[j] == code:
+            lo, hi = int(offsets[j]), int(offsets[j + 1])
+            for i, d in zip(range(lo, hi), index['dates'][lo:hi].tolist()):
+                rows.setdefault(str(d), i)
+
+    records = []
+    for d in list_score_dates():
+        if (start and d < start) or (end and d > end):
+            continue
+        info = parts.get(d)
+        if info is not None and _index_fresh(d, info):
+            if d in rows:
+                records.append({'date': d, **_index_row(index, info, rows[d], code)})
+            continue
+        part = _read_partition(d)
+        if part is not None and 'code' in part['strings']:
+            hit = np.flatnonzero(part['strings']['code'] == code)
+            if len(hit):
+                records.append({'date': d, **_partition_row(part, hit[0])})
+            continue
+        df = read_date(d)
+        if df is None:
+            continue
+        for row in df[df['code'] == code].to_dict('records'):
+            records.append({'date': d, **row})
+    return pd.DataFrame(records)
+
+
+# ============================================================
+# 按代码索引
+# ============================================================
+#
+# by_code/ 下各文件行对齐，按 (code, date) 排序：
+#   codes.npy / offsets.npy   代码及其行区间 [offsets[j], offsets[j+1])
+#   dates.npy                 每行日期（YYYYMMDD 整数）
+#   values.npy                数值列（meta 中 numeric 的并集，当日没有的列为 NaN）
+#   s_<k>.npy                 code 以外的字符串列（meta 中 strings）
+#   meta.json                 各日期的源 CSV 签名、列顺序与整数列
+
+def _load_code_index(mmap: bool = True) -> Optional[dict]:
+    """读取按代码索引（行数据内存映射）；不存在或损坏返回 None"""
+    meta_path = INDEX_DIR / "meta.json"
+    if not meta_path.exists():
+        return None
+    mode = 'r' if mmap else None
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        return {
+            'meta': meta,
+            'codes': np.load(INDEX_DIR / "codes.npy"),
+            'offsets': np.load(INDEX_DIR / "offsets.npy"),
+            'dates': np.load(INDEX_DIR / "dates.npy", mmap_mode=mode),
+            'values': np.load(INDEX_DIR / "values.npy", mmap_mode=mode),
+            'strings': {col: np.load(INDEX_DIR / f"s_{k}.npy", mmap_mode=mode)
+                        for k, col in enumerate(meta['strings'])},
+        }
+    except Exception:
+        return None
+
+
+def _index_fresh(date: str, info: dict) -> bool:
+    """索引中该日期的行是否仍对应当前的源 CSV（CSV 已删除时与分区一样照常使用）"""
+    csv_sig = _file_signature(_csv_path(date))
+    return csv_sig is None or csv_sig == tuple(info['sig'])
+
+
+def _index_row(index: dict, info: dict, i: int, code: str) -> dict:
+    """索引第 i 行转为 {列名: 标量}（列顺序、类型与该日分区一致）"""
+    numeric = index['meta']['numeric']
+    row = {}
+    for col in info['columns']:
+        if col == 'code':
+            row[col] = code
+        elif col in index['strings']:
+            row[col] = str(index['strings'][col][i])
+        else:
+            v = index['values'][i, numeric.index(col)]
+            row[col] = int(v) if col in info['int'] else float(v)
+    return row
+
+
+def update_code_index(dates: List[str], rebuild: bool = False):
+    """把这些日期的分区并入按代码索引（索引中同日期的旧行先删除）
+
+    rebuild=True 时丢弃已有索引，只由给出的日期重建。分区缺失、过期或没有 code 列的日期
+    不进索引，读取时逐日回退。
+    """
+    index = None if rebuild else _load_code_index(mmap=False)
+    if index is not None:
+        meta = index['meta']
+        numeric, strings = list(meta['numeric']), list(meta['strings'])
+        row_codes = np.repeat(index['codes'], np.diff(index['offsets']))
+        row_dates = np.asarray(index['dates'])
+        values = np.asarray(index['values'])
+        string_cols = {col: np.asarray(a) for col, a in index['strings'].items()}
+        parts = dict(meta['parts'])
+        keep = ~np.isin(row_dates, [int(d) for d in dates])
+        row_codes, row_dates, values = row_codes[keep], row_dates[keep], values[keep]
+        string_cols = {col: a[keep] for col, a in string_cols.items()}
+    else:
+        numeric, strings, parts = [], [], {}
+        row_codes = np.array([], dtype=str)
+        row_dates = np.array([], dtype=np.int64)
+        values = np.zeros((0, 0))
+        string_cols = {}
+
+    new_codes, new_dates, new_values, new_strings = [], [], [], []
+    for d in dates:
+        parts.pop(d, None)
+        part = _read_partition(d)
+        if part is None or 'code' not in part['strings']:
+            continue
+        n = len(part['strings']['code'])
+        for col in part['numeric']:
+            if col not in numeric:
+                numeric.append(col)
+        for col in part['strings']:
+            if col != 'code' and col not in strings:
+                strings.append(col)
+        block = np.full((n, len(numeric)), np.nan)
+        for k, col in enumerate(part['numeric']):
+            block[:, numeric.index(col)] = part['values'][:, k]
+        new_codes.append(part['strings']['code'])
+        new_dates.append(np.full(n, int(d), dtype=np.int64))
+        new_values.append(block)
+        new_strings.append(part['strings'])
+        parts[d] = {
+            'sig': list(part['src_sig']),
+            'columns': part['columns'],
+            'int': [col for col, is_int in zip(part['numeric'], part['is_int']) if is_int],
+        }
+
+    # 列并集扩大后，已有行和先读入的日期补 NaN / 空串
+    n_keep = len(row_codes)
+    width = len(numeric)
+    blocks = [np.hstack([b, np.full((len(b), width - b.shape[1]), np.nan)]) for b in [values] + new_values]
+    values = np.vstack(blocks) if blocks else np.zeros((0, width))
+    row_codes = np.concatenate([row_codes] + new_codes).astype(str)
+    row_dates = np.concatenate([row_dates] + new_dates)
+    string_cols = {
+        col: np.concatenate(
+            [string_cols.get(col, np.full(n_keep, '', dtype=str))]
+            + [s.get(col, np.full(len(c), '', dtype=str)) for s, c in zip(new_strings, new_codes)]
+        ).astype(str)
+        for col in strings
+    }
+
+    # 按 (code, date) 排序；同一天重复的代码保持分区内顺序
+    order = np.lexsort((row_dates, row_codes))
+    row_codes, row_dates, values = row_codes[order], row_dates[order], values[order]
+    string_cols = {col: a[order] for col, a in string_cols.items()}
+    codes, starts = np.unique(row_codes, return_index=True)
+    offsets = np.append(starts, len(row_codes)).astype(np.int64)
+
+    tmp_dir = INDEX_DIR.with_name(INDEX_DIR.name + ".tmp")
+    old_dir = INDEX_DIR.with_name(INDEX_DIR.name + ".old")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "codes.npy", codes)
+    np.save(tmp_dir / "offsets.npy", offsets)
+    np.save(tmp_dir / "dates.npy", row_dates)
+    np.save(tmp_dir / "values.npy", values)
+    for k, col in enumerate(strings):
+        np.save(tmp_dir / f"s_{k}.npy", string_cols[col])
+    with open(tmp_dir / "meta.json", 'w', encoding='utf-8') as f:
+        json.dump({'numeric': numeric, 'strings': strings,
+                   'parts': dict(sorted(parts.items()))}, f, ensure_ascii=False)
+
+    # 整目录替换：读取方要么看到旧索引，要么看到新索引（中间短暂缺失时逐日回退）
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if INDEX_DIR.exists():
+        os.replace(INDEX_DIR, old_dir)
+    os.replace(tmp_dir, INDEX_DIR)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _csv_text(v) -> str:
+    """数值转成 CSV 中的文本形式（NaN 为空串）"""
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (float, np.floating)) and np.isnan(v):
+        return ''
+    return str(v.item() if isinstance(v, np.generic) else v)
+
+
+def read_date_records(date: str) -> Optional[List[Dict[str, str]]]:
+    """单日评分的行字典列表，值为字符串（与 csv.DictReader 读取结果一致）"""
+    df = read_date(date)
+    if df is None:
+        return None
+    cols = list(df.columns)
+    return [dict(zip(cols, map(_csv_text, row)))
+            for row in df.itertuples(index=False, name=None)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评分分区存储同步')
+    parser.add_argument('--force', action='store_true', help='全量重建')
+    args = parser.parse_args()
+    sync_score_store(force=args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,25 @@
 import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
 
-import akshare as ak
+import numpy as np
 import pandas as pd
 
 PATH = "data/calendar/trade_days.csv"
 
+# 读取用绝对路径，不依赖 cwd
+CALENDAR_FILE = Path(__file__).resolve().parent.parent.parent / PATH
+
+DateLike = Union[str, int, np.integer]
+
 
 def init_trade_calendar(force=False):
     if os.path.exists(PATH) and not force:
         print("交易日历已存在")
         return True
 
+    import akshare as ak
+
     print("开始下载交易日历")
     df = ak.tool_trade_date_hist_sina()
 
@@ -20,13 +29,124 @@ def init_trade_calendar(force=False):
     return True
 
 
-def is_trade_day():
-    if not os.path.exists(PATH):
+def _to_int(date: DateLike) -> int:
+    """'20260105' / '2026-01-05' / 20260105 → 20260105"""
+    return int(str(date).replace('-', '')[:8])
+
+
+class TradeCalendar:
+    """交易日历（YYYYMMDD int64 升序数组），日期运算均为二分查找 O(log n)"""
+
+    def __init__(self, days: np.ndarray):
+        self.days = np.asarray(days, dtype=np.int64)
+        self._index: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def load(cls, path: Path = CALENDAR_FILE) -> "TradeCalendar":
+        df = pd.read_csv(path)
+        col = df.columns[0]  # 通常是 'trade_date'
+        days = df[col].astype(str).str.replace('-', '', regex=False).str[:8].astype(np.int64)
+        return cls(np.sort(days.to_numpy()))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    # --- 索引映射 ---
+
+    @property
+    def index_map(self) -> Dict[int, int]:
+        """{YYYYMMDD: 交易日序号}"""
+        if self._index is None:
+            self._index = {int(d): i for i, d in enumerate(self.days)}
+        return self._index
+
+    def index_of(self, date: DateLike) -> Optional[int]:
+        """交易日序号，非交易日返回 None"""
+        d = _to_int(date)
+        i = int(np.searchsorted(self.days, d))
+        if i < len(self.days) and self.days[i] == d:
+            return i
+        return None
+
+    def is_trade_day(self, date: DateLike) -> bool:
+        return self.index_of(date) is not None
+
+    def date_at(self, idx: int) -> Optional[str]:
+        if 0 <= idx < len(self.days):
+            return str(self.days[idx])
+        return None
+
+    # --- 单个日期 ---
+
+    def next_trade_day(self, date: DateLike, n: int = 1) -> Optional[str]:
+        """date 之后（不含当天）第 n 个交易日"""
+        i = int(np.searchsorted(self.days, _to_int(date), side='right'))
+        return self.date_at(i + n - 1)
+
+    def prev_trade_day(self, date: DateLike, n: int = 1) -> Optional[str]:
+        """date 之前（不含当天）第 n 个交易日"""
+        i = int(np.searchsorted(self.days, _to_int(date), side='left'))
+        return self.date_at(i - n)
+
+    def nth_trade_day(self, date: DateLike, n: int) -> Optional[str]:
+        """交易日 date 往后（n<0 往前）第 n 个交易日；date 非交易日或越界返回 None"""
+        i = self.index_of(date)
+        if i is None:
+            return None
+        return self.date_at(i + n)
+
+    def shift(self, date: DateLike, offset: int) -> Optional[str]:
+        """以 date 的插入位置为基准偏移 offset（date 为交易日时等同 nth_trade_day）"""
+        i = int(np.searchsorted(self.days, _to_int(date), side='left'))
+        return self.date_at(i + offset)
+
+    def between(self, start: DateLike, end: DateLike) -> List[str]:
+        """[start, end] 内的交易日（YYYYMMDD）"""
+        lo = int(np.searchsorted(self.days, _to_int(start), side='left'))
+        hi = int(np.searchsorted(self.days, _to_int(end), side='right'))
+        return [str(d) for d in self.days[lo:hi]]
+
+    # --- 向量化 ---
+
+    def to_index(self, dates) -> np.ndarray:
+        """批量映射为交易日序号，非交易日为 -1"""
+        arr = np.asarray(dates)
+        if arr.dtype.kind in 'iu':
+            d = arr.astype(np.int64)
+        else:
+            d = np.array([_to_int(x) for x in arr.ravel()], dtype=np.int64).reshape(arr.shape)
+        i = np.searchsorted(self.days, d)
+        ok = (i < len(self.days)) & (self.days[np.minimum(i, len(self.days) - 1)] == d)
+        return np.where(ok, i, -1)
+
+    def offset(self, dates, n: int) -> np.ndarray:
+        """批量求每个交易日往后第 n 个交易日（YYYYMMDD int），非交易日或越界为 0"""
+        i = self.to_index(dates)
+        j = i + n
+        ok = (i >= 0) & (j >= 0) & (j < len(self.days))
+        return np.where(ok, self.days[np.clip(j, 0, len(self.days) - 1)], 0)
+
+
+_CALENDAR: Optional[TradeCalendar] = None
+_CALENDAR_SIG = None
+
+
+def get_calendar() -> TradeCalendar:
+    """进程内共享的交易日历（文件更新后自动重载）"""
+    global _CALENDAR, _CALENDAR_SIG
+    if not CALENDAR_FILE.exists():
         init_trade_calendar()
+    st = os.stat(CALENDAR_FILE)
+    sig = (st.st_mtime_ns, st.st_size)
+    if _CALENDAR is None or sig != _CALENDAR_SIG:
+        _CALENDAR = TradeCalendar.load(CALENDAR_FILE)
+        _CALENDAR_SIG = sig
+    return _CALENDAR
+
 
-    df = pd.read_csv(PATH)
-    today = pd.Timestamp.today().strftime("%Y-%m-%d")
-    return today in df["trade_date"].astype(str).values
+def is_trade_day():
+    today = pd.Timestamp.today().strftime("%Y%m%d")
+    return get_calendar().is_trade_day(today)
 
 
 if __name__ == "__main__":
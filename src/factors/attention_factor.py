@@ -33,6 +33,8 @@ def js_score(code, refresh=False):
 
 
 class attentionFactor(BaseFactor):
+    uses_network = True
+
     def __init__(self, code, name=None):
         super().__init__(code, name)
 
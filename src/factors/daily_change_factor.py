@@ -1,28 +1,35 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from src.core.base_factor import BaseFactor
-from src.datafactory.data_manager import get_price
+from src.datafactory.data_manager import get_price, normalize_code
+from src.datafactory.price_panel import load_tails
 
 
-def get_trend_status(close_prices):
-    """趋势判断：基于5日/20日均线"""
-    ma_short = close_prices.rolling(5).mean()
-    ma_long = close_prices.rolling(20).mean()
-    trend_strength = (ma_short - ma_long) / ma_long
-
-    if pd.isna(trend_strength.iloc[-1]):
+def classify_trend(trend_strength):
+    """(MA5 - MA20) / MA20 → 趋势状态"""
+    if pd.isna(trend_strength):
         return "weak_up"  # 默认
 
-    if trend_strength.iloc[-1] > 0.05:
+    if trend_strength > 0.05:
         return "strong_up"
-    elif trend_strength.iloc[-1] > 0:
+    elif trend_strength > 0:
         return "weak_up"
-    elif trend_strength.iloc[-1] > -0.05:
+    elif trend_strength > -0.05:
         return "weak_down"
     else:
         return "strong_down"
 
 
+def get_trend_status(close_prices):
+    """趋势判断：基于5日/20日均线"""
+    ma_short = close_prices.rolling(5).mean()
+    ma_long = close_prices.rolling(20).mean()
+    trend_strength = (ma_short - ma_long) / ma_long
+
+    return classify_trend(trend_strength.iloc[-1])
+
+
 def trend_aware_change_score(today_change, trend_status, volume_ratio=1.0):
     """单日涨跌幅评分（满分10分）"""
     base_scores = {
@@ -123,6 +130,45 @@ class DailyChangeFactor(BaseFactor):
             }
         }
 
+    @classmethod
+    def calculate_batch(cls, codes, date=None):
+        """一次取出全部股票最近 21 条收盘价，向量化计算涨跌幅与均线趋势
+
+        价格文件不含成交量列（面板亦无），volume_ratio 与单只计算一致取 1.0
+        """
+        closes, counts = load_tails([normalize_code(str(c)) for c in codes], 21, end=date)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            today_change = (closes[-1] - closes[-2]) / closes[-2] * 100
+        # 与单只计算相同的 pandas 滚动均值（逐列独立计算）
+        window = pd.DataFrame(closes)
+        ma_short = window.rolling(5).mean().iloc[-1].to_numpy()
+        ma_long = window.rolling(20).mean().iloc[-1].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend_strength = (ma_short - ma_long) / ma_long
+
+        results = {}
+        for j, code in enumerate(codes):
+            if counts[j] == 0:
+                results[code] = cls(code).calculate()
+                continue
+            if counts[j] < 21:
+                results[code] = {"name": "单日涨跌幅", "score": 0, "sum_score": 10}
+                continue
+
+            trend_status = classify_trend(trend_strength[j])
+            score = trend_aware_change_score(today_change[j], trend_status, 1.0)
+            results[code] = {
+                "name": "单日涨跌幅",
+                "score": score,
+                "sum_score": 10,
+                "meta": {
+                    "today_change": round(today_change[j], 2),
+                    "trend_status": trend_status,
+                    "volume_ratio": 1.0
+                }
+            }
+        return results
+
 
 if __name__ == "__main__":
     factor = DailyChangeFactor("600660")
@@ -1,10 +1,17 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from src.core.base_factor import BaseFactor
 from src.datafactory.data_manager import get_price, normalize_code
+from src.datafactory.price_panel import load_tails
 import src.utils
 
 index_ret = None
+_index_ret_at = {}   # date -> 截至该日的上证指数年内涨幅（历史日期回填用）
+
+# (下限, 得分)：相对大盘超额收益大于下限取对应得分，均不满足得 _RELATIVE_FLOOR
+_RELATIVE_BUCKETS = [(20, 10), (10, 8), (0, 6), (-5, 4), (-10, 3)]
+_RELATIVE_FLOOR = 2
 
 
 def get_stock_ytd_return(code):
@@ -35,28 +42,54 @@ def get_stock_ytd_return(code):
     return (end_price - start_price) / start_price * 100
 
 
+def _get_index_ret(date=None):
+    """上证指数年初至今涨幅：date 为空取最新，否则取 date 所在年份年初至 date（按日期缓存）"""
+    global index_ret
+    if date is None:
+        if index_ret is None:
+            index_ret = src.utils.get_market_change()
+        return index_ret
+    date = str(date)
+    if date not in _index_ret_at:
+        _index_ret_at[date] = src.utils.get_market_change(date)
+    return _index_ret_at[date]
+
+
 class RelativeStrengthFactor(BaseFactor):
     weight = 10
 
     def calculate(self):
-        global index_ret
         stock_ret = get_stock_ytd_return(self.code)
         print(f"今年本股票涨幅:{stock_ret}")
-        if index_ret is None:
-            index_ret = src.utils.get_market_change()
-        relative = stock_ret - index_ret
-
-        if relative > 20:
-            score = 10
-        elif relative > 10:
-            score = 8
-        elif relative > 0:
-            score = 6
-        elif relative > -5:
-            score = 4
-        elif relative > -10:
-            score = 3
-        else:
-            score = 2
+        relative = stock_ret - _get_index_ret()
+
+        score = _RELATIVE_FLOOR
+        for low, s in _RELATIVE_BUCKETS:
+            if relative > low:
+                score = s
+                break
 
         return {"name": "今年相对大盘强弱", "score": score, "sum_score": 10}
+
+    @classmethod
+    def calculate_batch(cls, codes, date=None):
+        """一次取出全部股票的去年末收盘价与截至 date 的收盘价，向量化计算同一年内的超额收益"""
+        year = int(str(date)[:4]) if date else datetime.now().year
+        norm = [normalize_code(str(c)) for c in codes]
+        base, base_counts = load_tails(norm, 1, end=f"{year - 1}1231")
+        last, _ = load_tails(norm, 1, end=date)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock_ret = (last[0] - base[0]) / base[0] * 100
+        relative = stock_ret - _get_index_ret(date)
+        scores = np.select([relative > low for low, _ in _RELATIVE_BUCKETS],
+                           [s for _, s in _RELATIVE_BUCKETS], _RELATIVE_FLOOR)
+
+        results = {}
+        for j, code in enumerate(codes):
+            if base_counts[j] == 0 and date is None:
+                # 无去年数据：走单只逻辑（单只逻辑只算今年，历史日期按无数据取最低分）
+                results[code] = cls(code).calculate()
+            else:
+                results[code] = {"name": "今年相对大盘强弱", "score": int(scores[j]), "sum_score": 10}
+        return results
@@ -1,13 +1,20 @@
 import copy
+import os
 
 import pandas as pd
 
 from src.core.base_factor import BaseFactor
-from src.datafactory.data_manager import get_finance, normalize_code
+from src.datafactory.data_manager import FINANCE_PATH, get_finance, normalize_code
 
 
 FIELDS = ["报告期", "净利润同比增长率", "扣非净利润同比增长率", "营业总收入同比增长率"]
 
+# 评分时间线保留的季度数（本季度 / 上季度 / 上上季度）
+TIMELINE_QUARTERS = 3
+
+# code -> (财报 CSV 签名, 时间线)，CSV 被重新下载后自动失效
+_TIMELINE_CACHE = {}
+
 
 def score_single_item(growth_rates, full_score, max_negative_score):
     """
@@ -153,50 +160,83 @@ def _to_float(v):
         return 0.0
 
 
-def _window(df, p_flg):
+def build_score_timeline(df):
     """
-    根据p_flg取数窗口（用于计算最近3个季度的同比趋势评分）
-
-    参数:
-        df: 按时间正序排列的财务数据DataFrame
-        p_flg: 1=本季度, 2=上季度, 0=上上季度
+    由财务数据一次算出最近 TIMELINE_QUARTERS 个季度的评分
 
     返回:
-        取对应的3个季度数据进行评分计算
-
-    示例（假设数据最后3行: 2025-06, 2025-09, 2025-12）:
-        p_flg=1: tail(3)     → [2025-06, 2025-09, 2025-12] 用于计算2025-12的评分
-        p_flg=2: iloc[-4:-1] → [2025-03, 2025-06, 2025-09] 用于计算2025-09的评分
-        p_flg=0: iloc[-5:-2] → [2024-12, 2025-03, 2025-06] 用于计算2025-06的评分
+        [(报告期, total, detail), ...] 按时间正序，最后一项为本季度；
+        第 i 项对应以该季度为最新、取其及前两个季度（共3行）计算的评分，
+        不足3行的季度不出现在列表中
     """
-    if p_flg == 1:
-        return df[FIELDS].tail(3)
-    if p_flg == 2:
-        return df[FIELDS].iloc[-4:-1]
-    return df[FIELDS].iloc[-5:-2]
+    if df is None or df.empty or not all(f in df.columns for f in FIELDS):
+        return []
+
+    rates = {col: [_to_float(v) for v in df[col].tolist()]
+             for col in ["净利润同比增长率", "扣非净利润同比增长率", "营业总收入同比增长率"]}
+    periods = df["报告期"].tolist()
+
+    timeline = []
+    n = len(df)
+    for end in range(max(3, n - TIMELINE_QUARTERS + 1), n + 1):
+        data = {
+            "扣非净利润同比增长率": rates["扣非净利润同比增长率"][end - 3:end],
+            "归母净利润同比增长率": rates["净利润同比增长率"][end - 3:end],
+            "营业总收入同比增长率": rates["营业总收入同比增长率"][end - 3:end],
+        }
+        total, detail = calc_total_score(data)
+        timeline.append((periods[end - 1], total, detail))
+    return timeline
 
 
-def js_score(gpcode, p_flg):
+def score_timeline(gpcode):
+    """
+    某只股票的财报评分时间线（见 build_score_timeline）
+
+    按财报 CSV 的 (mtime, size) 缓存在进程内：同一份财报多次评分（因子、API 的三个季度）
+    只读取和计算一次；无有效评分时不缓存，下次调用仍会尝试下载
+    """
     code = normalize_code(gpcode)
-    df = get_finance(code)
-    if df is None or df.empty or not all(f in df.columns for f in FIELDS):
-        return 0, {}
+    file_path = os.path.join(FINANCE_PATH, f"{code}.csv")
 
-    df_selected = _window(df, p_flg).copy()
-    if len(df_selected) < 3:
-        return 0, {}
+    cached = _TIMELINE_CACHE.get(code)
+    if cached is not None and cached[0] == _file_signature(file_path):
+        return cached[1]
 
-    for col in ["净利润同比增长率", "扣非净利润同比增长率", "营业总收入同比增长率"]:
-        df_selected[col] = df_selected[col].map(_to_float)
+    timeline = build_score_timeline(get_finance(code))
+    sig = _file_signature(file_path)
+    if sig is not None and timeline:
+        _TIMELINE_CACHE[code] = (sig, timeline)
+    return timeline
 
-    data = {
-        "扣非净利润同比增长率": list(df_selected["扣非净利润同比增长率"]),
-        "归母净利润同比增长率": list(df_selected["净利润同比增长率"]),
-        "营业总收入同比增长率": list(df_selected["营业总收入同比增长率"]),
-    }
 
-    total, detail = calc_total_score(data)
-    return total, detail
+def _file_signature(file_path):
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def js_score(gpcode, p_flg):
+    """
+    计算某个季度的财报评分
+
+    参数:
+        p_flg: 1=本季度, 2=上季度, 0=上上季度
+
+    示例（假设数据最后3行: 2025-06, 2025-09, 2025-12）:
+        p_flg=1: [2025-06, 2025-09, 2025-12] → 2025-12的评分（时间线最后一项）
+        p_flg=2: [2025-03, 2025-06, 2025-09] → 2025-09的评分（倒数第二项）
+        p_flg=0: [2024-12, 2025-03, 2025-06] → 2025-06的评分（倒数第三项）
+    """
+    back = {1: 1, 2: 2}.get(p_flg, 3)
+    timeline = score_timeline(gpcode)
+    if len(timeline) < back:
+        return 0, {}
+
+    _, total, detail = timeline[-back]
+    return total, copy.deepcopy(detail)
 
 
 class FinancialFactor(BaseFactor):
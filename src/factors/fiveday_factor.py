@@ -1,7 +1,13 @@
+import numpy as np
 import pandas as pd
 
 from src.core.base_factor import BaseFactor
 from src.datafactory.data_manager import get_price, normalize_code
+from src.datafactory.price_panel import load_tails
+
+# (下限, 得分)：5日涨幅大于下限取对应得分，均不满足得 _RET5_FLOOR
+_RET5_BUCKETS = [(10, 10), (5, 8), (0, 6), (-5, 4)]
+_RET5_FLOOR = 2
 
 
 def get_5day_return(code):
@@ -33,15 +39,30 @@ class FiveDayReturnFactor(BaseFactor):
     def calculate(self):
         ret5 = get_5day_return(self.code)
 
-        if ret5 > 10:
-            score = 10
-        elif ret5 > 5:
-            score = 8
-        elif ret5 > 0:
-            score = 6
-        elif ret5 > -5:
-            score = 4
-        else:
-            score = 2
+        score = _RET5_FLOOR
+        for low, s in _RET5_BUCKETS:
+            if ret5 > low:
+                score = s
+                break
 
         return {"name": "5日涨跌幅", "score": score, "sum_score": 10}
+
+    @classmethod
+    def calculate_batch(cls, codes, date=None):
+        """一次取出全部股票最近 6 条收盘价，向量化计算 5 日涨幅"""
+        closes, counts = load_tails([normalize_code(str(c)) for c in codes], 6, end=date)
+        start, end = closes[0], closes[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ret5 = np.where(start <= 0, 0.0, (end / start - 1) * 100)
+        ret5 = np.where(counts < 6, 0.0, ret5)
+        scores = np.select([ret5 > low for low, _ in _RET5_BUCKETS],
+                           [s for _, s in _RET5_BUCKETS], _RET5_FLOOR)
+
+        results = {}
+        for j, code in enumerate(codes):
+            if counts[j] == 0:
+                # 无价格数据：走单只逻辑
+                results[code] = cls(code).calculate()
+            else:
+                results[code] = {"name": "5日涨跌幅", "score": int(scores[j]), "sum_score": 10}
+        return results
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from src.core.base_factor import BaseFactor
 from src.datafactory.data_manager import get_price, get_stock_industry, get_industry_change
+from src.datafactory.price_panel import load_tails
 import os
 import time
 
@@ -48,6 +50,17 @@ def get_stock_industry_from_cache(code):
     return match.iloc[0]['行业名称'], match.iloc[0]['行业代码']
 
 
+def _industry_lookup():
+    """{股票代码: (行业名称, 行业代码)}，同一代码取映射表中第一条"""
+    df = _load_industry_mapping()
+    if df is None:
+        return {}
+    lookup = {}
+    for code, name, sw_code in zip(df['股票代码'], df['行业名称'], df['行业代码']):
+        lookup.setdefault(code, (name, sw_code))
+    return lookup
+
+
 def get_industry_change_by_code(sw_code, date=None, days=20):
     """根据申万行业代码获取涨跌幅
 
@@ -293,4 +306,66 @@ class IndustryDiffFactor(BaseFactor):
                 "relative": round(relative, 2),
                 "details": details
             }
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def calculate_batch(cls, codes, date=None):
+        """行业映射与行业涨跌幅各读一次，个股 20 日涨幅一次向量化算出"""
+        days = 20
+        lookup = _industry_lookup()
+        closes, counts = load_tails([str(c).zfill(6) for c in codes], days, end=date)
+        # 不足 days 条时与单只计算一致，以首条记录为起点
+        start = closes[np.clip(days - counts, 0, days - 1), np.arange(len(codes))]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock_pcts = (closes[-1] - start) / start * 100
+
+        industry_date = None
+        if date:
+            industry_date = pd.to_datetime(str(date), format='%Y%m%d').strftime('%Y-%m-%d')
+        industry_cache = {}
+
+        results = {}
+        missing = 0
+        for j, code in enumerate(codes):
+            industry_name, sw_code = lookup.get(str(code).zfill(6), (None, ''))
+            if not industry_name:
+                missing += 1
+                results[code] = {"name": "行业相对强弱", "score": 0, "sum_score": 10,
+                                 "meta": {"error": "行业映射不存在"}}
+                continue
+
+            if sw_code not in industry_cache:
+                industry_cache[sw_code] = get_industry_change_by_code(sw_code, date=industry_date, days=days)
+            industry_change = industry_cache[sw_code]
+            if industry_change is None:
+                results[code] = {"name": "行业相对强弱", "score": 0, "sum_score": 10,
+                                 "meta": {"industry": industry_name, "sw_code": sw_code,
+                                          "error": "行业涨跌幅数据不存在"}}
+                continue
+
+            if counts[j] < 2:
+                results[code] = {"name": "行业相对强弱", "score": 0, "sum_score": 10,
+                                 "meta": {"industry": industry_name, "sw_code": sw_code,
+                                          "error": "价格数据不存在"}}
+                continue
+
+            industry_pct = industry_change['change_pct']
+            stock_pct = stock_pcts[j]
+            relative = stock_pct - industry_pct
+            score, details = calculate_industry_score(stock_pct, industry_pct)
+            results[code] = {
+                "name": "行业相对强弱",
+                "score": score,
+                "sum_score": 10,
+                "meta": {
+                    "industry": industry_name,
+                    "sw_code": sw_code,
+                    "stock_return": round(stock_pct, 2),
+                    "industry_return": round(industry_pct, 2),
+                    "relative": round(relative, 2),
+                    "details": details
+                }
+            }
+
+        print(f"行业相对强弱: {len(codes)} 只，{missing} 只无行业映射，{len(industry_cache)} 个行业")
+        return results
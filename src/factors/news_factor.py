@@ -7,6 +7,8 @@ from src.datafactory.data_manager import get_news
 
 
 class NewsFactor(BaseFactor):
+    uses_network = True
+
     def __init__(self, code, name=None, target_date=None):
         super().__init__(code, name)
         self.target_date = target_date or datetime.today().strftime("%Y-%m-%d")
@@ -6,5 +6,6 @@
 
 from .database import PortfolioDB
 from .trading import TradingManager
+from .replay import ReplayPortfolio
 
-__all__ = ['PortfolioDB', 'TradingManager']
+__all__ = ['PortfolioDB', 'TradingManager', 'ReplayPortfolio']
@@ -0,0 +1,222 @@
+"""
+回放账户模块
+
+内存中的模拟账户，接口与 TradingManager 中 sim_trader 用到的部分一致
+（get_account / get_positions / buy / sell / update_prices / save_snapshot），
+交易按回放日期记账、不落库；回放结束后 write() 一次事务写入 portfolio.db 的独立账户。
+"""
+
+from typing import Dict, List, Optional
+
+from .database import PortfolioDB
+from .trading import (
+    TradingManager, add_to_position, buy_cost, buy_result, check_funds, check_sell,
+    fifo_pairs, sell_proceeds, sell_result,
+)
+
+
+def _stamp(date: str) -> str:
+    """YYYYMMDD → 与库中 datetime('now') 同格式的时间戳（按收盘时刻记）"""
+    return f"{date[:4]}-{date[4:6]}-{date[6:8]} 15:00:00"
+
+
+class ReplayPortfolio:
+    """内存回放账户（费用、加仓均价、FIFO 配对与返回结果均调用 trading 中与 TradingManager 共用的函数）"""
+
+    def __init__(self, initial_capital: float = 1000000):
+        self.initial_capital = initial_capital
+        self.cash = initial_capital
+        self.positions: Dict[str, dict] = {}    # code -> 未平仓持仓
+        self.closed: List[dict] = []            # 已平仓持仓
+        self.lots: List[dict] = []
+        self.trades: List[dict] = []
+        self.nav: Dict[str, dict] = {}          # date -> 当日快照
+        self.date: Optional[str] = None
+        self._seq = 0
+
+    def set_date(self, date: str):
+        """切换回放日（之后的交易按该日记账）"""
+        self.date = date
+
+    def _next_id(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    # ========== 与 TradingManager 一致的接口 ==========
+
+    def get_account(self) -> Dict:
+        return {'initial_capital': self.initial_capital, 'current_capital': self.cash}
+
+    def get_positions(self) -> List[Dict]:
+        """未平仓持仓（与库查询一样按建仓时间倒序）"""
+        positions = sorted(self.positions.values(), key=lambda p: p['buy_date'], reverse=True)
+        return [dict(p) for p in positions]
+
+    def buy(self, code: str, name: str, price, shares,
+            score: float = None, reason: str = None) -> Dict:
+        shares = TradingManager._validate_shares(shares)
+        price = TradingManager._validate_price(price)
+
+        amount, fee, total_cost = buy_cost(price, shares)
+        rejected = check_funds(total_cost, self.cash)
+        if rejected:
+            return rejected
+
+        stamp = _stamp(self.date)
+        self.cash -= total_cost
+        pos = self.positions.get(code)
+        if pos:
+            pos['shares'], pos['cost_price'] = add_to_position(pos['shares'], pos['cost_price'],
+                                                               price, shares)
+            pos['current_price'] = price
+        else:
+            self.positions[code] = {
+                'id': self._next_id(), 'code': code, 'name': name, 'shares': shares,
+                'cost_price': price, 'current_price': price, 'buy_date': stamp,
+                'buy_score': score, 'closed_at': None,
+            }
+        self.lots.append({
+            'id': self._next_id(), 'code': code, 'name': name, 'buy_date': stamp,
+            'buy_price': price, 'buy_shares': shares, 'sell_date': None, 'sell_price': None,
+            'sell_shares': 0, 'remaining_shares': shares, 'buy_score': score,
+        })
+        self.trades.append({
+            'code': code, 'name': name, 'type': 'BUY', 'price': price, 'shares': shares,
+            'amount': amount, 'fee': fee, 'stamp_tax': 0, 'trade_date': stamp,
+            'score': score, 'reason': reason,
+        })
+        return buy_result(len(self.trades), code, name, price, shares, amount, fee, total_cost, self.cash)
+
+    def sell(self, code: str, price, shares, reason: str = None) -> Dict:
+        shares = TradingManager._validate_shares(shares)
+        price = TradingManager._validate_price(price)
+
+        pos = self.positions.get(code)
+        rejected = check_sell(code, pos['shares'] if pos else None, shares)
+        if rejected:
+            return rejected
+
+        # FIFO 配对 trade_lots
+        stamp = _stamp(self.date)
+        lots = sorted((lot for lot in self.lots if lot['code'] == code and lot['remaining_shares'] > 0),
+                      key=lambda lot: (lot['buy_date'], lot['id']))
+        pairs = fifo_pairs(lots, shares, price)
+        for lot, pair in zip(lots, pairs):
+            lot['remaining_shares'] -= pair['shares']
+            lot['sell_date'] = stamp
+            lot['sell_price'] = price
+            lot['sell_shares'] += pair['shares']
+
+        amount, total_fee, commission, stamp_tax, net_amount = sell_proceeds(price, shares)
+        self.cash += net_amount
+
+        # 清仓的持仓行保留原股数、记平仓时间（与库中一致）
+        if shares == pos['shares']:
+            pos['closed_at'] = stamp
+            self.closed.append(self.positions.pop(code))
+        else:
+            pos['shares'] -= shares
+            pos['current_price'] = price
+
+        self.trades.append({
+            'code': code, 'name': pos['name'], 'type': 'SELL', 'price': price, 'shares': shares,
+            'amount': amount, 'fee': commission, 'stamp_tax': stamp_tax, 'trade_date': stamp,
+            'score': None, 'reason': reason,
+        })
+        return sell_result(len(self.trades), code, pos['name'], price, shares, amount, total_fee,
+                           commission, stamp_tax, net_amount, pairs, self.cash)
+
+    def update_prices(self, prices: Dict[str, float]):
+        for code, price in prices.items():
+            if code in self.positions:
+                self.positions[code]['current_price'] = price
+
+    def save_snapshot(self, date: str = None) -> Dict:
+        date = date or self.date
+        position_value = sum(
+            (p['current_price'] or p['cost_price']) * p['shares']
+            for p in self.positions.values()
+        )
+        total_assets = self.cash + position_value
+        nav = total_assets / self.initial_capital
+        self.nav[date] = {
+            'date': date, 'nav': nav, 'total_assets': total_assets,
+            'position_value': position_value, 'cash': self.cash,
+        }
+        return {
+            'date': date,
+            'nav': round(nav, 4),
+            'total_assets': round(total_assets, 2),
+            'position_value': round(position_value, 2),
+            'cash': round(self.cash, 2)
+        }
+
+    # ========== 落库 ==========
+
+    def write(self, db: PortfolioDB, name: str) -> int:
+        """
+        一次事务写入 portfolio.db 的独立 SIM 账户（同名账户已存在时先清空重写）
+
+        Returns:
+            账户 id
+        """
+        # 默认 SIM 账户取 id 最小的一个：先确保它存在，回放账户不会被当成默认账户
+        TradingManager(db=db, mode='SIM')
+        strategy = db.get_default_strategy()
+        strategy_id = strategy['id'] if strategy else None
+
+        with db.transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id FROM accounts WHERE name = ? AND mode = 'SIM'", (name,))
+            row = c.fetchone()
+            if row:
+                acc_id = row['id']
+                for table in ('positions', 'trade_lots', 'trades', 'daily_nav'):
+                    c.execute(f"DELETE FROM {table} WHERE account_id = ?", (acc_id,))
+                c.execute(
+                    "UPDATE accounts SET initial_capital = ?, current_capital = ?, strategy_id = ?, "
+                    "updated_at = datetime('now', 'localtime') WHERE id = ?",
+                    (self.initial_capital, self.cash, strategy_id, acc_id)
+                )
+            else:
+                c.execute(
+                    "INSERT INTO accounts (name, mode, initial_capital, current_capital, strategy_id) "
+                    "VALUES (?, 'SIM', ?, ?, ?)",
+                    (name, self.initial_capital, self.cash, strategy_id)
+                )
+                acc_id = c.lastrowid
+
+            positions = sorted(self.closed + list(self.positions.values()), key=lambda p: p['id'])
+            c.executemany(
+                '''INSERT INTO positions
+                   (account_id, code, name, shares, cost_price, current_price, buy_date, buy_score, closed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(acc_id, p['code'], p['name'], p['shares'], p['cost_price'], p['current_price'],
+                  p['buy_date'], p['buy_score'], p['closed_at']) for p in positions]
+            )
+            c.executemany(
+                '''INSERT INTO trade_lots
+                   (account_id, code, name, buy_date, buy_price, buy_shares, sell_date, sell_price,
+                    sell_shares, remaining_shares, buy_score)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(acc_id, lot['code'], lot['name'], lot['buy_date'], lot['buy_price'], lot['buy_shares'],
+                  lot['sell_date'], lot['sell_price'], lot['sell_shares'], lot['remaining_shares'],
+                  lot['buy_score']) for lot in self.lots]
+            )
+            c.executemany(
+                '''INSERT INTO trades
+                   (account_id, code, name, type, price, shares, amount, fee, stamp_tax,
+                    trade_date, score, reason)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(acc_id, t['code'], t['name'], t['type'], t['price'], t['shares'], t['amount'],
+                  t['fee'], t['stamp_tax'], t['trade_date'], t['score'], t['reason'])
+                 for t in self.trades]
+            )
+            c.executemany(
+                '''INSERT INTO daily_nav
+                   (account_id, date, nav, total_assets, position_value, cash)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                [(acc_id, s['date'], s['nav'], s['total_assets'], s['position_value'], s['cash'])
+                 for s in self.nav.values()]
+            )
+        return acc_id
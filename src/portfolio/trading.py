@@ -38,6 +38,124 @@ def calc_sell_fee(amount: float) -> tuple:
     return round(total, 2), round(commission, 2), round(stamp_tax, 2)
 
 
+# ============================================================
+# 交易记账规则（纯函数：TradingManager 与回放账户 ReplayPortfolio 共用）
+# ============================================================
+
+def buy_cost(price: float, shares: int) -> tuple:
+    """买入成交金额与费用：(amount, fee, total_cost)"""
+    amount = price * shares
+    fee = calc_buy_fee(amount)
+    return amount, fee, amount + fee
+
+
+def check_funds(total_cost: float, capital: float) -> Optional[Dict]:
+    """资金不足时返回失败结果，否则 None"""
+    if total_cost > capital:
+        return {
+            'success': False,
+            'error': '资金不足',
+            'required': round(total_cost, 2),
+            'available': round(capital, 2)
+        }
+    return None
+
+
+def add_to_position(old_shares: int, old_cost: float, price: float, shares: int) -> tuple:
+    """加仓后的 (股数, 持仓均价)"""
+    new_shares = old_shares + shares
+    return new_shares, (old_cost * old_shares + price * shares) / new_shares
+
+
+def buy_result(trade_id: int, code: str, name: str, price: float, shares: int,
+               amount: float, fee: float, total_cost: float, capital: float) -> Dict:
+    """买入成功的返回结果（capital 为扣款后的剩余资金）"""
+    return {
+        'success': True,
+        'trade_id': trade_id,
+        'code': code,
+        'name': name,
+        'price': price,
+        'shares': shares,
+        'amount': round(amount, 2),
+        'fee': fee,
+        'total_cost': round(total_cost, 2),
+        'remaining_capital': round(capital, 2)
+    }
+
+
+def check_sell(code: str, held_shares: Optional[int], shares: int) -> Optional[Dict]:
+    """卖出前检查持仓（held_shares 为 None 表示未持有），不能卖时返回失败结果"""
+    if held_shares is None:
+        return {
+            'success': False,
+            'error': '未持有该股票',
+            'code': code
+        }
+    if shares > held_shares:
+        return {
+            'success': False,
+            'error': f'卖出数量{shares}超过持仓{held_shares}',
+            'available': held_shares
+        }
+    return None
+
+
+def fifo_pairs(lots: List[Dict], shares: int, price: float) -> List[Dict]:
+    """
+    FIFO 配对：lots 为未卖完的仓位行（含 id / buy_price / remaining_shares，按建仓时间、id 升序），
+    依次从最早的仓位扣减卖出股数。每个配对的 shares 即该仓位本次卖出的股数
+    """
+    pairs = []
+    remaining_to_sell = shares
+    for lot in lots:
+        if remaining_to_sell <= 0:
+            break
+        take = min(remaining_to_sell, lot['remaining_shares'])
+        pairs.append({
+            'lot_id': lot['id'],
+            'buy_price': lot['buy_price'],
+            'shares': take,
+            'sell_price': price,
+            'return_rate': (price - lot['buy_price']) / lot['buy_price'] * 100,
+        })
+        remaining_to_sell -= take
+    return pairs
+
+
+def sell_proceeds(price: float, shares: int) -> tuple:
+    """卖出成交金额与费用：(amount, total_fee, commission, stamp_tax, net_amount)"""
+    amount = price * shares
+    total_fee, commission, stamp_tax = calc_sell_fee(amount)
+    return amount, total_fee, commission, stamp_tax, amount - total_fee
+
+
+def sell_result(trade_id: int, code: str, name: str, price: float, shares: int,
+                amount: float, total_fee: float, commission: float, stamp_tax: float,
+                net_amount: float, pairs: List[Dict], capital: float) -> Dict:
+    """卖出成功的返回结果：按配对仓位的买入成本计算总盈亏（capital 为到账后的资金）"""
+    cost_amount = sum(p['buy_price'] * p['shares'] for p in pairs)
+    profit = net_amount - cost_amount
+    weighted_return = (profit / cost_amount * 100) if cost_amount > 0 else 0
+    return {
+        'success': True,
+        'trade_id': trade_id,
+        'code': code,
+        'name': name,
+        'price': price,
+        'shares': shares,
+        'amount': round(amount, 2),
+        'fee': commission,
+        'stamp_tax': stamp_tax,
+        'total_fee': total_fee,
+        'net_amount': round(net_amount, 2),
+        'profit': round(profit, 2),
+        'profit_rate': round(weighted_return, 2),
+        'pairs': pairs,
+        'remaining_capital': round(capital, 2)
+    }
+
+
 class TradingManager:
     """交易管理器（支持指定 account_id, mode, strategy_id）"""
 
@@ -92,7 +210,8 @@ class TradingManager:
             return self.db.get_default_strategy()
         return self.db.get_strategy(account['strategy_id'])
 
-    def _validate_shares(self, shares) -> int:
+    @staticmethod
+    def _validate_shares(shares) -> int:
         """校验 A 股最小买入 100 股 + 整手"""
         if not isinstance(shares, int):
             try:
@@ -107,7 +226,8 @@ class TradingManager:
             raise ValueError(f"A 股必须为 {SHARES_LOT} 整数倍，收到: {shares}")
         return shares
 
-    def _validate_price(self, price) -> float:
+    @staticmethod
+    def _validate_price(price) -> float:
         """校验价格"""
         try:
             price = float(price)
@@ -147,18 +267,12 @@ class TradingManager:
             }
 
         # 计算费用（A 股买入：佣金，最低 5 元）
-        amount = price * shares
-        fee = calc_buy_fee(amount)
-        total_cost = amount + fee
+        amount, fee, total_cost = buy_cost(price, shares)
 
         # 检查资金
-        if total_cost > account['current_capital']:
-            return {
-                'success': False,
-                'error': '资金不足',
-                'required': round(total_cost, 2),
-                'available': round(account['current_capital'], 2)
-            }
+        rejected = check_funds(total_cost, account['current_capital'])
+        if rejected:
+            return rejected
 
         # 在单个事务内完成：扣资金、加仓、记交易
         with self.db.transaction() as conn:
@@ -176,10 +290,8 @@ class TradingManager:
             )
             existing = cursor.fetchone()
             if existing:
-                old_shares = existing['shares']
-                old_cost = existing['cost_price']
-                new_shares = old_shares + shares
-                new_cost = (old_cost * old_shares + price * shares) / new_shares
+                new_shares, new_cost = add_to_position(existing['shares'], existing['cost_price'],
+                                                       price, shares)
                 cursor.execute(
                     '''UPDATE positions
                        SET shares = ?, cost_price = ?, current_price = ?,
@@ -211,18 +323,7 @@ class TradingManager:
             )
             trade_id = cursor.lastrowid
 
-        return {
-            'success': True,
-            'trade_id': trade_id,
-            'code': code,
-            'name': name,
-            'price': price,
-            'shares': shares,
-            'amount': round(amount, 2),
-            'fee': fee,
-            'total_cost': round(total_cost, 2),
-            'remaining_capital': round(new_capital, 2)
-        }
+        return buy_result(trade_id, code, name, price, shares, amount, fee, total_cost, new_capital)
 
     def sell(self, code: str, price, shares,
              reason: str = None, account_id: int = None) -> Dict:
@@ -262,18 +363,9 @@ class TradingManager:
                     (acc_id, code)
                 )
                 row = cursor.fetchone()
-                if not row:
-                    return {
-                        'success': False,
-                        'error': '未持有该股票',
-                        'code': code
-                    }
-                if shares > row['shares']:
-                    return {
-                        'success': False,
-                        'error': f'卖出数量{shares}超过持仓{row["shares"]}',
-                        'available': row['shares']
-                    }
+                rejected = check_sell(code, row['shares'] if row else None, shares)
+                if rejected:
+                    return rejected
 
                 # FIFO 配对 trade_lots
                 cursor.execute(
@@ -285,20 +377,9 @@ class TradingManager:
                 )
                 lots = cursor.fetchall()
 
-                pairs = []
-                remaining_to_sell = shares
-                for lot in lots:
-                    if remaining_to_sell <= 0:
-                        break
-                    take = min(remaining_to_sell, lot['remaining_shares'])
-                    return_rate = (price - lot['buy_price']) / lot['buy_price'] * 100
-                    pairs.append({
-                        'lot_id': lot['id'],
-                        'buy_price': lot['buy_price'],
-                        'shares': take,
-                        'sell_price': price,
-                        'return_rate': return_rate,
-                    })
+                pairs = fifo_pairs(lots, shares, price)
+                for lot, pair in zip(lots, pairs):
+                    take = pair['shares']
                     new_remaining = lot['remaining_shares'] - take
                     if new_remaining == 0:
                         cursor.execute(
@@ -322,12 +403,9 @@ class TradingManager:
                                WHERE id = ?''',
                             (new_remaining, price, take, lot['id'])
                         )
-                    remaining_to_sell -= take
 
                 # 卖出费用（A 股：佣金 + 印花税）
-                amount = price * shares
-                total_fee, commission, stamp_tax = calc_sell_fee(amount)
-                net_amount = amount - total_fee
+                amount, total_fee, commission, stamp_tax, net_amount = sell_proceeds(price, shares)
 
                 # 加资金
                 new_capital = account['current_capital'] + net_amount
@@ -365,31 +443,11 @@ class TradingManager:
                 )
                 trade_id = cursor.lastrowid
 
-                # 计算总盈亏
-                cost_amount = sum(p['buy_price'] * p['shares'] for p in pairs)
-                profit = net_amount - cost_amount
-                weighted_return = (profit / cost_amount * 100) if cost_amount > 0 else 0
-
         except ValueError as e:
             return {'success': False, 'error': str(e)}
 
-        return {
-            'success': True,
-            'trade_id': trade_id,
-            'code': code,
-            'name': row['name'],
-            'price': price,
-            'shares': shares,
-            'amount': round(amount, 2),
-            'fee': commission,
-            'stamp_tax': stamp_tax,
-            'total_fee': total_fee,
-            'net_amount': round(net_amount, 2),
-            'profit': round(profit, 2),
-            'profit_rate': round(weighted_return, 2),
-            'pairs': pairs,
-            'remaining_capital': round(new_capital, 2)
-        }
+        return sell_result(trade_id, code, row['name'], price, shares, amount, total_fee,
+                           commission, stamp_tax, net_amount, pairs, new_capital)
 
     def get_positions(self, account_id: int = None) -> List[Dict]:
         """获取所有未平仓持仓"""
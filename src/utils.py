@@ -18,8 +18,12 @@ def getdate():
     today_str = today.strftime("%Y%m%d")  # 20260219
     return year_start,today_str
 
-def get_market_change():
-    """获取上证指数年初至今涨跌幅（通用版）"""
+def get_market_change(date=None):
+    """获取上证指数年初至今涨跌幅（通用版）
+
+    Args:
+        date: 截止日期 YYYYMMDD，默认最新（给定时按该日所在年份的年初至该日计算）
+    """
     try:
         # 获取上证指数历史数据
         sh_data = ak.stock_zh_index_daily(symbol="sh000001")
@@ -31,6 +35,9 @@ def get_market_change():
         
         # 获取当前年份
         current_year = datetime.now().year
+        if date:
+            current_year = int(str(date)[:4])
+            sh_data = sh_data[sh_data.index <= pd.to_datetime(str(date))]
         
         # 查找去年最后一个交易日
         # 从去年12月31日开始往前找，直到找到有数据的那天